@@ -1,22 +1,206 @@
-from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
-import os
-from pathlib import Path
-class Settings(BaseSettings):
-    database_url:str
-    secret_key:str
-    algorithm:str
-    access_token_expire_minutes:int
-    mail_username : str
-    mail_password : str
-    mail_from : str
-    mail_port : int
-    mail_server : str
-    
-
-    class Config:
-        env_file = Path(__file__).parent.parent.parent / ".env"
-        extra = "ignore"  # Ignore extra fields from .env file
-        
-settings=Settings()
-
+from pydantic_settings import BaseSettings
+from dotenv import load_dotenv
+import os
+from pathlib import Path
+from typing import List
+class Settings(BaseSettings):
+    database_url:str
+    secret_key:str
+    algorithm:str
+    access_token_expire_minutes:int
+    mail_username : str
+    mail_password : str
+    mail_from : str
+    mail_port : int
+    mail_server : str
+
+    # SQLAlchemy engine / connection pool (ignored for SQLite)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800  # seconds; Render drops idle connections
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 30000  # 0 disables
+
+    # OpenRouter HTTP client (shared for the lifetime of the app)
+    ai_api_url: str = "https://openrouter.ai/api/v1/chat/completions"
+    ai_http2: bool = True
+    ai_max_connections: int = 200
+    ai_max_keepalive_connections: int = 50
+    ai_keepalive_expiry: float = 30.0
+    ai_connect_timeout: float = 10.0
+    ai_read_timeout: float = 90.0
+    ai_write_timeout: float = 10.0
+    ai_pool_timeout: float = 10.0
+    ai_max_retries: int = 3
+    ai_retry_backoff: float = 0.5  # base of the jittered exponential backoff
+    ai_retry_backoff_max: float = 8.0
+
+    # Upstream health (services/upstream_health.py), shared by every request in
+    # the process: the circuit opens when at least ai_breaker_failure_ratio of
+    # the calls in the last ai_breaker_window seconds failed (5xx or transport
+    # errors), rejects calls for ai_breaker_open_seconds, then lets probes
+    # through. Retries are capped at ai_retry_budget_ratio per successful call
+    # (at most ai_retry_budget_max banked, topped up at
+    # ai_retry_budget_min_per_second when traffic is low). A Retry-After from
+    # upstream holds back calls with the same API key (429) or every caller
+    # (503): waited out when it is at most
+    # ai_retry_after_max_wait, otherwise calls fail fast with 503 until then.
+    ai_breaker_enabled: bool = True
+    ai_breaker_window: float = 30.0
+    ai_breaker_min_calls: int = 10
+    ai_breaker_failure_ratio: float = 0.5
+    ai_breaker_open_seconds: float = 15.0
+    ai_breaker_half_open_probes: int = 1
+    ai_retry_budget_ratio: float = 0.2
+    ai_retry_budget_max: float = 10.0
+    ai_retry_budget_min_per_second: float = 0.1
+    ai_retry_after_max_wait: float = 2.0
+
+    # Model routing (services/model_router.py): candidate models, best first
+    # by recent p50 latency and failure rate (AI_MODELS='["a", "b"]'). A call
+    # still running after the model's p95, clamped to
+    # ai_hedge_min_delay..ai_hedge_after seconds, is duplicated to the
+    # runner-up and the first valid answer wins. Hedging is opt-in (each hedge
+    # is a second paid call on the user's key) and needs two or more models.
+    # The first model also names the transformation cache, so cached answers
+    # survive reordering.
+    ai_models: List[str] = ["z-ai/glm-4.5-air:free"]
+    ai_model_window: int = 200  # recent calls per model kept for scoring
+    ai_model_stats_ttl: float = 900.0  # seconds before a sample stops counting
+    ai_hedge_enabled: bool = False
+    ai_hedge_after: float = 15.0
+    ai_hedge_min_delay: float = 3.0
+
+    # Prompt template (services/prompts.py): "v2" is the compact prompt that
+    # gets back only task number, rewrite and priority; "v1" the original.
+    # max_tokens is sized from the tasks in each request (estimated output
+    # times the headroom, clamped); ai_max_output_tokens=0 leaves it unset,
+    # e.g. for models that spend part of the budget reasoning.
+    ai_prompt_version: str = "v2"
+    ai_output_token_headroom: float = 2.0
+    ai_min_output_tokens: int = 256
+    ai_max_output_tokens: int = 4096
+
+    # SMART transformation cache (in-process LRU in front of the transform_cache table).
+    # Entries expire after ai_cache_ttl_days (0 keeps them forever); expired
+    # rows are deleted by the workers that store new ones.
+    ai_cache_enabled: bool = True
+    ai_cache_size: int = 10000
+    ai_cache_db_enabled: bool = True
+    ai_cache_ttl_days: float = 30.0
+
+    # Near-duplicate reuse: tasks whose hashed character-trigram embedding is
+    # within ai_dedup_threshold (cosine) of one in the user's saved history
+    # reuse its smart_task/priority instead of going to the model
+    ai_dedup_enabled: bool = True
+    ai_dedup_threshold: float = 0.9
+    ai_dedup_history_rows: int = 5000  # most recent tasks indexed per user
+    ai_dedup_max_users: int = 256
+    ai_dedup_ttl: int = 900  # seconds before a user's index is rebuilt
+
+    # Offline fast path (services/heuristic_transformer.py): provisional
+    # rewrites for tasks the model fails on or hasn't answered within
+    # ai_fast_path_budget seconds; the model's answer replaces them in the
+    # saved history when it arrives. /transform?fast=true skips the wait.
+    ai_fast_path_fallback: bool = True
+    ai_fast_path_budget: float = 20.0
+
+    # Large transform requests are split into chunks sent to the model concurrently
+    ai_batch_max_tasks: int = 15
+    ai_batch_max_tokens: int = 1200
+    ai_batch_concurrency: int = 4
+    ai_batch_retries: int = 1
+
+    # Authenticated-user snapshots cached by token subject
+    auth_cache_size: int = 10000
+    auth_cache_ttl: float = 60.0
+
+    # Password hashing (bcrypt runs on a bounded worker pool)
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 16
+
+    # Rate limiting: token buckets with a burst size and a sustained rate.
+    # "database" shares buckets across workers through the rate_limit_buckets
+    # table, "redis" through a Redis-compatible server, "memory" is per process.
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "database"
+    rate_limit_redis_url: str = "redis://localhost:6379/0"
+    rate_limit_ai_burst: int = 3
+    rate_limit_ai_per_minute: float = 20.0
+    rate_limit_ai_global_burst: int = 60  # upstream budget shared by all users
+    rate_limit_ai_global_per_minute: float = 300.0
+    rate_limit_signup_burst: int = 5
+    rate_limit_signup_per_minute: float = 2.0
+    rate_limit_email_burst: int = 3
+    rate_limit_email_per_minute: float = 6.0
+    # Proxies in front of the app that append to X-Forwarded-For (Render: 1).
+    # Per-IP limits use the entry this many places from the right, the one
+    # the outermost trusted proxy saw; 0 ignores the header.
+    rate_limit_trusted_proxies: int = 1
+
+    # Background transform jobs (POST /api/ai/transform?background=true).
+    # Set job_worker_in_api=false when running `python -m app.worker` separately.
+    job_worker_in_api: bool = True
+    job_worker_concurrency: int = 4
+    job_poll_interval: float = 2.0
+    job_lease_seconds: float = 300.0
+    job_max_attempts: int = 3
+    job_retry_backoff: float = 5.0
+    job_max_queued: int = 500
+    job_max_pending_per_user: int = 5
+    job_shutdown_grace: float = 20.0
+
+    # Outbound email: messages are stored in the email_outbox table and a
+    # background sender delivers them over one reused SMTP connection.
+    # mail_backend="log" writes them to the log instead (local dev / tests).
+    mail_backend: str = "smtp"
+    mail_from_name: str = "Sortify Team"
+    mail_starttls: bool = True
+    mail_ssl_tls: bool = False
+    mail_timeout: float = 30.0
+    mail_sender_in_api: bool = True
+    mail_batch_size: int = 20
+    mail_poll_interval: float = 2.0
+    mail_max_attempts: int = 5
+    mail_retry_backoff: float = 10.0
+    mail_lease_seconds: float = 120.0
+    mail_connection_idle: float = 60.0  # close the SMTP connection after this long unused
+
+    # Task analytics: keep per-user (status, priority) counts in the
+    # task_counts table as tasks change, so /api/tasks/stats reads a handful
+    # of rows. With it off the counts are a GROUP BY over tasks. The table is
+    # rebuilt at startup when empty; clear it after running with this off.
+    task_stats_summary: bool = True
+    task_stats_max_days: int = 365
+    # Full-text search (GET /api/tasks/search): Postgres text search config
+    task_search_language: str = "english"
+
+    # Prometheus metrics on GET /metrics (core/metrics.py) and the other
+    # operator endpoints (/api/email/stats): scrapers must send
+    # "Authorization: Bearer <metrics_token>". Without a token they answer
+    # 404, unless metrics_public is set (local runs only: they show traffic,
+    # upstream failure rates and outbox depth).
+    metrics_enabled: bool = True
+    metrics_token: str = ""
+    metrics_public: bool = False
+
+    # Logging (core/log.py): one JSON object per line, or log_format="text"
+    # for local runs. Records are written from a background thread through a
+    # bounded queue (dropped, never blocking, when it is full). Every field
+    # is capped at log_max_field_chars and scrubbed of keys, tokens and
+    # passwords; request/response payloads are logged at DEBUG for a
+    # log_payload_sample_rate share of calls.
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_queue_size: int = 10000
+    log_max_field_chars: int = 2000
+    log_payload_sample_rate: float = 0.01
+
+    class Config:
+        env_file = Path(__file__).parent.parent.parent / ".env"
+        extra = "ignore"  # Ignore extra fields from .env file
+        
+settings=Settings()
+
@@ -1,21 +1,125 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker,Session
-from .config import settings
-
-# Normalize Render-provided postgres URL (postgres:// -> postgresql+psycopg2://)
-def _normalize_db_url(url: str) -> str:
-    if url.startswith("postgres://"):
-        url = url.replace("postgres://", "postgresql+psycopg2://", 1)
-    return url
-
-engine=create_engine(_normalize_db_url(settings.database_url))
-SessionLocal=sessionmaker(autocommit=False, autoflush=False,bind=engine)
-Base=declarative_base()
-
-def get_db():
-    db:Session=SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from contextlib import contextmanager, asynccontextmanager
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker,Session
+from .config import settings
+from .metrics import instrument_engine
+
+# Normalize Render-provided postgres URL (postgres:// -> postgresql+psycopg2://)
+def _normalize_db_url(url: str) -> str:
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql+psycopg2://", 1)
+    return url
+
+# Same database through an asyncio driver (asyncpg / aiosqlite)
+def _async_db_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    driver = {"postgresql": "postgresql+asyncpg", "postgresql+psycopg2": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}.get(scheme)
+    if driver is None:
+        return url
+    if driver == "postgresql+asyncpg":
+        # asyncpg spells libpq's sslmode as ssl
+        rest = rest.replace("sslmode=", "ssl=")
+    return f"{driver}{sep}{rest}"
+
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        # SQLite (local dev) has its own pooling; the Postgres knobs don't apply
+        return {}
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if settings.db_statement_timeout_ms:
+        if url.startswith("postgresql+asyncpg"):
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+        elif url.startswith("postgresql"):
+            options["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    return options
+
+DATABASE_URL=_normalize_db_url(settings.database_url)
+engine=create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+SessionLocal=sessionmaker(autocommit=False, autoflush=False,bind=engine)
+
+# Request handlers use the async engine so DB waits don't hold a threadpool
+# slot; the sync engine stays for startup DDL and thread-bound services.
+ASYNC_DATABASE_URL=_async_db_url(DATABASE_URL)
+async_engine=create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal=async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+if settings.metrics_enabled:
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+Base=declarative_base()
+
+def ensure_indexes():
+    # create_all() skips tables that already exist, so indexes added to a model
+    # later would never reach an existing database without this
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def ensure_columns():
+    # Same gap as ensure_indexes for columns: add nullable columns that a model
+    # gained after its table was created. Anything needing a backfill or a
+    # constraint change still has to be migrated by hand.
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable or column.primary_key:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def get_db():
+    db:Session=SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@asynccontextmanager
+async def async_session_scope():
+    """Async counterpart of session_scope."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@contextmanager
+def session_scope():
+    """Session for code outside FastAPI dependencies; always closed."""
+    db:Session=SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _pool_stats(pool) -> dict:
+    status = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+def pool_status() -> dict:
+    return {"sync": _pool_stats(engine.pool), "async": _pool_stats(async_engine.pool)}
+
+def check_database() -> bool:
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
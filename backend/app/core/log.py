@@ -0,0 +1,171 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+from typing import Any, List, Optional, Tuple
+
+from .config import settings
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+# (uvicorn's color_message is its ANSI-coloured copy of msg)
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    "taskName",
+    "color_message",
+}
+
+_SECRETS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"(?i)\b(bearer)\s+[A-Za-z0-9._~+/=-]+"), r"\1 [REDACTED]"),
+    (re.compile(r"\bsk-[A-Za-z0-9_-]{6,}"), "sk-[REDACTED]"),
+    (re.compile(r"\beyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+"), "[REDACTED JWT]"),
+    (
+        re.compile(
+            r"""(?i)(["']?\b(?:api_key|password|secret(?:_key)?|access_token|token|authorization)["']?\s*[:=]\s*)"""
+            r"""(?:"[^"]*"|'[^']*'|[^\s,;}&]+)"""
+        ),
+        r"\1[REDACTED]",
+    ),
+]
+# ``extra`` fields whose value is masked whatever it looks like
+_SECRET_FIELDS = {"api_key", "password", "secret", "secret_key", "token", "access_token", "authorization"}
+
+
+def redact(text: str) -> str:
+    """``text`` with API keys, bearer tokens, JWTs and password/key fields masked."""
+    for pattern, replacement in _SECRETS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _cap(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def _field(value: Any, limit: int) -> Any:
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        value = json.dumps(value, default=str, ensure_ascii=False)
+    return _cap(redact(str(value)), limit)
+
+
+def _extras(record: logging.LogRecord, limit: int) -> dict:
+    return {
+        key: "[REDACTED]" if key.lower() in _SECRET_FIELDS else _field(value, limit)
+        for key, value in record.__dict__.items()
+        if key not in _RECORD_ATTRS and not key.startswith("_")
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg and any ``extra`` fields."""
+
+    def __init__(self, max_field_chars: int = settings.log_max_field_chars):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": _field(record.getMessage(), self.max_field_chars),
+        }
+        entry.update(_extras(record, self.max_field_chars))
+        if record.exc_info:
+            entry["exc"] = _field(self.formatException(record.exc_info), self.max_field_chars * 4)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local runs, with the same redaction and caps."""
+
+    def __init__(self, max_field_chars: int = settings.log_max_field_chars):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = redact(super().format(record))
+        extras = [f"{key}={value}" for key, value in _extras(record, self.max_field_chars).items()]
+        return " ".join([line] + extras)
+
+
+class QueuedHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread untouched and never blocks.
+
+    The stock QueueHandler formats the message in the calling thread; here
+    formatting, redaction and I/O all happen on the listener's thread. When
+    the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Payload:
+    """Serialised only when a handler actually formats the record."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return json.dumps(self.value, default=str, ensure_ascii=False)
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, **fields: Any):
+    """DEBUG-log a request/response payload for a sample of calls.
+
+    Costs one level check (and a random draw) when not logged; the payload
+    is serialised on the writer thread, capped and redacted like any field.
+    """
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= settings.log_payload_sample_rate:
+        return
+    logger.debug(message, extra={**fields, "payload": _Payload(payload)})
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging():
+    """Route all logging through a queued JSON (or text) handler; idempotent."""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if settings.log_format == "text" else JsonFormatter())
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueuedHandler(log_queue))
+    root.setLevel(settings.log_level.upper())
+    # Uvicorn sets up its own handlers before importing the app; send its
+    # records through ours so every line has the same shape
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
@@ -1,52 +1,108 @@
-import os
-from .core.db import Base, engine
-from .models.user import User
-from fastapi import FastAPI
-from .routes import register, user, email_verify, ai, email, tasks
-from fastapi.middleware.cors import CORSMiddleware
-
-# Clear existing tables and recreate
-# print("Dropping and recreating database tables...")
-# Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
-print("Database tables created successfully!")
-
-app = FastAPI(title="SortIQ API", version="1.0.0")
-
-# Dynamic CORS based on env var ALLOW_ORIGINS (comma-separated). If '*', disable credentials.
-origins_env = os.getenv("ALLOW_ORIGINS")
-if origins_env:
-    origins = [o.strip() for o in origins_env.split(",") if o.strip()]
-else:
-    origins = [
-        "http://localhost:3000",
-        "http://localhost:5173",
-        "http://127.0.0.1:3000",
-        "http://127.0.0.1:5173",
-    ]
-
-allow_credentials = not (len(origins) == 1 and origins[0] == "*")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=allow_credentials,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"],
-)
-
-app.include_router(ai.router)
-app.include_router(register.router)
-app.include_router(user.router)
-app.include_router(email_verify.apirouter)
-app.include_router(email.router)
-app.include_router(tasks.router)
-
-@app.get("/")
-def root():
-    return {"message": "SortIQ API is running", "status": "healthy"}
-
-@app.get("/health")
-def health_check():
-    return {"status": "healthy", "database": "connected"}
\ No newline at end of file
+import logging
+import os
+from contextlib import asynccontextmanager
+from .core.db import Base, engine, async_engine, ensure_columns, ensure_indexes, session_scope, pool_status, check_database
+from .models.user import User
+from .models.task import Task, TaskCount
+from .models.transform_cache import TransformCacheEntry
+from .models.rate_limit import RateLimitBucket
+from .models.job import TransformJob
+from .models.email_outbox import OutboxEmail
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from .repo.task import ensure_task_counts
+from .repo.task_search import ensure_task_search
+from .routes import register, user, email_verify, ai, email, tasks, metrics
+from .services.openrouter import ai_client
+from .services.job_worker import job_worker
+from .services.email_sender import email_sender
+from .services.transform_service import wait_for_refinements
+from .core.config import settings
+from .core.log import setup_logging
+from .core.metrics import MetricsMiddleware
+from .utils.user_cache import user_cache
+from .utils.hashing import password_hasher
+from fastapi.middleware.cors import CORSMiddleware
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Clear existing tables and recreate
+# print("Dropping and recreating database tables...")
+# Base.metadata.drop_all(bind=engine)
+Base.metadata.create_all(bind=engine)
+ensure_columns()
+ensure_indexes()
+ensure_task_search()
+with session_scope() as db:
+    ensure_task_counts(db)
+logger.info("Database tables created successfully")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # App-lifetime resources: created once per worker, closed on shutdown
+    await ai_client.start()
+    if settings.job_worker_in_api:
+        await job_worker.start()
+    if settings.mail_sender_in_api:
+        await email_sender.start()
+    try:
+        yield
+    finally:
+        await email_sender.stop()
+        await job_worker.stop()
+        await wait_for_refinements(settings.job_shutdown_grace)
+        await ai_client.close()
+        await async_engine.dispose()
+        password_hasher.shutdown()
+
+app = FastAPI(title="SortIQ API", version="1.0.0", lifespan=lifespan)
+
+# Dynamic CORS based on env var ALLOW_ORIGINS (comma-separated). If '*', disable credentials.
+origins_env = os.getenv("ALLOW_ORIGINS")
+if origins_env:
+    origins = [o.strip() for o in origins_env.split(",") if o.strip()]
+else:
+    origins = [
+        "http://localhost:3000",
+        "http://localhost:5173",
+        "http://127.0.0.1:3000",
+        "http://127.0.0.1:5173",
+    ]
+
+allow_credentials = not (len(origins) == 1 and origins[0] == "*")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=allow_credentials,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["*"],
+)
+if settings.metrics_enabled:
+    # Outermost, so the timings include every other middleware
+    app.add_middleware(MetricsMiddleware)
+
+app.include_router(ai.router)
+app.include_router(register.router)
+app.include_router(user.router)
+app.include_router(email_verify.apirouter)
+app.include_router(email.router)
+app.include_router(tasks.router)
+app.include_router(metrics.router)
+
+@app.get("/")
+def root():
+    return {"message": "SortIQ API is running", "status": "healthy"}
+
+@app.get("/health")
+def health_check():
+    database_ok = check_database()
+    body = {
+        "status": "healthy" if database_ok else "unhealthy",
+        "database": "connected" if database_ok else "unavailable",
+        "pool": pool_status(),
+        "auth_cache": user_cache.stats(),
+    }
+    return JSONResponse(body, status_code=200 if database_ok else 503)
\ No newline at end of file
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
+from sqlalchemy.sql import func
+from ..core.db import Base
+
+class TransformJob(Base):
+    __tablename__ = "transform_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued | running | done | failed
+    tasks = Column(Text, nullable=False)  # JSON list of task strings
+    result = Column(Text, nullable=True)  # JSON TaskOutput payload once done
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String, nullable=True)
+    # running: the worker's lease deadline; queued: earliest retry time
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Workers claim the oldest queued (or lease-expired running) jobs first
+        Index("ix_transform_jobs_status_created", "status", "created_at"),
+        Index("ix_transform_jobs_user_status", "user_id", "status"),
+    )
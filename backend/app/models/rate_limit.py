@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, Float, Boolean
+from ..core.db import Base
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(128), primary_key=True)  # "<scope>:user:<id>", "<scope>:ip:<addr>", "<scope>:global"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # unix time of the last take
+    allowed = Column(Boolean, nullable=False, default=True)  # outcome of the last take
+    expires_at = Column(Float, nullable=True, index=True)  # unix time the bucket is full again; pruned after
@@ -1,15 +1,40 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
-from sqlalchemy.sql import func
-from ..core.db import Base
-
-class Task(Base):
-    __tablename__ = "tasks"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    original_task = Column(String, nullable=False)
-    smart_task = Column(String, nullable=False)
-    priority = Column(String, nullable=False)
-    status = Column(String, nullable=False, default='active')
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    
\ No newline at end of file
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+from sqlalchemy.sql import func
+from ..core.db import Base
+
+class Task(Base):
+    __tablename__ = "tasks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    original_task = Column(String, nullable=False)
+    smart_task = Column(String, nullable=False)
+    priority = Column(String, nullable=False)
+    status = Column(String, nullable=False, default='active')
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)  # set while status is 'done'
+
+    __table_args__ = (
+        # Backs keyset pagination of a user's history (newest first); status and
+        # priority ride along so filtered pages can be checked from the index
+        Index(
+            "ix_tasks_user_created_id",
+            "user_id", "created_at", "id",
+            postgresql_include=["status", "priority"],
+        ),
+        # GROUP BY status/priority for /api/tasks/stats without touching the heap
+        Index("ix_tasks_user_status_priority", "user_id", "status", "priority"),
+        # Daily completed series
+        Index("ix_tasks_user_completed", "user_id", "completed_at"),
+    )
+
+
+class TaskCount(Base):
+    """Per-user task counts by (status, priority), kept in step with the tasks
+    table by the repo functions so /api/tasks/stats doesn't have to scan it."""
+    __tablename__ = "task_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    status = Column(String, primary_key=True)
+    priority = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime, Index
+from sqlalchemy.sql import func
+from ..core.db import Base
+
+class TransformCacheEntry(Base):
+    __tablename__ = "transform_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of (model, prompt version, normalized task)
+    model = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    original_task = Column(String, nullable=False)
+    smart_task = Column(String, nullable=False)
+    priority = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Expiry sweeps (TransformCache._save_rows)
+        Index("ix_transform_cache_created", "created_at"),
+    )
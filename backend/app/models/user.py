@@ -1,14 +1,14 @@
-from sqlalchemy import Column,Integer,String,Boolean
-from ..core.db import Base
-
-class User(Base):
-    __tablename__ = "users"
-    
-    id=Column(Integer,primary_key=True,index=True)
-    username=Column(String,unique=True,index=True,nullable=False)
-    email=Column(String,unique=True,index=True,nullable=False)
-    password=Column(String,nullable=False)
-    full_name=Column(String,nullable=True)
-    is_active=Column(Boolean,default=False)
-    api_key=Column(String,nullable=True)  # Store user's API key
+from sqlalchemy import Column,Integer,String,Boolean
+from ..core.db import Base
+
+class User(Base):
+    __tablename__ = "users"
+    
+    id=Column(Integer,primary_key=True,index=True)
+    username=Column(String,unique=True,index=True,nullable=False)
+    email=Column(String,unique=True,index=True,nullable=False)
+    password=Column(String,nullable=False)
+    full_name=Column(String,nullable=True)
+    is_active=Column(Boolean,default=False)
+    api_key=Column(String,nullable=True)  # Store user's API key
     
\ No newline at end of file
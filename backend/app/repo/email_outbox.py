@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.email_outbox import OutboxEmail
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+async def enqueue_email_async(db:AsyncSession, recipient:str, subject:str, body:str, subtype:str="html"):
+    email = OutboxEmail(recipient=recipient, subject=subject, body=body, subtype=subtype, status="pending", attempts=0)
+    db.add(email)
+    await db.commit()
+    await db.refresh(email)
+    return email
+
+def _sendable(now:datetime):
+    # Same claim rules as transform jobs: due pending rows, or rows whose
+    # sender let its lease lapse mid-batch
+    return or_(
+        and_(
+            OutboxEmail.status == "pending",
+            or_(OutboxEmail.next_attempt_at.is_(None), OutboxEmail.next_attempt_at <= now),
+        ),
+        and_(OutboxEmail.status == "sending", OutboxEmail.next_attempt_at < now),
+    )
+
+async def claim_emails_async(db:AsyncSession, sender_id:str, limit:int, lease_seconds:float) -> List[OutboxEmail]:
+    """Claim up to ``limit`` due messages for ``sender_id``, oldest first."""
+    now = _utcnow()
+    candidates = (
+        select(OutboxEmail.id)
+        .where(_sendable(now))
+        .order_by(OutboxEmail.created_at, OutboxEmail.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = list((await db.execute(candidates)).scalars())
+    if not ids:
+        await db.rollback()
+        return []
+    claimed = await db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(ids), _sendable(now))
+        .values(
+            status="sending",
+            sender_id=sender_id,
+            attempts=OutboxEmail.attempts + 1,
+            next_attempt_at=now + timedelta(seconds=lease_seconds),
+        )
+        .returning(OutboxEmail)
+    )
+    emails = sorted(claimed.scalars(), key=lambda email: email.id)
+    await db.commit()
+    return emails
+
+async def mark_sent_async(db:AsyncSession, email_ids:List[int], sender_id:str):
+    if not email_ids:
+        return
+    await db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(email_ids), OutboxEmail.sender_id == sender_id)
+        .values(status="sent", sent_at=_utcnow(), next_attempt_at=None, last_error=None)
+    )
+    await db.commit()
+
+async def mark_failed_async(db:AsyncSession, email_id:int, sender_id:str, error:str, retry_in:Optional[float]=None):
+    """Record a failed attempt; requeue after ``retry_in`` seconds or give up."""
+    if retry_in is None:
+        values = {"status": "failed", "next_attempt_at": None}
+    else:
+        values = {"status": "pending", "next_attempt_at": _utcnow() + timedelta(seconds=retry_in)}
+    await db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id == email_id, OutboxEmail.sender_id == sender_id)
+        .values(last_error=error[:500], **values)
+    )
+    await db.commit()
+
+async def outbox_depth_async(db:AsyncSession):
+    """(messages waiting or in flight, created_at of the oldest of them)"""
+    row = (await db.execute(
+        select(func.count(OutboxEmail.id), func.min(OutboxEmail.created_at))
+        .where(OutboxEmail.status.in_(("pending", "sending")))
+    )).one()
+    return row[0], row[1]
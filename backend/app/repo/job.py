@@ -0,0 +1,119 @@
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.job import TransformJob
+
+PENDING_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("done", "failed")
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+async def create_job_async(db:AsyncSession, user_id:int, tasks:List[str]):
+    job = TransformJob(user_id=user_id, status="queued", tasks=json.dumps(tasks), attempts=0)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+async def get_job_async(db:AsyncSession, job_id:int, user_id:Optional[int]=None):
+    query = select(TransformJob).where(TransformJob.id == job_id)
+    if user_id is not None:
+        query = query.where(TransformJob.user_id == user_id)
+    return (await db.execute(query)).scalars().first()
+
+async def count_pending_jobs_async(db:AsyncSession, user_id:Optional[int]=None):
+    query = select(func.count(TransformJob.id)).where(TransformJob.status.in_(PENDING_STATUSES))
+    if user_id is not None:
+        query = query.where(TransformJob.user_id == user_id)
+    return (await db.execute(query)).scalar()
+
+def _claimable(now:datetime):
+    # Queued jobs whose retry delay has passed, or running jobs whose worker
+    # stopped renewing its lease (crashed or restarted mid-call)
+    return or_(
+        and_(
+            TransformJob.status == "queued",
+            or_(TransformJob.lease_expires_at.is_(None), TransformJob.lease_expires_at <= now),
+        ),
+        and_(TransformJob.status == "running", TransformJob.lease_expires_at < now),
+    )
+
+async def claim_jobs_async(db:AsyncSession, worker_id:str, limit:int, lease_seconds:float) -> List[int]:
+    """Atomically take up to ``limit`` jobs for ``worker_id``, oldest first.
+
+    Candidates are picked with FOR UPDATE SKIP LOCKED (Postgres) so
+    concurrent workers don't queue up behind each other, and the claim
+    itself is a conditional UPDATE, so a job is only ever handed to one
+    worker even where row locks are unavailable (SQLite).
+    """
+    now = _utcnow()
+    candidates = (
+        select(TransformJob.id)
+        .where(_claimable(now))
+        .order_by(TransformJob.created_at, TransformJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = list((await db.execute(candidates)).scalars())
+    if not ids:
+        await db.rollback()
+        return []
+    claimed = await db.execute(
+        update(TransformJob)
+        .where(TransformJob.id.in_(ids), _claimable(now))
+        .values(
+            status="running",
+            worker_id=worker_id,
+            attempts=TransformJob.attempts + 1,
+            started_at=now,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+        )
+        .returning(TransformJob.id)
+    )
+    claimed_ids = sorted(claimed.scalars())
+    await db.commit()
+    return claimed_ids
+
+async def renew_lease_async(db:AsyncSession, job_id:int, worker_id:str, lease_seconds:float):
+    await db.execute(
+        update(TransformJob)
+        .where(TransformJob.id == job_id, TransformJob.worker_id == worker_id, TransformJob.status == "running")
+        .values(lease_expires_at=_utcnow() + timedelta(seconds=lease_seconds))
+    )
+    await db.commit()
+
+def _held_by(job_id:int, worker_id:str):
+    # Only the worker whose claim is still current may settle a job
+    return and_(TransformJob.id == job_id, TransformJob.worker_id == worker_id, TransformJob.status == "running")
+
+async def complete_job_async(db:AsyncSession, job_id:int, worker_id:str, result:str, commit:bool=True) -> bool:
+    """Mark a job done; False if ``worker_id`` no longer holds it.
+
+    With ``commit=False`` it joins the caller's transaction, e.g. the one
+    saving the job's tasks.
+    """
+    updated = await db.execute(
+        update(TransformJob)
+        .where(_held_by(job_id, worker_id))
+        .values(status="done", result=result, error=None, finished_at=_utcnow(), lease_expires_at=None)
+    )
+    if commit:
+        await db.commit()
+    return updated.rowcount > 0
+
+async def fail_job_async(db:AsyncSession, job_id:int, worker_id:str, error:str, retry_in:Optional[float]=None):
+    """Mark a job failed, or put it back in the queue after ``retry_in`` seconds.
+    A no-op once the job is done or claimed by another worker."""
+    if retry_in is None:
+        values = {"status": "failed", "finished_at": _utcnow(), "lease_expires_at": None}
+    else:
+        values = {"status": "queued", "lease_expires_at": _utcnow() + timedelta(seconds=retry_in)}
+    await db.execute(
+        update(TransformJob)
+        .where(_held_by(job_id, worker_id))
+        .values(error=error, **values)
+    )
+    await db.commit()
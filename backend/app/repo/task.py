@@ -1,35 +1,523 @@
-from sqlalchemy.orm import Session
-from ..models.task import Task
-from ..schemas.task import ProcessedTask
-
-def create_task(db:Session,task_data:ProcessedTask,user_id:int):
-    new_task = Task(
-        user_id=user_id,
-        original_task=task_data.original_task,
-        smart_task=task_data.smart_task,
-        priority=task_data.priority
-    )
-    db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
-    return new_task 
-
-def get_tasks(db:Session, user_id:int):
-    return db.query(Task).filter(Task.user_id == user_id).all()
-
-def delete_task(db:Session, task_id:int, user_id:int):
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
-    if task:
-        db.delete(task)
-        db.commit()
-        return True
-    return False
-
-def update_task_status(db:Session, task_id:int, user_id:int, status:str):
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
-    if task:
-        task.status = status
-        db.commit()
-        db.refresh(task)
-        return task
-    return None
+import base64
+import json
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, delete, insert, func, literal_column, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.task import Task, TaskCount
+from ..schemas.task import ProcessedTask
+
+DONE_STATUS = "done"
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+def _counts_upsert(dialect:str, user_id:int, deltas:Dict[Tuple[str, str], int]):
+    """Statement adding ``deltas`` to the user's task_counts rows, or None.
+
+    Runs in the caller's transaction, so the summary commits or rolls back
+    together with the change to tasks.
+    """
+    if not settings.task_stats_summary:
+        return None
+    rows = [
+        {"user_id": user_id, "status": status, "priority": priority, "count": delta}
+        for (status, priority), delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return None
+    insert_fn = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert_fn(TaskCount).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[TaskCount.user_id, TaskCount.status, TaskCount.priority],
+        set_={"count": TaskCount.count + stmt.excluded.count},
+    )
+
+def _status_change(task:Task, status:str):
+    """Apply a status change to ``task``; returns the task_counts deltas."""
+    deltas = Counter()
+    if task.status != status:
+        deltas[(task.status, task.priority)] -= 1
+        deltas[(status, task.priority)] += 1
+    if status == DONE_STATUS:
+        if task.completed_at is None:
+            task.completed_at = _utcnow()
+    else:
+        task.completed_at = None
+    task.status = status
+    return deltas
+
+def _added(rows):
+    return Counter((row["status"], row["priority"]) for row in rows)
+
+def create_task(db:Session,task_data:ProcessedTask,user_id:int):
+    new_task = Task(
+        user_id=user_id,
+        original_task=task_data.original_task,
+        smart_task=task_data.smart_task,
+        priority=task_data.priority,
+        status="active",
+    )
+    db.add(new_task)
+    counts = _counts_upsert(db.get_bind().dialect.name, user_id, {("active", new_task.priority): 1})
+    if counts is not None:
+        db.execute(counts)
+    db.commit()
+    db.refresh(new_task)
+    return new_task
+
+async def create_task_async(db:AsyncSession,task_data:ProcessedTask,user_id:int):
+    new_task = Task(
+        user_id=user_id,
+        original_task=task_data.original_task,
+        smart_task=task_data.smart_task,
+        priority=task_data.priority,
+        status="active",
+    )
+    db.add(new_task)
+    counts = _counts_upsert(db.get_bind().dialect.name, user_id, {("active", new_task.priority): 1})
+    if counts is not None:
+        await db.execute(counts)
+    await db.commit()
+    await db.refresh(new_task)
+    return new_task
+
+def _bulk_rows(tasks:List[ProcessedTask], user_id:int):
+    return [
+        {
+            "user_id": user_id,
+            "original_task": task.original_task,
+            "smart_task": task.smart_task,
+            "priority": task.priority,
+            "status": "active",
+        }
+        for task in tasks
+    ]
+
+def _bulk_result(rows, returned):
+    return [
+        {**row, "id": task_id, "created_at": created_at}
+        for row, (task_id, created_at) in zip(rows, returned)
+    ]
+
+_bulk_insert = insert(Task).returning(Task.id, Task.created_at, sort_by_parameter_order=True)
+
+def create_tasks_bulk(db:Session, tasks:List[ProcessedTask], user_id:int):
+    """Insert many tasks in one transaction.
+
+    Runs as a multi-row INSERT ... RETURNING id, created_at (batched by
+    SQLAlchemy's insertmanyvalues) instead of an INSERT + SELECT per task.
+    Returns plain dicts in input order, shaped like TaskDetail.
+    """
+    if not tasks:
+        return []
+    rows = _bulk_rows(tasks, user_id)
+    try:
+        returned = db.execute(_bulk_insert, rows).all()
+        counts = _counts_upsert(db.get_bind().dialect.name, user_id, _added(rows))
+        if counts is not None:
+            db.execute(counts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return _bulk_result(rows, returned)
+
+async def create_tasks_bulk_async(
+    db:AsyncSession,
+    tasks:List[ProcessedTask],
+    user_id:int,
+    before_commit:Optional[Callable[[List[dict]], Awaitable[None]]]=None,
+):
+    """create_tasks_bulk for AsyncSession. ``before_commit(saved)`` runs in
+    the same transaction, so whatever it records commits (or rolls back)
+    together with the tasks."""
+    if not tasks and before_commit is None:
+        return []
+    rows = _bulk_rows(tasks, user_id)
+    try:
+        saved = []
+        if rows:
+            returned = (await db.execute(_bulk_insert, rows)).all()
+            counts = _counts_upsert(db.get_bind().dialect.name, user_id, _added(rows))
+            if counts is not None:
+                await db.execute(counts)
+            saved = _bulk_result(rows, returned)
+        if before_commit is not None:
+            await before_commit(saved)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return saved
+
+def get_tasks(db:Session, user_id:int):
+    return db.query(Task).filter(Task.user_id == user_id).all()
+
+def encode_cursor(created_at: datetime, task_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), task_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def _page_query(
+    dialect:str,
+    user_id:int,
+    cursor:Optional[str],
+    status:Optional[str],
+    priority:Optional[str],
+):
+    """Filtered, unordered select for get_tasks_page; raises ValueError on a bad cursor."""
+    query = select(Task).where(Task.user_id == user_id)
+    if status:
+        query = query.where(Task.status == status)
+    if priority:
+        query = query.where(Task.priority == priority)
+    seek = None
+    if cursor:
+        created_at, task_id = decode_cursor(cursor)
+        bound = created_at
+        if dialect == "sqlite":
+            # SQLite keeps timestamps as text and CURRENT_TIMESTAMP has no
+            # fractional part; normalise the bound value to compare equal
+            bound = func.datetime(created_at)
+        seek = tuple_(Task.created_at, Task.id) < tuple_(bound, task_id)
+    return query, seek
+
+def _count_query(query):
+    return select(func.count()).select_from(query.subquery())
+
+def _finish_page(rows, limit:Optional[int]):
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
+
+def _limit_page(query, seek, limit:Optional[int]):
+    if seek is not None:
+        query = query.where(seek)
+    query = query.order_by(Task.created_at.desc(), Task.id.desc())
+    if limit is not None:
+        # Fetch one extra row to learn whether another page exists
+        query = query.limit(limit + 1)
+    return query
+
+def get_tasks_page(
+    db:Session,
+    user_id:int,
+    limit:Optional[int],
+    cursor:Optional[str]=None,
+    status:Optional[str]=None,
+    priority:Optional[str]=None,
+    include_total:bool=False,
+):
+    """One page of a user's tasks, newest first, using keyset pagination.
+
+    Seeks past ``cursor`` on (created_at, id) via ix_tasks_user_created_id, so
+    the cost of a page does not grow with history size. ``limit=None`` returns
+    everything after the cursor. Returns ``(tasks, next_cursor, total)``;
+    ``total`` is only counted when asked for.
+    """
+    query, seek = _page_query(db.get_bind().dialect.name, user_id, cursor, status, priority)
+    total = db.execute(_count_query(query)).scalar() if include_total else None
+    rows = db.execute(_limit_page(query, seek, limit)).scalars().all()
+    rows, next_cursor = _finish_page(rows, limit)
+    return rows, next_cursor, total
+
+async def get_tasks_page_async(
+    db:AsyncSession,
+    user_id:int,
+    limit:Optional[int],
+    cursor:Optional[str]=None,
+    status:Optional[str]=None,
+    priority:Optional[str]=None,
+    include_total:bool=False,
+):
+    """AsyncSession version of get_tasks_page."""
+    query, seek = _page_query(db.get_bind().dialect.name, user_id, cursor, status, priority)
+    total = (await db.execute(_count_query(query))).scalar() if include_total else None
+    rows = (await db.execute(_limit_page(query, seek, limit))).scalars().all()
+    rows, next_cursor = _finish_page(rows, limit)
+    return rows, next_cursor, total
+
+def delete_task(db:Session, task_id:int, user_id:int):
+    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+    if task:
+        db.delete(task)
+        counts = _counts_upsert(db.get_bind().dialect.name, user_id, {(task.status, task.priority): -1})
+        if counts is not None:
+            db.execute(counts)
+        db.commit()
+        return True
+    return False
+
+def update_task_status(db:Session, task_id:int, user_id:int, status:str):
+    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+    if task:
+        counts = _counts_upsert(db.get_bind().dialect.name, user_id, _status_change(task, status))
+        if counts is not None:
+            db.execute(counts)
+        db.commit()
+        db.refresh(task)
+        return task
+    return None
+
+async def _get_owned_task(db:AsyncSession, task_id:int, user_id:int):
+    result = await db.execute(select(Task).where(Task.id == task_id, Task.user_id == user_id))
+    return result.scalars().first()
+
+async def delete_task_async(db:AsyncSession, task_id:int, user_id:int):
+    task = await _get_owned_task(db, task_id, user_id)
+    if task:
+        await db.delete(task)
+        counts = _counts_upsert(db.get_bind().dialect.name, user_id, {(task.status, task.priority): -1})
+        if counts is not None:
+            await db.execute(counts)
+        await db.commit()
+        return True
+    return False
+
+async def update_task_status_async(db:AsyncSession, task_id:int, user_id:int, status:str):
+    task = await _get_owned_task(db, task_id, user_id)
+    if task:
+        counts = _counts_upsert(db.get_bind().dialect.name, user_id, _status_change(task, status))
+        if counts is not None:
+            await db.execute(counts)
+        await db.commit()
+        await db.refresh(task)
+        return task
+    return None
+
+def _selection(user_id:int, ids:Optional[List[int]], status:Optional[str], priority:Optional[str]):
+    conditions = [Task.user_id == user_id]
+    if ids is not None:
+        conditions.append(Task.id.in_(ids))
+    if status:
+        conditions.append(Task.status == status)
+    if priority:
+        conditions.append(Task.priority == priority)
+    return conditions
+
+async def _apply_counts(db:AsyncSession, user_id:int, deltas:Dict[Tuple[str, str], int]):
+    counts = _counts_upsert(db.get_bind().dialect.name, user_id, deltas)
+    if counts is not None:
+        await db.execute(counts)
+
+async def _lock_rows(db:AsyncSession, conditions, *columns):
+    """``(id, status, priority, *columns)`` of the matching tasks, locked until commit.
+
+    Bulk changes read the old values this way so task_counts can be moved
+    by deltas, like single-task changes; SQLite has no FOR UPDATE but only
+    ever runs one writer.
+    """
+    stmt = select(Task.id, Task.status, Task.priority, *columns).where(*conditions).with_for_update()
+    return (await db.execute(stmt)).all()
+
+# Ids per UPDATE ... WHERE id IN (...), well under SQLite's bound-parameter limit
+_ID_CHUNK = 500
+
+async def update_tasks_status_async(
+    db:AsyncSession,
+    user_id:int,
+    status:str,
+    ids:Optional[List[int]]=None,
+    status_filter:Optional[str]=None,
+    priority:Optional[str]=None,
+) -> List[int]:
+    """Set the status of many tasks; returns the ids that matched, sorted.
+
+    Selects by ``ids`` and/or the filters (always scoped to ``user_id``). The
+    matching rows are read and locked first (_lock_rows), so task_counts can
+    be moved by deltas, then updated by id, ``_ID_CHUNK`` ids per UPDATE.
+    """
+    completed_at = func.coalesce(Task.completed_at, _utcnow()) if status == DONE_STATUS else None
+    try:
+        rows = await _lock_rows(db, _selection(user_id, ids, status_filter, priority))
+        affected = sorted(row.id for row in rows)
+        for start in range(0, len(affected), _ID_CHUNK):
+            await db.execute(
+                update(Task)
+                .where(Task.id.in_(affected[start:start + _ID_CHUNK]))
+                .values(status=status, completed_at=completed_at)
+                .execution_options(synchronize_session=False)
+            )
+        deltas = Counter()
+        for row in rows:
+            if row.status != status:
+                deltas[(row.status, row.priority)] -= 1
+                deltas[(status, row.priority)] += 1
+        await _apply_counts(db, user_id, deltas)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return affected
+
+async def delete_tasks_async(
+    db:AsyncSession,
+    user_id:int,
+    ids:Optional[List[int]]=None,
+    status_filter:Optional[str]=None,
+    priority:Optional[str]=None,
+) -> List[int]:
+    """Delete many tasks in one DELETE ... RETURNING id; same selection as update_tasks_status_async."""
+    stmt = (
+        delete(Task)
+        .where(*_selection(user_id, ids, status_filter, priority))
+        .returning(Task.id, Task.status, Task.priority)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        rows = (await db.execute(stmt)).all()
+        await _apply_counts(db, user_id, {key: -count for key, count in Counter((row.status, row.priority) for row in rows).items()})
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return sorted(row.id for row in rows)
+
+_rewrite_update = (
+    Task.__table__.update()
+    .where(
+        Task.id == bindparam("task_id"),
+        Task.user_id == bindparam("owner_id"),
+        Task.smart_task == bindparam("expected_smart_task"),
+    )
+    .values(smart_task=bindparam("new_smart_task"), priority=bindparam("new_priority"))
+)
+
+async def update_task_rewrites_async(db:AsyncSession, user_id:int, rewrites:List[Tuple[int, str, ProcessedTask]]) -> int:
+    """Replace provisional rewrites with final ones; returns how many rows changed.
+
+    ``rewrites`` are ``(task_id, provisional smart_task, final task)``. A row
+    is only touched while it still holds the provisional text.
+    """
+    if not rewrites:
+        return 0
+    try:
+        rows = await _lock_rows(db, [Task.user_id == user_id, Task.id.in_([task_id for task_id, _, _ in rewrites])], Task.smart_task)
+        current = {row.id: row for row in rows}
+        params, deltas = [], Counter()
+        for task_id, provisional, task in rewrites:
+            row = current.get(task_id)
+            if row is None or row.smart_task != provisional:
+                continue  # deleted or edited since
+            params.append({
+                "task_id": task_id,
+                "owner_id": user_id,
+                "expected_smart_task": provisional,
+                "new_smart_task": task.smart_task,
+                "new_priority": task.priority,
+            })
+            if row.priority != task.priority:
+                deltas[(row.status, row.priority)] -= 1
+                deltas[(row.status, task.priority)] += 1
+        if params:
+            await db.execute(_rewrite_update, params)
+            await _apply_counts(db, user_id, deltas)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return len(params)
+
+def rebuild_task_counts(db:Session) -> int:
+    """Recompute task_counts from the tasks table; returns the rows written."""
+    grouped = (
+        select(Task.user_id, Task.status, Task.priority, func.count(Task.id))
+        .group_by(Task.user_id, Task.status, Task.priority)
+    )
+    db.execute(delete(TaskCount))
+    result = db.execute(
+        insert(TaskCount).from_select(["user_id", "status", "priority", "count"], grouped)
+    )
+    db.commit()
+    return result.rowcount
+
+def ensure_task_counts(db:Session):
+    """Backfill task_counts on first start with the summary enabled."""
+    if not settings.task_stats_summary:
+        return
+    if db.execute(select(TaskCount.user_id).limit(1)).first() is None:
+        try:
+            rebuild_task_counts(db)
+        except IntegrityError:
+            # Another process starting at the same time got there first
+            db.rollback()
+
+def _day_bound(dialect:str, day:date):
+    bound = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    # See _page_query: compare SQLite's text timestamps in their own format
+    return func.datetime(bound) if dialect == "sqlite" else bound
+
+def _daily_query(dialect:str, column, user_id:int, since):
+    # Postgres would take the day in the session's time zone; SQLite's
+    # timestamps are already UTC text. A literal, not a bound parameter, so
+    # the expression in GROUP BY is identical under asyncpg's $n placeholders
+    utc = func.timezone(literal_column("'UTC'"), column) if dialect == "postgresql" else column
+    day = func.date(utc)
+    return (
+        select(day, func.count())
+        .where(Task.user_id == user_id, column >= since)
+        .group_by(day)
+    )
+
+async def get_task_stats_async(db:AsyncSession, user_id:int, days:int):
+    """Counts by status and priority plus daily created/completed series.
+
+    Counts come from task_counts when the summary is enabled, otherwise from
+    a GROUP BY on ix_tasks_user_status_priority. The series covers the last
+    ``days`` days (UTC, today included) with missing days filled with zeros.
+    """
+    if settings.task_stats_summary:
+        grouped = select(TaskCount.status, TaskCount.priority, TaskCount.count).where(
+            TaskCount.user_id == user_id, TaskCount.count > 0
+        )
+    else:
+        grouped = (
+            select(Task.status, Task.priority, func.count(Task.id))
+            .where(Task.user_id == user_id)
+            .group_by(Task.status, Task.priority)
+        )
+    by_status, by_priority = Counter(), Counter()
+    for status, priority, count in (await db.execute(grouped)).all():
+        by_status[status] += count
+        by_priority[priority] += count
+    total = sum(by_status.values())
+
+    dialect = db.get_bind().dialect.name
+    today = _utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    since = _day_bound(dialect, first_day)
+    created = dict((await db.execute(_daily_query(dialect, Task.created_at, user_id, since))).all())
+    completed = dict((await db.execute(_daily_query(dialect, Task.completed_at, user_id, since))).all())
+    # date() comes back as a date on Postgres and as text on SQLite
+    created = {str(day): count for day, count in created.items()}
+    completed = {str(day): count for day, count in completed.items()}
+    daily = []
+    for offset in range(days):
+        day = (first_day + timedelta(days=offset)).isoformat()
+        daily.append({"date": day, "created": created.get(day, 0), "completed": completed.get(day, 0)})
+
+    return {
+        "total": total,
+        "by_status": dict(by_status),
+        "by_priority": dict(by_priority),
+        "completion_rate": round(by_status[DONE_STATUS] / total, 4) if total else 0.0,
+        "daily": daily,
+    }
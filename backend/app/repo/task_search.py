@@ -0,0 +1,178 @@
+import html
+import logging
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import cast, column, func, literal, literal_column, or_, select, table, text
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.db import engine
+from ..models.task import Task
+
+logger = logging.getLogger(__name__)
+
+# Snippet delimiters: control characters that can't come from a user's text,
+# swapped for <mark> tags after the rest of the snippet is HTML-escaped
+_MARK_START, _MARK_END = "\x02", "\x03"
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+MAX_QUERY_TERMS = 16
+
+# Which index ensure_task_search() found: "postgres", "fts5" or "like"
+_backend = "like"
+
+_PG_DDL = [
+    """ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (
+           to_tsvector('{language}', coalesce(original_task, '') || ' ' || coalesce(smart_task, ''))
+       ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+]
+
+# External-content FTS5 table over tasks, kept in sync by triggers
+_FTS5_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+           original_task, smart_task, content='tasks', content_rowid='id', tokenize='porter unicode61'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+           INSERT INTO tasks_fts(rowid, original_task, smart_task) VALUES (new.id, new.original_task, new.smart_task);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+           INSERT INTO tasks_fts(tasks_fts, rowid, original_task, smart_task) VALUES ('delete', old.id, old.original_task, old.smart_task);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF original_task, smart_task ON tasks BEGIN
+           INSERT INTO tasks_fts(tasks_fts, rowid, original_task, smart_task) VALUES ('delete', old.id, old.original_task, old.smart_task);
+           INSERT INTO tasks_fts(rowid, original_task, smart_task) VALUES (new.id, new.original_task, new.smart_task);
+       END""",
+]
+
+def ensure_task_search():
+    """Create the full-text index for the configured database, once per start.
+
+    Postgres gets a generated tsvector column with a GIN index (adding it
+    rewrites tasks once); SQLite an FTS5 table maintained by triggers,
+    backfilled when first created. Anything else falls back to LIKE.
+    """
+    global _backend
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        with engine.begin() as conn:
+            for ddl in _PG_DDL:
+                conn.execute(text(ddl.format(language=settings.task_search_language)))
+        _backend = "postgres"
+    elif dialect == "sqlite":
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'")).first()
+                for ddl in _FTS5_DDL:
+                    conn.execute(text(ddl))
+                if not exists:
+                    conn.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+            _backend = "fts5"
+        except OperationalError as e:
+            logger.warning("SQLite FTS5 unavailable, task search falls back to LIKE: %s", e)
+    logger.info("Task search backend: %s", _backend)
+
+def query_terms(query:str) -> List[str]:
+    """Words of a search box query; punctuation and operators are dropped."""
+    return _TOKEN.findall(query.lower())[:MAX_QUERY_TERMS]
+
+def _highlight(snippet:Optional[str]) -> str:
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+def _postgres_query(user_id:int, terms:List[str], limit:int, offset:int):
+    language = cast(literal(settings.task_search_language), REGCONFIG)
+    # Every term must match; the last one as a prefix for search-as-you-type
+    tsquery = func.to_tsquery(language, " & ".join(terms) + ":*")
+    vector = literal_column("tasks.search_vector")
+    rank = func.ts_rank_cd(vector, tsquery)
+    page = (
+        select(Task.id, rank.label("rank"))
+        .where(Task.user_id == user_id, vector.op("@@")(tsquery))
+        .order_by(rank.desc(), Task.created_at.desc(), Task.id.desc())
+        .limit(limit + 1)
+        .offset(offset)
+        .subquery()
+    )
+    # ts_headline is the expensive part; only run it for the rows on the page
+    options = f"StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=30, MinWords=10"
+    return (
+        select(
+            Task,
+            page.c.rank,
+            func.ts_headline(language, Task.original_task, tsquery, options),
+            func.ts_headline(language, Task.smart_task, tsquery, options),
+        )
+        .join(page, page.c.id == Task.id)
+        .order_by(page.c.rank.desc(), Task.created_at.desc(), Task.id.desc())
+    )
+
+def _fts5_query(user_id:int, terms:List[str], limit:int, offset:int):
+    fts = table("tasks_fts", column("rowid"))
+    fts_table = literal_column("tasks_fts")
+    match = " ".join(f'"{term}"' for term in terms[:-1])
+    match = f'{match} "{terms[-1]}"*'.strip()
+    # bm25() is lower-is-better; negate it so rank reads like ts_rank
+    rank = -func.bm25(fts_table)
+    return (
+        select(
+            Task,
+            rank.label("rank"),
+            func.snippet(fts_table, 0, _MARK_START, _MARK_END, "…", 16),
+            func.snippet(fts_table, 1, _MARK_START, _MARK_END, "…", 16),
+        )
+        .select_from(fts.join(Task, Task.id == fts.c.rowid))
+        .where(fts_table.op("MATCH")(match), Task.user_id == user_id)
+        .order_by(rank.desc(), Task.created_at.desc(), Task.id.desc())
+        .limit(limit + 1)
+        .offset(offset)
+    )
+
+def _like_query(user_id:int, terms:List[str], limit:int, offset:int):
+    conditions = [
+        or_(Task.original_task.ilike(f"%{term}%"), Task.smart_task.ilike(f"%{term}%"))
+        for term in terms
+    ]
+    return (
+        select(Task, literal(0.0), Task.original_task, Task.smart_task)
+        .where(Task.user_id == user_id, *conditions)
+        .order_by(Task.created_at.desc(), Task.id.desc())
+        .limit(limit + 1)
+        .offset(offset)
+    )
+
+async def search_tasks_async(
+    db:AsyncSession,
+    user_id:int,
+    query:str,
+    limit:int,
+    offset:int=0,
+) -> Tuple[List[dict], Optional[int]]:
+    """Ranked full-text search over a user's tasks.
+
+    Returns ``(hits, next_offset)``; each hit is a TaskDetail-shaped dict plus
+    ``rank`` and HTML-escaped ``original_highlight``/``smart_highlight`` with
+    matches wrapped in <mark>. ``next_offset`` is None on the last page.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], None
+    build = {"postgres": _postgres_query, "fts5": _fts5_query}.get(_backend, _like_query)
+    rows = (await db.execute(build(user_id, terms, limit, offset))).all()
+    next_offset = offset + limit if len(rows) > limit else None
+    hits = []
+    for task, rank, original, smart in rows[:limit]:
+        hits.append({
+            "id": task.id,
+            "user_id": task.user_id,
+            "original_task": task.original_task,
+            "smart_task": task.smart_task,
+            "priority": task.priority,
+            "status": task.status,
+            "created_at": task.created_at,
+            "rank": round(float(rank or 0.0), 6),
+            "original_highlight": _highlight(original),
+            "smart_highlight": _highlight(smart),
+        })
+    return hits, next_offset
@@ -1,35 +1,77 @@
-from sqlalchemy.orm import Session
-from ..models.user import User
-from ..schemas.user import UserCreate
-from ..utils.hashing import Hash
-
-class userRepo:
-    @staticmethod
-    def create_user(db: Session,user: UserCreate):
-        hashed_pwd=Hash.bcrypt(user.password)
-        db_user= User(
-            username=user.username,
-            email=user.email,
-            password=hashed_pwd,
-            full_name=user.full_name,
-            is_active=False
-        )
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
-        return db_user
-        
-
-
-    @staticmethod
-    def auth_user(db:Session,email:str,password:str):
-        user=db.query(User).filter(User.email == email).first()
-        if not user:
-            return None
-        if not Hash.verify(password,user.password):
-            return None
-        return user
-
-    @staticmethod
-    def get_by_email(db:Session, email:str):
-        return db.query(User).filter(User.email == email).first()
\ No newline at end of file
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models.user import User
+from ..schemas.user import UserCreate
+from ..utils.hashing import Hash, password_hasher
+
+class userRepo:
+    @staticmethod
+    def create_user(db: Session,user: UserCreate,hashed_password: Optional[str]=None):
+        # Async callers hash on the password_hasher pool and pass the result in
+        hashed_pwd=hashed_password or Hash.bcrypt(user.password)
+        db_user= User(
+            username=user.username,
+            email=user.email,
+            password=hashed_pwd,
+            full_name=user.full_name,
+            is_active=False
+        )
+        db.add(db_user)
+        db.commit()
+        db.refresh(db_user)
+        return db_user
+        
+
+
+    @staticmethod
+    def auth_user(db:Session,email:str,password:str):
+        user=db.query(User).filter(User.email == email).first()
+        if not user:
+            return None
+        if not Hash.verify(password,user.password):
+            return None
+        return user
+
+    @staticmethod
+    def get_by_email(db:Session, email:str):
+        return db.query(User).filter(User.email == email).first()
+
+
+class asyncUserRepo:
+    """userRepo for AsyncSession; bcrypt runs on the password_hasher pool."""
+
+    @staticmethod
+    async def create_user(db: AsyncSession,user: UserCreate,hashed_password: Optional[str]=None):
+        hashed_pwd=hashed_password or await password_hasher.hash(user.password)
+        db_user= User(
+            username=user.username,
+            email=user.email,
+            password=hashed_pwd,
+            full_name=user.full_name,
+            is_active=False
+        )
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return db_user
+
+    @staticmethod
+    async def auth_user(db:AsyncSession,email:str,password:str):
+        user=await asyncUserRepo.get_by_email(db,email)
+        if not user:
+            return None
+        if not await password_hasher.verify(password,user.password):
+            return None
+        return user
+
+    @staticmethod
+    async def get_by_email(db:AsyncSession, email:str):
+        result=await db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_by_username(db:AsyncSession, username:str):
+        result=await db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
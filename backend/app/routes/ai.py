@@ -1,377 +1,285 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, Body
-from typing import List, Optional, Dict, Any
-from pydantic import validator
-import logging
-import time
-import random
-from datetime import datetime, timedelta
-from ..utils.security import get_current_user
-from ..models.user import User
-from ..schemas.task import TaskInput, TaskOutput, ProcessedTask, TaskDetail
-from pydantic import BaseModel
-import requests
-import json
-from cachetools import TTLCache
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
-
-class TransformRequest(BaseModel):
-    tasks: List[str]
-    
-    class Config:
-        extra = "forbid"  # Reject any extra fields
-        
-    @validator('tasks')
-    def validate_tasks(cls, v):
-        if not v:
-            raise ValueError("Tasks list cannot be empty")
-        if any(not task.strip() for task in v):
-            raise ValueError("Tasks cannot be empty strings")
-        return v
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-router=APIRouter(
-    prefix="/api/ai",
-    tags=["AI task"]
-)
-
-# No longer need server API key since users must provide their own
-
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL = "z-ai/glm-4.5-air:free"  # More reliable for structured JSON output
-
-# Rate limiting cache: key = user_id, value = last request timestamp
-request_cache = TTLCache(maxsize=1000, ttl=60)  # 60 seconds TTL
-
-def setup_retry_session(retries=3, backoff_factor=0.5):
-    session = requests.Session()
-    retry = Retry(
-        total=retries,
-        read=retries,
-        connect=retries,
-        backoff_factor=backoff_factor,
-        status_forcelist=[429, 500, 502, 503, 504],
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    return session
-
-@router.post("/transform", response_model=TaskOutput)
-def process_tasks(data: TransformRequest, current_user: User = Depends(get_current_user)):
-    # Rate limiting check
-    user_id = current_user.id
-    last_request = request_cache.get(user_id)
-    now = datetime.now()
-    
-    if last_request is not None:
-        time_since_last = (now - last_request).total_seconds()
-        if time_since_last < 2:  # Minimum 2 seconds between requests
-            raise HTTPException(
-                status_code=429,
-                detail=f"Too many requests. Please wait {2 - time_since_last:.1f} seconds."
-            )
-    try:
-        # Log incoming request
-        logger.info(f"Received request from user: {current_user.email}")
-        logger.info(f"Request data: {data}")
-        logger.info(f"Request tasks: {data.tasks}")
-        logger.info(f"User stored API key: {current_user.api_key[:10] if current_user.api_key else 'None'}...")
-        
-        # Validate tasks
-        if not data.tasks or len(data.tasks) == 0:
-            logger.error("No tasks provided in the request")
-            raise HTTPException(status_code=400, detail="No tasks provided")
-        
-        # Validate API key from user's profile
-        if not current_user.api_key or not current_user.api_key.strip():
-            logger.error("No API key found in user profile")
-            raise HTTPException(status_code=400, detail="API key not found. Please set your API key in your profile first.")
-        
-        # Create TaskInput object
-        task_input = TaskInput(
-            tasks=data.tasks,
-            user_id=current_user.id
-        )
-        
-        logger.info(f"Processing {len(data.tasks)} tasks for user {current_user.id}")
-    except Exception as e:
-        logger.error(f"Error processing request: {str(e)}")
-        logger.error(f"Exception type: {type(e)}")
-        raise HTTPException(status_code=400, detail=f"Error processing request: {str(e)}")
-        
-    # Use the user's stored API key
-    active_api_key = current_user.api_key
-    logger.info("Using user's stored API key")
-    
-    # Create the prompt with tasks
-    tasks_text = "\n".join(data.tasks)
-    prompt = (
-        "You are an AI productivity assistant. "
-        "Take the following messy task list and return each task in SMART format "
-        "(Specific, Measurable, Achievable, Relevant, Time-bound). "
-        "Also assign a priority (High, Medium, Low) to each. "
-        "Respond in JSON array format where each object has these exact fields:\n"
-        "1. original_task: the original task text\n"
-        "2. smart_task: the SMART version of the task\n"
-        "3. priority: either 'High', 'Medium', or 'Low'\n"
-        "Example: [{ \"original_task\": \"write report\", "
-        "\"smart_task\": \"Complete 5-page quarterly report with sales data analysis by next Friday\", "
-        "\"priority\": \"High\" }]"
-        f"\n\nTasks to transform:\n{tasks_text}"
-    )
-
-    body = {
-        "model": MODEL,
-        "messages": [
-            {"role": "system", "content": "You are a helpful productivity assistant."},
-            {"role": "user", "content": prompt}
-        ]
-    }
-
-    headers = {
-        "Authorization": f"Bearer {active_api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://sortiq.com",  # Replace with your actual domain
-        "X-Title": "SortIQ Task Transformer",
-    }
-    try:
-        # Update rate limiting cache
-        request_cache[user_id] = now
-        
-        # Log API request details for debugging
-        logger.info(f"Sending request to {API_URL} for model {MODEL}")
-        logger.info(f"Request headers: {headers}")
-        logger.info(f"Request body: {json.dumps(body, indent=2)}")
-        
-        # Use session with retry logic
-        session = setup_retry_session()
-        response = session.post(API_URL, json=body, headers=headers)
-        
-        # Log response details
-        logger.info(f"Response status: {response.status_code}")
-        logger.info(f"Response headers: {dict(response.headers)}")
-        
-        try:
-            response_json = response.json()
-            logger.info(f"Response body: {json.dumps(response_json, indent=2)}")
-        except json.JSONDecodeError:
-            logger.error(f"Failed to decode response as JSON: {response.text}")
-        
-        if response.status_code == 429:
-            # Handle rate limit specifically
-            retry_after = int(response.headers.get('Retry-After', 5))
-            raise HTTPException(
-                status_code=429,
-                detail=f"Rate limit exceeded. Please try again in {retry_after} seconds."
-            )
-            
-        response.raise_for_status()
-        
-        # Log successful API call
-        logger.info("Successfully received response from AI API")
-        
-        # Parse the response
-        data = response.json()
-        if not data or "choices" not in data or not data["choices"]:
-            logger.error("Invalid response format from AI API")
-            logger.error(f"Raw response: {response.text}")
-            raise HTTPException(
-                status_code=500,
-                detail="Invalid response format from AI API"
-            )
-
-        ai_reply = data["choices"][0]["message"]["content"]
-        if not ai_reply:
-            logger.error("Empty response content from AI API")
-            raise HTTPException(
-                status_code=500,
-                detail="Empty response from AI API"
-            )
-        
-        # Log AI response (first 100 chars)
-        logger.info(f"AI reply received: {ai_reply[:100]}...")
-        
-        # Clean up the response string
-        ai_reply = ai_reply.strip()
-        
-        # Handle code blocks with markdown backticks (```json)
-        if ai_reply.startswith('```'):
-            # Find the first actual JSON content after the opening code fence
-            content_start = ai_reply.find('\n')
-            if content_start != -1:
-                # Skip the first line with ```json
-                ai_reply = ai_reply[content_start:].strip()
-                
-            # Remove closing code fence if present
-            if '```' in ai_reply:
-                closing_fence = ai_reply.rfind('```')
-                ai_reply = ai_reply[:closing_fence].strip()
-        
-        # Find JSON array if it doesn't start with [
-        if not ai_reply.startswith('['):
-            start_idx = ai_reply.find('[')
-            if start_idx != -1:
-                ai_reply = ai_reply[start_idx:]
-        
-        # Log the cleaned JSON for debugging
-        logger.info(f"Full AI reply before parsing: {ai_reply}")
-        
-        # Additional cleanup for common JSON formatting issues
-        ai_reply = ai_reply.replace('\n', ' ').replace('\r', '')  # Remove newlines
-        ai_reply = ai_reply.strip()
-        
-        # Try to find valid JSON in the response
-        try:
-            # First, try parsing as is
-            try:
-                processed_tasks = json.loads(ai_reply)
-            except json.JSONDecodeError:
-                # If that fails, try to find a JSON array in the text
-                start_idx = ai_reply.find('[')
-                end_idx = ai_reply.rfind(']') + 1
-                
-                if start_idx != -1 and end_idx > start_idx:
-                    potential_json = ai_reply[start_idx:end_idx]
-                    logger.info(f"Attempting to parse extracted JSON: {potential_json}")
-                    processed_tasks = json.loads(potential_json)
-                else:
-                    raise json.JSONDecodeError("No JSON array found in response", ai_reply, 0)
-            
-            if not isinstance(processed_tasks, list):
-                raise ValueError("Expected a JSON array of tasks")
-            
-            output = []
-            for task in processed_tasks:
-                # Ensure required fields are present - check both field naming conventions
-                # Some models might return "task" while others "original_task"
-                has_fields = True
-                
-                if 'original_task' in task and 'smart_task' in task and 'priority' in task:
-                    # Already has the correct field names
-                    original = task['original_task']
-                    smart = task['smart_task']
-                    priority = task['priority']
-                elif 'task' in task and 'smart_task' in task and 'priority' in task:
-                    # Using "task" instead of "original_task"
-                    original = task['task']
-                    smart = task['smart_task']
-                    priority = task['priority']
-                else:
-                    logger.error(f"Missing required fields in task: {task}")
-                    has_fields = False
-                
-                if not has_fields:
-                    continue
-                    
-                # Convert task to ProcessedTask
-                processed_task = ProcessedTask(
-                    original_task=original,
-                    smart_task=smart,
-                    priority=priority
-                )
-                output.append(processed_task)
-            
-            if not output:
-                raise ValueError("No valid tasks found in response")
-            
-            # Save tasks to database
-            from ..core.db import get_db
-            db = next(get_db())
-            from ..repo.task import create_task
-            
-            saved_tasks = []
-            for task in output:
-                saved_task = create_task(db, task, current_user.id)
-                saved_tasks.append({
-                    "id": saved_task.id,
-                    "original_task": saved_task.original_task,
-                    "smart_task": saved_task.smart_task,
-                    "priority": saved_task.priority,
-                    "created_at": saved_task.created_at.isoformat()
-                })
-            
-            logger.info(f"Successfully processed and saved {len(output)} tasks")
-            return {"processed_tasks": output, "saved_tasks": saved_tasks}
-            
-        except json.JSONDecodeError as json_err:
-            logger.error(f"JSON parse error: {str(json_err)}")
-            logger.error(f"Raw AI response: {ai_reply}")
-            
-            # Try to get a better error message by looking at the response content
-            error_msg = "Failed to parse AI response as JSON."
-            if "```json" in ai_reply:
-                error_msg += " Response contains code blocks that need cleaning."
-            elif "[" not in ai_reply or "]" not in ai_reply:
-                error_msg += " Response does not contain a JSON array."
-            elif "{" not in ai_reply or "}" not in ai_reply:
-                error_msg += " Response does not contain JSON objects."
-            else:
-                error_msg += " Invalid JSON format in response."
-            
-            raise HTTPException(
-                status_code=500,
-                detail=error_msg
-            )
-        except ValueError as val_err:
-            logger.error(f"Validation error: {str(val_err)}")
-            logger.error(f"Raw AI response: {ai_reply}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Invalid response format: {str(val_err)}"
-            )
-    except requests.exceptions.RequestException as req_err:
-        logger.error(f"Request error: {str(req_err)}")
-        response_text = None
-        error_detail = None
-        
-        try:
-            if hasattr(req_err, 'response') and req_err.response is not None:
-                response_text = req_err.response.text
-                response_json = req_err.response.json()
-                error_detail = response_json.get('error', {}).get('message')
-                logger.error(f"Response JSON: {json.dumps(response_json, indent=2)}")
-        except Exception as e:
-            logger.error(f"Failed to parse error response: {e}")
-            if response_text:
-                logger.error(f"Raw response text: {response_text}")
-        
-        if error_detail:
-            raise HTTPException(
-                status_code=500,
-                detail=f"API Error: {error_detail}"
-            )
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to get response from AI API. Please check your API key and try again."
-            )
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
-        logger.error(f"Error traceback:", exc_info=True)
-        
-        # Log the state of variables
-        logger.error(f"Request body: {body}")
-        logger.error(f"API URL: {API_URL}")
-        logger.error(f"Headers (redacted): {
-            {k: '***' if k == 'Authorization' else v for k, v in headers.items()}
-        }")
-        
-        if 'response' in locals():
-            logger.error(f"Response text: {response.text}")
-            logger.error(f"Response status: {response.status_code}")
-            logger.error(f"Response headers: {dict(response.headers)}")
-        
-        # Return more detailed error message
-        error_detail = str(e)
-        if len(error_detail) > 200:  # Truncate very long error messages
-            error_detail = error_detail[:200] + "..."
-            
-        raise HTTPException(
-            status_code=500,
-            detail=f"An unexpected error occurred: {error_detail}"
-        )
+from fastapi import APIRouter, HTTPException, Depends, Request, Body
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional, Dict, Any
+from pydantic import validator
+import asyncio
+import logging
+import time
+import random
+import json
+import httpx
+from datetime import datetime, timedelta
+from ..utils.security import get_current_user
+from ..utils.user_cache import UserSnapshot
+from ..schemas.task import TaskInput, TaskOutput, ProcessedTask, TaskDetail, TransformReport
+from ..schemas.job import JobOut, JobAccepted
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..core.db import async_session_scope
+from ..repo.job import create_job_async, get_job_async, count_pending_jobs_async, FINISHED_STATUSES
+from ..services.ai_transformer import MODEL, PROMPT_VERSION, stream_smart_tasks, unavailable
+from ..services.transform_cache import transform_cache, match_results, normalize_task
+from ..services.transform_service import run_transform, save_processed_tasks, reuse_near_duplicates
+from ..services.near_duplicates import near_duplicates
+from ..services.job_worker import job_worker
+from ..services.rate_limiter import ai_rate_limit
+from ..services.upstream_health import UpstreamUnavailable, upstream_health
+from ..services.model_router import model_router
+
+
+class TransformRequest(BaseModel):
+    tasks: List[str]
+    
+    class Config:
+        extra = "forbid"  # Reject any extra fields
+        
+    @validator('tasks')
+    def validate_tasks(cls, v):
+        if not v:
+            raise ValueError("Tasks list cannot be empty")
+        if any(not task.strip() for task in v):
+            raise ValueError("Tasks cannot be empty strings")
+        return v
+
+logger = logging.getLogger(__name__)
+router=APIRouter(
+    prefix="/api/ai",
+    tags=["AI task"]
+)
+
+# No longer need server API key since users must provide their own
+
+def _check_transform_request(data: TransformRequest, current_user: UserSnapshot):
+    """Validate a transform request (rate limiting is the ai_rate_limit dependency)."""
+    try:
+        # Validate tasks
+        if not data.tasks or len(data.tasks) == 0:
+            logger.error("No tasks provided in the request")
+            raise HTTPException(status_code=400, detail="No tasks provided")
+        
+        # Validate API key from user's profile
+        if not current_user.api_key or not current_user.api_key.strip():
+            logger.error("No API key found in user profile")
+            raise HTTPException(status_code=400, detail="API key not found. Please set your API key in your profile first.")
+        
+        # Create TaskInput object
+        task_input = TaskInput(
+            tasks=data.tasks,
+            user_id=current_user.id
+        )
+        
+        logger.info("Transform request", extra={"user_id": current_user.id, "tasks": len(data.tasks)})
+    except Exception as e:
+        logger.error("Error processing transform request", extra={"user_id": current_user.id, "error": repr(e)})
+        raise HTTPException(status_code=400, detail=f"Error processing request: {str(e)}")
+
+@router.post(
+    "/transform",
+    response_model=TaskOutput,
+    responses={202: {"model": JobAccepted}},
+    dependencies=[Depends(ai_rate_limit)],
+)
+async def process_tasks(
+    data: TransformRequest,
+    background: bool = False,
+    fast: bool = False,
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Transform tasks and save them to the user's history.
+
+    With ``?background=true`` the work is queued instead: the response is a
+    202 with a job id to poll at ``/api/ai/jobs/{id}`` (or follow at
+    ``/api/ai/jobs/{id}/events``), and the request returns immediately.
+
+    With ``?fast=true`` tasks the caches can't answer get provisional
+    offline rewrites right away (``report.provisional``); the model's
+    versions replace them in the saved history when they arrive.
+    """
+    _check_transform_request(data, current_user)
+    if background:
+        return await _enqueue_transform(data, current_user)
+    return await run_transform(current_user.api_key, current_user.id, data.tasks, fast=fast)
+
+async def _enqueue_transform(data: TransformRequest, current_user: UserSnapshot):
+    async with async_session_scope() as db:
+        # Back-pressure: bound each user's backlog and the queue as a whole
+        if await count_pending_jobs_async(db, current_user.id) >= settings.job_max_pending_per_user:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many transform jobs in progress. Please wait for one to finish.",
+                headers={"Retry-After": str(int(settings.job_poll_interval) or 1)}
+            )
+        if await count_pending_jobs_async(db) >= settings.job_max_queued:
+            raise HTTPException(
+                status_code=503,
+                detail="The transform queue is full. Please try again shortly.",
+                headers={"Retry-After": "30"}
+            )
+        job = await create_job_async(db, current_user.id, data.tasks)
+    job_worker.notify()
+    logger.info("Queued transform job", extra={"job_id": job.id, "user_id": current_user.id, "tasks": len(data.tasks)})
+    accepted = JobAccepted(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"{router.prefix}/jobs/{job.id}",
+        events_url=f"{router.prefix}/jobs/{job.id}/events",
+    )
+    return JSONResponse(accepted.dict(), status_code=202, headers={"Location": accepted.status_url})
+
+def _job_out(job) -> JobOut:
+    return JobOut(
+        id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=job.error,
+        result=json.loads(job.result) if job.result else None,
+    )
+
+@router.get("/jobs/{job_id}", response_model=JobOut)
+async def get_transform_job(job_id: int, current_user: UserSnapshot = Depends(get_current_user)):
+    async with async_session_scope() as db:
+        job = await get_job_async(db, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_out(job)
+
+@router.get("/jobs/{job_id}/events")
+async def follow_transform_job(job_id: int, request: Request, current_user: UserSnapshot = Depends(get_current_user)):
+    """Server-Sent Events for one job: a ``status`` event whenever it changes
+    and a final ``done`` event carrying the full job once it has finished."""
+    async with async_session_scope() as db:
+        if await get_job_async(db, job_id, current_user.id) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last_status = None
+        while not await request.is_disconnected():
+            async with async_session_scope() as db:
+                job = await get_job_async(db, job_id, current_user.id)
+            if job is None:
+                return
+            if job.status in FINISHED_STATUSES:
+                yield _stream_event({"type": "done", "job": _job_out(job).dict()}, sse=True)
+                return
+            if job.status != last_status:
+                last_status = job.status
+                yield _stream_event({"type": "status", "status": job.status, "attempts": job.attempts}, sse=True)
+            await asyncio.sleep(settings.job_poll_interval / 2)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _stream_event(payload: Dict[str, Any], sse: bool) -> str:
+    line = json.dumps(payload, default=str)
+    if sse:
+        return f"event: {payload['type']}\ndata: {line}\n\n"
+    return line + "\n"
+
+@router.post("/transform/stream", dependencies=[Depends(ai_rate_limit)])
+async def stream_tasks(
+    data: TransformRequest,
+    request: Request,
+    format: Optional[str] = None,
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Streaming variant of /transform.
+
+    Emits one event per task as soon as it is available (cached and reused
+    tasks first, then model output as it is generated), each already saved to history.
+    Responds with NDJSON by default, or Server-Sent Events when asked for
+    ``text/event-stream`` (or ``?format=sse``). Event types: ``task``,
+    ``error`` and a final ``done`` carrying the transform report.
+    """
+    user_id = current_user.id
+    _check_transform_request(data, current_user)
+    api_key = current_user.api_key
+    sse = format == "sse" or "text/event-stream" in request.headers.get("accept", "")
+
+    tasks = list(data.tasks)
+    cached = {}
+    if settings.ai_cache_enabled:
+        cached = await run_in_threadpool(transform_cache.lookup, MODEL, PROMPT_VERSION, tasks)
+    misses = [index for index in range(len(tasks)) if index not in cached]
+    reused = await reuse_near_duplicates(user_id, tasks, misses)
+    misses = [index for index in misses if index not in reused]
+
+    async def events():
+        report = TransformReport(cached=sorted(cached), reused=sorted(reused))
+
+        async def emit(index: int, task: ProcessedTask):
+            saved = await save_processed_tasks([task], user_id)
+            return _stream_event({"type": "task", "index": index, "task": task.dict(), "saved": saved[0]}, sse)
+
+        for index in sorted(cached):
+            yield await emit(index, cached[index])
+        for index in sorted(reused):
+            yield await emit(index, reused[index])
+
+        if misses:
+            # Index the misses by text so streamed results land on the right input
+            pending: Dict[str, List[int]] = {}
+            for index in misses:
+                pending.setdefault(normalize_task(tasks[index]), []).append(index)
+            unmatched: List[ProcessedTask] = []
+            to_store = []
+            try:
+                async for task in stream_smart_tasks(api_key, [tasks[index] for index in misses]):
+                    slots = pending.get(normalize_task(task.original_task))
+                    if not slots:
+                        # Reworded by the model; pair up positionally at the end
+                        unmatched.append(task)
+                        continue
+                    index = slots.pop(0)
+                    report.generated.append(index)
+                    to_store.append((tasks[index], task))
+                    yield await emit(index, task)
+
+                leftover = sorted(index for slots in pending.values() for index in slots)
+                matched, _ = match_results([tasks[index] for index in leftover], unmatched)
+                for index, task in zip(leftover, matched):
+                    if task is None:
+                        report.failed.append(index)
+                        continue
+                    report.generated.append(index)
+                    to_store.append((tasks[index], task))
+                    yield await emit(index, task)
+            except UpstreamUnavailable as e:
+                logger.warning("Streaming transform refused", extra={"reason": e.reason})
+                yield _stream_event({"type": "error", "status": 503, "detail": unavailable(e).detail}, sse)
+            except httpx.HTTPStatusError as e:
+                logger.error("Streaming transform failed", extra={"status": e.response.status_code})
+                detail = "Rate limit exceeded. Please try again later." if e.response.status_code == 429 else "Failed to get response from AI API. Please check your API key and try again."
+                yield _stream_event({"type": "error", "status": e.response.status_code, "detail": detail}, sse)
+            except httpx.HTTPError as e:
+                logger.error("Streaming transform failed", extra={"error": repr(e)})
+                yield _stream_event({"type": "error", "status": 502, "detail": "Failed to get response from AI API."}, sse)
+            finally:
+                if settings.ai_cache_enabled and to_store:
+                    await run_in_threadpool(transform_cache.store, MODEL, PROMPT_VERSION, to_store)
+
+            done = set(report.generated) | set(report.failed)
+            report.failed.extend(index for index in misses if index not in done)
+            report.failed.sort()
+
+        yield _stream_event({"type": "done", "report": report.dict()}, sse)
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/cache/stats")
+def transform_cache_stats(current_user: UserSnapshot = Depends(get_current_user)):
+    """Hit/miss counters for the SMART transformation cache and near-duplicate reuse"""
+    return {
+        "enabled": settings.ai_cache_enabled,
+        **transform_cache.stats(),
+        "near_duplicates": {"enabled": settings.ai_dedup_enabled, **near_duplicates.stats()},
+    }
+
+@router.get("/upstream/stats")
+def upstream_stats(current_user: UserSnapshot = Depends(get_current_user)):
+    """Circuit breaker state, retry budget and call outcomes for the model API,
+    plus per-model latency/failure stats used for routing and hedging"""
+    return {**upstream_health.stats(), "routing": model_router.stats()}
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from ..core.config import settings
+from ..core.db import pool_status
+from ..core.metrics import metrics
+from ..services.email_sender import email_sender
+from ..services.model_router import model_router
+from ..services.near_duplicates import near_duplicates
+from ..services.transform_cache import transform_cache
+from ..services.upstream_health import upstream_health
+from ..utils.security import require_metrics_token
+from ..utils.user_cache import user_cache
+
+router = APIRouter(tags=["metrics"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BREAKER_STATES = ("closed", "half_open", "open")
+
+
+@metrics.collector
+def _cache_metrics():
+    transform = transform_cache.stats()
+    dedup = near_duplicates.stats()
+    auth = user_cache.stats()
+    yield "transform_cache_lookups_total", "counter", "Transformation cache lookups by result", [
+        ({"result": "memory_hit"}, transform["memory_hits"]),
+        ({"result": "db_hit"}, transform["db_hits"]),
+        ({"result": "miss"}, transform["misses"]),
+    ]
+    yield "transform_cache_hit_ratio", "gauge", "Share of transformation cache lookups served from the cache", [
+        ({}, transform["hit_rate"]),
+    ]
+    yield "transform_cache_entries", "gauge", "Entries in the in-memory transformation cache", [({}, transform["memory_entries"])]
+    yield "near_duplicate_lookups_total", "counter", "Tasks checked against saved history for reuse", [({}, dedup["lookups"])]
+    yield "near_duplicate_reused_total", "counter", "Tasks answered from a near-identical saved task", [({}, dedup["reused"])]
+    yield "auth_cache_lookups_total", "counter", "Authenticated-user cache lookups by result", [
+        ({"result": "hit"}, auth["hits"]),
+        ({"result": "miss"}, auth["misses"]),
+    ]
+
+
+@metrics.collector
+def _upstream_metrics():
+    health = upstream_health.stats()
+    yield "upstream_circuit_state", "gauge", "1 for the circuit breaker's current state", [
+        ({"state": state}, float(health["state"] == state)) for state in BREAKER_STATES
+    ]
+    yield "upstream_calls_rejected_total", "counter", "Model API calls refused by the breaker or a shared Retry-After", [
+        ({}, health["rejected"]),
+    ]
+    yield "upstream_retry_budget", "gauge", "Retries currently available in the retry budget", [
+        ({}, health["retry_budget"]["balance"]),
+    ]
+    routing = model_router.stats()
+    yield "upstream_hedges_total", "counter", "Hedged duplicate model calls by outcome", [
+        ({"outcome": "sent"}, routing["hedges"]),
+        ({"outcome": "won"}, routing["hedge_wins"]),
+        ({"outcome": "failover"}, routing["failovers"]),
+    ]
+
+
+@metrics.collector
+def _resource_metrics():
+    pools = pool_status()
+    yield "db_pool_connections", "gauge", "Database pool connections by engine and state", [
+        ({"engine": engine, "state": state}, pool[state])
+        for engine, pool in pools.items()
+        for state in ("checkedin", "checkedout", "overflow")
+        if state in pool
+    ]
+    yield "email_outbox_sent_total", "counter", "Emails delivered by this process", [({}, email_sender.sent)]
+    yield "email_outbox_failed_total", "counter", "Emails given up on by this process", [({}, email_sender.failed)]
+
+
+def _metrics_enabled():
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(_metrics_enabled), Depends(require_metrics_token)])
+def prometheus_metrics():
+    """Prometheus text-format metrics for this process (needs the metrics token)"""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
@@ -1,54 +1,167 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Body
-from sqlalchemy.orm import Session
-from typing import List
-from ..schemas.task import ProcessedTask, TaskDetail
-from ..repo.task import create_task, get_tasks, delete_task, update_task_status
-from ..core.db import get_db
-from ..models.user import User
-from ..utils.security import get_current_user
-
-router = APIRouter(
-    prefix="/api/tasks",
-    tags=["Tasks"]
-)
-
-@router.get("/", response_model=List[TaskDetail])
-def list_tasks(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    return get_tasks(db, current_user.id)
-
-@router.post("/save", status_code=status.HTTP_201_CREATED, response_model=TaskDetail)
-def save_task(
-    task: ProcessedTask,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    return create_task(db, task, current_user.id)
-
-@router.delete("/{task_id}")
-def remove_task(
-    task_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    if delete_task(db, task_id, current_user.id):
-        return {"message": "Task deleted successfully"}
-    raise HTTPException(status_code=404, detail="Task not found")
-
-@router.patch("/{task_id}/status")
-def update_status(
-    task_id: int,
-    status_data: dict = Body(...),  # Expect JSON body with status field
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    status = status_data.get("status")
-    if not status:
-        raise HTTPException(status_code=400, detail="Status field is required")
-        
-    task = update_task_status(db, task_id, current_user.id, status)
-    if task:
-        return {"message": "Task status updated successfully"}
-    raise HTTPException(status_code=404, detail="Task not found")
+from fastapi import APIRouter, HTTPException, Depends, status, Body, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ..schemas.task import ProcessedTask, TaskDetail, TaskBatch, TaskStats, TaskSelection, TaskBulkStatus, TaskBulkResult, TaskSearchPage
+from ..repo.task import create_task_async, create_tasks_bulk_async, get_tasks_page_async, get_task_stats_async, delete_task_async, update_task_status_async, delete_tasks_async, update_tasks_status_async
+from ..repo.task_search import search_tasks_async
+from ..core.config import settings
+from ..core.db import get_async_db
+from ..utils.security import get_current_user
+from ..utils.user_cache import UserSnapshot
+
+router = APIRouter(
+    prefix="/api/tasks",
+    tags=["Tasks"]
+)
+
+MAX_PAGE_SIZE = 200
+MAX_BULK_IDS = 1000
+MAX_SEARCH_PAGE = 50
+
+@router.get("/", response_model=List[TaskDetail])
+async def list_tasks(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    priority: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """List the user's tasks, newest first.
+
+    Pass ``limit`` to page through history: the next page's cursor comes back
+    in the ``X-Next-Cursor`` header (absent on the last page) and, with
+    ``include_total=true``, the matching row count in ``X-Total-Count``.
+    Without ``limit`` the whole history is returned, as before.
+    """
+    if cursor and limit is None:
+        limit = MAX_PAGE_SIZE
+    try:
+        tasks, next_cursor, total = await get_tasks_page_async(
+            db,
+            current_user.id,
+            limit=limit,
+            cursor=cursor,
+            status=status_filter,
+            priority=priority,
+            include_total=include_total,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    return tasks
+
+@router.get("/search", response_model=TaskSearchPage)
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_PAGE),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Search the user's tasks by words in original_task and smart_task.
+
+    Best matches first; every word has to appear and the last one may be a
+    prefix. Pass ``next_offset`` back as ``offset`` for the next page.
+    """
+    items, next_offset = await search_tasks_async(db, current_user.id, q, limit, offset)
+    return {"items": items, "next_offset": next_offset}
+
+@router.get("/stats", response_model=TaskStats)
+async def task_stats(
+    days: int = Query(30, ge=1, le=settings.task_stats_max_days),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Dashboard numbers: counts by status/priority, completion rate and a
+    daily created/completed series for the last ``days`` days."""
+    return await get_task_stats_async(db, current_user.id, days)
+
+@router.post("/save", status_code=status.HTTP_201_CREATED, response_model=TaskDetail)
+async def save_task(
+    task: ProcessedTask,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    return await create_task_async(db, task, current_user.id)
+
+@router.post("/save-batch", status_code=status.HTTP_201_CREATED, response_model=List[TaskDetail])
+async def save_tasks_batch(
+    batch: TaskBatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Save many tasks in a single transaction"""
+    return await create_tasks_bulk_async(db, batch.tasks, current_user.id)
+
+def _bulk_selection(selection: TaskSelection):
+    """Repo keyword arguments for a TaskSelection; rejects an empty one."""
+    if selection.ids is None and selection.filter is None:
+        raise HTTPException(status_code=400, detail="Select tasks with ids and/or filter")
+    if selection.ids is not None and len(selection.ids) > MAX_BULK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_IDS} ids per request")
+    task_filter = selection.filter
+    return {
+        "ids": selection.ids,
+        "status_filter": task_filter.status if task_filter else None,
+        "priority": task_filter.priority if task_filter else None,
+    }
+
+def _bulk_result(message: str, selection: TaskSelection, affected: List[int]):
+    not_found = []
+    if selection.ids is not None:
+        matched = set(affected)
+        not_found = sorted({task_id for task_id in selection.ids if task_id not in matched})
+    return {"message": message, "ids": affected, "not_found": not_found}
+
+@router.patch("/status", response_model=TaskBulkResult)
+async def update_status_bulk(
+    change: TaskBulkStatus,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Set the status of many tasks in one statement (e.g. "complete all")."""
+    affected = await update_tasks_status_async(db, current_user.id, change.status, **_bulk_selection(change))
+    return _bulk_result(f"Updated {len(affected)} tasks", change, affected)
+
+@router.delete("/", response_model=TaskBulkResult)
+async def remove_tasks(
+    selection: TaskSelection,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Delete many tasks in one statement; ``{"filter": {}}`` clears the whole history."""
+    affected = await delete_tasks_async(db, current_user.id, **_bulk_selection(selection))
+    return _bulk_result(f"Deleted {len(affected)} tasks", selection, affected)
+
+@router.delete("/{task_id}")
+async def remove_task(
+    task_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    if await delete_task_async(db, task_id, current_user.id):
+        return {"message": "Task deleted successfully"}
+    raise HTTPException(status_code=404, detail="Task not found")
+
+@router.patch("/{task_id}/status")
+async def update_status(
+    task_id: int,
+    status_data: dict = Body(...),  # Expect JSON body with status field
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    status = status_data.get("status")
+    if not status:
+        raise HTTPException(status_code=400, detail="Status field is required")
+        
+    task = await update_task_status_async(db, task_id, current_user.id, status)
+    if task:
+        return {"message": "Task status updated successfully"}
+    raise HTTPException(status_code=404, detail="Task not found")
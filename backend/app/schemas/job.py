@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+from .task import TaskOutput
+
+class JobOut(BaseModel):
+    id: int
+    status: str
+    attempts: int
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[TaskOutput] = None
+
+class JobAccepted(BaseModel):
+    job_id: int
+    status: str
+    status_url: str
+    events_url: str
@@ -1,33 +1,89 @@
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
-
-class TaskBase(BaseModel):
-    original_task: str
-    smart_task: str
-    priority: str
-
-class TaskInput(BaseModel):
-    tasks: List[str]
-    user_id: Optional[int] = None
-
-class ProcessedTask(TaskBase):
-    pass
-
-class TaskOutput(BaseModel):
-    processed_tasks: List[ProcessedTask]
-
-class TaskDetail(TaskBase):
-    id: int
-    status: str
-    created_at: datetime
-    user_id: int
-
-    class Config:
-        from_attributes = True  # This enables ORM mode
-
-
-
-    
-
-    
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from datetime import datetime
+
+class TaskBase(BaseModel):
+    original_task: str
+    smart_task: str
+    priority: str
+
+class TaskInput(BaseModel):
+    tasks: List[str]
+    user_id: Optional[int] = None
+
+class ProcessedTask(TaskBase):
+    pass
+
+class TaskBatch(BaseModel):
+    tasks: List[ProcessedTask]
+
+class TransformReport(BaseModel):
+    # Indexes into the request's task list, by where each result came from
+    cached: List[int] = []
+    reused: List[int] = []  # near-duplicates of tasks already in the user's history
+    generated: List[int] = []
+    failed: List[int] = []
+    # Answered by the offline heuristics; those in ``refining`` are updated in
+    # the saved history once the model's answer arrives
+    provisional: List[int] = []
+    refining: List[int] = []
+    upstream_error: Optional[str] = None
+
+class TaskOutput(BaseModel):
+    processed_tasks: List[ProcessedTask]
+    report: Optional[TransformReport] = None
+
+class TaskDetail(TaskBase):
+    id: int
+    status: str
+    created_at: datetime
+    user_id: int
+
+    class Config:
+        from_attributes = True  # This enables ORM mode
+
+class TaskSearchHit(TaskDetail):
+    rank: float
+    # HTML-escaped text with the matching words wrapped in <mark>
+    original_highlight: str
+    smart_highlight: str
+
+class TaskSearchPage(BaseModel):
+    items: List[TaskSearchHit]
+    next_offset: Optional[int] = None
+
+class TaskFilter(BaseModel):
+    status: Optional[str] = None
+    priority: Optional[str] = None
+
+class TaskSelection(BaseModel):
+    # Tasks to act on: these ids, the tasks matching filter, or (both given)
+    # the ids that also match the filter. An empty filter selects every task.
+    ids: Optional[List[int]] = None
+    filter: Optional[TaskFilter] = None
+
+class TaskBulkStatus(TaskSelection):
+    status: str
+
+class TaskBulkResult(BaseModel):
+    message: str
+    ids: List[int]  # tasks actually updated/deleted
+    not_found: List[int] = []  # requested ids that don't exist or aren't yours
+
+class DailyTaskCount(BaseModel):
+    date: str  # YYYY-MM-DD (UTC)
+    created: int
+    completed: int
+
+class TaskStats(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_priority: Dict[str, int]
+    completion_rate: float  # done / total
+    daily: List[DailyTaskCount]
+
+
+
+    
+
+    
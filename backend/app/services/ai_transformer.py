@@ -0,0 +1,294 @@
+from fastapi import HTTPException
+from typing import AsyncIterator, List, Optional
+import asyncio
+import logging
+import json
+import math
+import time
+import httpx
+from ..core.config import settings
+from ..core.log import log_payload
+from ..core.metrics import metrics
+from ..schemas.task import ProcessedTask
+from .model_router import CANCELLED, ERROR, OK, PARSE_ERROR, model_router
+from .prompts import estimate_message_tokens, get_template, request_body
+from .openrouter import ai_client
+from .reply_parser import ArrayStreamDecoder, iter_stream_tasks, parse_reply
+from .upstream_health import UpstreamUnavailable, parse_retry_after, upstream_health
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_RESPONSES = metrics.counter("upstream_responses_total", "Model API responses by model and HTTP status", ("model", "status"))
+UPSTREAM_TOKENS = metrics.counter("upstream_tokens_total", "Tokens reported by the model API", ("model", "kind"))
+UPSTREAM_LATENCY = metrics.histogram("upstream_call_duration_seconds", "Model call latency, retries included, by outcome", ("model", "outcome"))
+
+API_URL = settings.ai_api_url
+# Transformation cache namespace: answers from any candidate model are
+# interchangeable, so they are all stored under the primary one
+MODEL = settings.ai_models[0]
+TEMPLATE = get_template()
+# Cached transformations are keyed by the template version, so a prompt
+# change never serves answers to the old one
+PROMPT_VERSION = TEMPLATE.version
+
+
+def build_request_body(tasks: List[str], model: str = MODEL) -> dict:
+    return request_body(TEMPLATE, tasks, model)
+
+
+class UpstreamError(HTTPException):
+    """HTTPException for a failed model call that keeps the upstream HTTP status."""
+
+    def __init__(self, status_code: int, detail: str, upstream_status: Optional[int] = None):
+        super().__init__(status_code=status_code, detail=detail)
+        self.upstream_status = upstream_status
+
+
+def transient(e: HTTPException) -> bool:
+    """Whether a failed model call may succeed later.
+
+    Upstream 4xx answers (bad key, no credit, rejected request) won't;
+    rate limits, 5xx, transport and reply-parsing failures might.
+    """
+    status = getattr(e, "upstream_status", None)
+    return status is None or status >= 500 or status in (408, 429)
+
+
+def may_fail_over(e: BaseException) -> bool:
+    """Whether another model may answer where one just failed: only after a
+    transient failure that isn't the key's own rate limit (which every model
+    shares), and only while the retry budget allows another call."""
+    if not isinstance(e, HTTPException) or not transient(e) or e.status_code == 429:
+        return False
+    return upstream_health.allow_retry()
+
+
+def unavailable(e: UpstreamUnavailable) -> HTTPException:
+    """503 for a call the upstream health checks refused to make."""
+    return HTTPException(
+        status_code=503,
+        detail=f"AI service temporarily unavailable ({e.reason}). Please try again in {math.ceil(e.retry_after)} seconds.",
+    )
+
+
+async def _fetch_reply(api_key: str, body: dict) -> str:
+    """Send ``body`` and return the model's reply text.
+
+    Upstream failures raise HTTPException (UpstreamUnavailable passes
+    through for the caller).
+    """
+    model = body["model"]
+    try:
+        logger.info(
+            "Sending model request",
+            extra={"model": model, "prompt_tokens_est": estimate_message_tokens(body["messages"]), "max_tokens": body.get("max_tokens")},
+        )
+        log_payload(logger, "Model request body", body, model=model)
+
+        # Shared pooled client (retries transient failures itself)
+        response = await ai_client.chat_completion(api_key, body)
+
+        UPSTREAM_RESPONSES.inc(model, str(response.status_code))
+        usage = None
+        try:
+            response_json = response.json()
+            log_payload(logger, "Model response body", response_json, model=model, status=response.status_code)
+            usage = response_json.get("usage") if isinstance(response_json, dict) else None
+            if usage:
+                UPSTREAM_TOKENS.inc(model, "prompt", amount=usage.get("prompt_tokens") or 0)
+                UPSTREAM_TOKENS.inc(model, "completion", amount=usage.get("completion_tokens") or 0)
+        except json.JSONDecodeError:
+            logger.error("Model response is not JSON", extra={"model": model, "status": response.status_code, "body": response.text})
+        logger.info(
+            "Model response",
+            extra={
+                "model": model,
+                "status": response.status_code,
+                "prompt_tokens": (usage or {}).get("prompt_tokens"),
+                "completion_tokens": (usage or {}).get("completion_tokens"),
+            },
+        )
+        
+        if response.status_code == 429:
+            # Handle rate limit specifically
+            retry_after = math.ceil(parse_retry_after(response.headers.get('Retry-After')) or 5)
+            raise UpstreamError(
+                status_code=429,
+                detail=f"Rate limit exceeded. Please try again in {retry_after} seconds.",
+                upstream_status=429,
+            )
+            
+        response.raise_for_status()
+
+        # Parse the response
+        data = response.json()
+        if not data or "choices" not in data or not data["choices"]:
+            logger.error("Invalid response format from AI API", extra={"model": model, "body": response.text})
+            raise HTTPException(
+                status_code=500,
+                detail="Invalid response format from AI API"
+            )
+
+        ai_reply = data["choices"][0]["message"]["content"]
+        if not ai_reply:
+            logger.error("Empty response content from AI API", extra={"model": model})
+            raise HTTPException(
+                status_code=500,
+                detail="Empty response from AI API"
+            )
+
+        return ai_reply
+    except (HTTPException, UpstreamUnavailable):
+        raise
+    except httpx.HTTPError as req_err:
+        response_text = None
+        error_detail = None
+        upstream_status = None
+
+        try:
+            if isinstance(req_err, httpx.HTTPStatusError):
+                upstream_status = req_err.response.status_code
+                response_text = req_err.response.text
+                error_detail = req_err.response.json().get('error', {}).get('message')
+        except Exception:
+            pass
+        logger.error("Model request failed", extra={"model": model, "status": upstream_status, "error": str(req_err), "body": response_text})
+
+        if error_detail:
+            raise UpstreamError(
+                status_code=500,
+                detail=f"API Error: {error_detail}",
+                upstream_status=upstream_status,
+            )
+        else:
+            raise UpstreamError(
+                status_code=500,
+                detail="Failed to get response from AI API. Please check your API key and try again.",
+                upstream_status=upstream_status,
+            )
+    except Exception as e:
+        fields = {"model": model, "url": API_URL}
+        if 'response' in locals():
+            fields.update(status=response.status_code, body=response.text)
+        logger.exception("Unexpected error calling the model", extra=fields)
+
+        # Return more detailed error message
+        error_detail = str(e)
+        if len(error_detail) > 200:  # Truncate very long error messages
+            error_detail = error_detail[:200] + "..."
+            
+        raise HTTPException(
+            status_code=500,
+            detail=f"An unexpected error occurred: {error_detail}"
+        )
+
+
+def parse_tasks(ai_reply: str, tasks: List[str]) -> List[ProcessedTask]:
+    """Tasks from the model's reply to a prompt carrying ``tasks``;
+    HTTPException (500) when there are none."""
+    try:
+        # Single pass: locate the array (fenced or not) and decode it,
+        # object by object if it is not valid JSON as a whole
+        parsed = parse_reply(ai_reply, lambda item: TEMPLATE.to_task(item, tasks))
+        if not parsed.found_array:
+            raise json.JSONDecodeError("No JSON array found in response", ai_reply, 0)
+        if parsed.skipped:
+            logger.warning("Skipped unusable objects in AI reply", extra={"skipped": parsed.skipped})
+        output = parsed.tasks
+        
+        if not output:
+            raise ValueError("No valid tasks found in response")
+        
+        logger.info("Parsed model reply", extra={"tasks": len(output)})
+        return output
+        
+    except json.JSONDecodeError as json_err:
+        logger.error("Model reply is not a JSON task array", extra={"error": str(json_err), "reply": ai_reply})
+        
+        # Try to get a better error message by looking at the response content
+        error_msg = "Failed to parse AI response as JSON."
+        if "```json" in ai_reply:
+            error_msg += " Response contains code blocks that need cleaning."
+        elif "[" not in ai_reply or "]" not in ai_reply:
+            error_msg += " Response does not contain a JSON array."
+        elif "{" not in ai_reply or "}" not in ai_reply:
+            error_msg += " Response does not contain JSON objects."
+        else:
+            error_msg += " Invalid JSON format in response."
+        
+        raise HTTPException(
+            status_code=500,
+            detail=error_msg
+        )
+    except ValueError as val_err:
+        logger.error("Model reply has no usable tasks", extra={"error": str(val_err), "reply": ai_reply})
+        raise HTTPException(
+            status_code=500,
+            detail=f"Invalid response format: {str(val_err)}"
+        )
+
+
+def _record(model: str, started: float, outcome: str):
+    elapsed = time.perf_counter() - started
+    model_router.record(model, elapsed, outcome)
+    UPSTREAM_LATENCY.observe(elapsed, model, outcome)
+
+
+async def generate_with_model(api_key: str, tasks: List[str], model: str) -> List[ProcessedTask]:
+    """One attempt against ``model``, recorded in the router's stats."""
+    started = time.perf_counter()
+    try:
+        ai_reply = await _fetch_reply(api_key, build_request_body(tasks, model))
+    except HTTPException:
+        _record(model, started, ERROR)
+        raise
+    except asyncio.CancelledError:
+        _record(model, started, CANCELLED)
+        raise
+    try:
+        output = parse_tasks(ai_reply, tasks)
+    except HTTPException:
+        _record(model, started, PARSE_ERROR)
+        raise
+    _record(model, started, OK)
+    return output
+
+
+async def generate_smart_tasks(api_key: str, tasks: List[str]) -> List[ProcessedTask]:
+    """Ask the best candidate model for SMART versions of ``tasks``.
+
+    Routed and hedged by ``model_router``. Raises HTTPException with the same
+    status/detail the transform route has always returned for upstream and
+    parsing failures, or 503 while upstream_health refuses calls.
+    """
+    try:
+        return await model_router.run(lambda model: generate_with_model(api_key, tasks, model), may_fail_over)
+    except UpstreamUnavailable as e:
+        raise unavailable(e)
+
+
+async def stream_smart_tasks(api_key: str, tasks: List[str]) -> AsyncIterator[ProcessedTask]:
+    """Like generate_smart_tasks, but yields each task as soon as the model
+    has finished writing it. Goes to the best model without hedging: tasks
+    already yielded can't be taken back."""
+    model = model_router.ranked()[0]
+    body = build_request_body(tasks, model)
+    decoder = ArrayStreamDecoder()
+    logger.info("Sending streaming model request", extra={"model": model, "tasks": len(tasks)})
+    started = time.perf_counter()
+    produced = 0
+
+    try:
+        async for delta in ai_client.stream_chat_completion(api_key, body):
+            for task in iter_stream_tasks(decoder, delta, lambda item: TEMPLATE.to_task(item, tasks)):
+                produced += 1
+                yield task
+            if decoder.finished:
+                break
+    except httpx.HTTPError:
+        _record(model, started, ERROR)
+        raise
+    _record(model, started, OK if produced else PARSE_ERROR)
+
+    if decoder.errors:
+        logger.warning("Skipped malformed objects in streamed reply", extra={"model": model, "skipped": decoder.errors})
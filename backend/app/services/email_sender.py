@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate
+from typing import Deque, List, Optional
+
+import aiosmtplib
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..core.config import settings
+from ..core.db import async_session_scope
+from ..core.metrics import metrics
+from ..models.email_outbox import OutboxEmail
+from ..repo.email_outbox import claim_emails_async, mark_failed_async, mark_sent_async, outbox_depth_async
+
+logger = logging.getLogger(__name__)
+
+SEND_LATENCY = metrics.histogram("email_send_duration_seconds", "Time to hand one email to the mail backend", ("backend", "outcome"))
+
+
+def build_message(email: OutboxEmail) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((settings.mail_from_name, settings.mail_from))
+    message["To"] = email.recipient
+    message["Subject"] = email.subject
+    message["Date"] = formatdate(usegmt=True)
+    # Stable across retries, so a resend after a lost acknowledgement can be
+    # recognised as the same message by the receiving side
+    domain = settings.mail_from.rpartition("@")[2] or "localhost"
+    message["Message-ID"] = f"<outbox-{email.id}@{domain}>"
+    message.set_content(email.body, subtype=email.subtype)
+    return message
+
+
+class SMTPTransport:
+    """One SMTP connection kept open across messages and batches.
+
+    Connects (STARTTLS + login) lazily, reconnects once if the server has
+    dropped the connection, and is closed after ``mail_connection_idle``
+    seconds without use.
+    """
+
+    def __init__(self):
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._last_used = 0.0
+        self.connects = 0
+
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.mail_server,
+            port=settings.mail_port,
+            use_tls=settings.mail_ssl_tls,
+            start_tls=settings.mail_starttls,
+            username=settings.mail_username or None,
+            password=settings.mail_password or None,
+            timeout=settings.mail_timeout,
+        )
+        await smtp.connect()
+        self._smtp = smtp
+        self.connects += 1
+        return smtp
+
+    async def send(self, message: EmailMessage):
+        smtp = await self._connection()
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            await self.close()
+            smtp = await self._connection()
+            await smtp.send_message(message)
+        self._last_used = time.monotonic()
+
+    async def close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > settings.mail_connection_idle:
+            await self.close()
+
+    async def close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+
+class LogTransport:
+    """Debugging stand-in for SMTP: logs each message and keeps the last few."""
+
+    def __init__(self, keep: int = 100):
+        self.outbox: Deque[EmailMessage] = deque(maxlen=keep)
+        self.connects = 0
+
+    async def send(self, message: EmailMessage):
+        logger.info("[mail_backend=log] To: %s Subject: %s (%d chars)", message["To"], message["Subject"], len(message.get_content()))
+        self.outbox.append(message)
+
+    async def close_if_idle(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+def _is_permanent(error: Exception) -> bool:
+    # 5xx replies (bad address, rejected content) won't succeed on retry
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class EmailSender:
+    """Background sender draining the email_outbox table.
+
+    Claims due messages in batches, sends them one after another over the
+    transport's reused connection and records the outcome of the whole
+    batch in one UPDATE. Failed messages are retried with exponential
+    backoff up to ``mail_max_attempts``.
+    """
+
+    def __init__(
+        self,
+        transport,
+        batch_size: int = settings.mail_batch_size,
+        poll_interval: float = settings.mail_poll_interval,
+        max_attempts: int = settings.mail_max_attempts,
+        lease_seconds: float = settings.mail_lease_seconds,
+    ):
+        self.transport = transport
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.max_attempts = max(1, max_attempts)
+        self.lease_seconds = lease_seconds
+        self.sender_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._loop_task: Optional[asyncio.Task] = None
+        self._latencies: Deque[float] = deque(maxlen=500)
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def start(self):
+        if self._loop_task is None:
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._loop_task = asyncio.create_task(self._run())
+            logger.info("Email sender %s started (%s)", self.sender_id, type(self.transport).__name__)
+
+    async def stop(self, grace: float = settings.job_shutdown_grace):
+        if self._loop_task is None:
+            return
+        # Let the current batch finish so sent messages get marked as sent
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._loop_task, timeout=grace)
+        except asyncio.TimeoutError:
+            pass
+        self._loop_task = None
+        await self.transport.close()
+        logger.info("Email sender %s stopped", self.sender_id)
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                sent = await self.send_batch()
+            except SQLAlchemyError as e:
+                logger.warning("Email outbox unavailable: %s", e)
+                sent = 0
+            except Exception:
+                # Keep the sender alive; claimed rows come back when their lease expires
+                logger.exception("Email batch failed")
+                sent = 0
+            if sent >= self.batch_size:
+                continue  # probably more waiting
+            await self.transport.close_if_idle()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def send_batch(self) -> int:
+        """Send one batch of due messages; returns how many were claimed."""
+        async with async_session_scope() as db:
+            emails = await claim_emails_async(db, self.sender_id, self.batch_size, self.lease_seconds)
+        if not emails:
+            return 0
+
+        delivered: List[int] = []
+        try:
+            for email in emails:
+                start = time.perf_counter()
+                try:
+                    await self.transport.send(build_message(email))
+                except (aiosmtplib.SMTPException, OSError) as e:
+                    SEND_LATENCY.observe(time.perf_counter() - start, settings.mail_backend, "error")
+                    await self._record_failure(email, e)
+                    if not _is_permanent(e):
+                        # Connection-level trouble: start the next message on a fresh one
+                        await self.transport.close()
+                    continue
+                except Exception as e:
+                    # A message that can't even be built won't go through on a retry
+                    SEND_LATENCY.observe(time.perf_counter() - start, settings.mail_backend, "error")
+                    logger.exception("Email %s could not be sent", email.id)
+                    await self._record_failure(email, e, permanent=True)
+                    continue
+                elapsed = time.perf_counter() - start
+                self._latencies.append(elapsed)
+                SEND_LATENCY.observe(elapsed, settings.mail_backend, "sent")
+                delivered.append(email.id)
+        finally:
+            # Whatever else went wrong, don't send these again
+            async with async_session_scope() as db:
+                await mark_sent_async(db, delivered, self.sender_id)
+            self.sent += len(delivered)
+        logger.info("Sent %d of %d queued emails", len(delivered), len(emails))
+        return len(emails)
+
+    async def _record_failure(self, email: OutboxEmail, error: Exception, permanent: bool = False):
+        retry_in = None
+        if not (permanent or _is_permanent(error)) and email.attempts < self.max_attempts:
+            retry_in = settings.mail_retry_backoff * (2 ** (email.attempts - 1))
+            self.retried += 1
+        else:
+            self.failed += 1
+        outcome = f"retrying in {retry_in:.0f}s" if retry_in is not None else "giving up"
+        logger.warning(
+            "Email %s to %s failed (attempt %d), %s: %s", email.id, email.recipient, email.attempts, outcome, error
+        )
+        async with async_session_scope() as db:
+            await mark_failed_async(db, email.id, self.sender_id, str(error) or type(error).__name__, retry_in)
+
+    async def stats(self):
+        async with async_session_scope() as db:
+            depth, oldest = await outbox_depth_async(db)
+        latencies = sorted(self._latencies)
+        return {
+            "backend": settings.mail_backend,
+            "queue_depth": depth,
+            "oldest_queued_at": oldest,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "connects": self.transport.connects,
+            "send_latency_ms": {
+                "avg": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else None,
+            },
+        }
+
+
+def _build_transport():
+    if settings.mail_backend == "log":
+        return LogTransport()
+    if settings.mail_backend == "smtp":
+        return SMTPTransport()
+    raise ValueError(f"Unknown mail_backend: {settings.mail_backend!r}")
+
+
+email_sender = EmailSender(_build_transport())
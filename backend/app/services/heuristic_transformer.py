@@ -0,0 +1,144 @@
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..schemas.task import ProcessedTask
+
+SEED_PATH = Path(__file__).resolve().parent.parent / "data" / "priority_seed.tsv"
+PRIORITIES = ("High", "Medium", "Low")
+
+_WEEKDAY = r"(?:mon|tues|wednes|thurs|fri|satur|sun)day"
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+# Deadline phrases, in the order they are tried. Soon/later feed the
+# classifier as pseudo-words next to the task's own words.
+_DEADLINES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\b(?:by |before )?(?:today|tonight|eod|end of (?:the )?day)\b", re.I), "soon"),
+    (re.compile(r"\b(?:by |before )?tomorrow(?: (?:morning|afternoon|evening|night))?\b", re.I), "soon"),
+    (re.compile(rf"\b(?:by |before |on |this |next )?{_WEEKDAY}(?: (?:morning|afternoon|evening|night))?\b", re.I), "week"),
+    (re.compile(r"\b(?:by |before )?(?:this|next) (?:week|weekend|month|year|quarter)\b", re.I), "later"),
+    (re.compile(r"\b(?:by |before )?end of (?:the )?(?:week|month|year|quarter)\b", re.I), "later"),
+    (re.compile(rf"\b(?:by |before |on )?{_MONTH} \d{{1,2}}(?:st|nd|rd|th)?\b", re.I), "later"),
+    (re.compile(r"\b(?:by |before |on )?\d{1,2}/\d{1,2}(?:/\d{2,4})?\b", re.I), "later"),
+]
+_TIME = re.compile(r"\b(?:at |by )?\d{1,2}(?::\d{2})? ?(?:am|pm)\b", re.I)
+# Words that say how urgent a task is rather than what it is; dropped from
+# the rewrite but kept as classifier features
+_URGENCY = re.compile(r"\b(?:urgent(?:ly)?|asap|important|critical|high priority|low priority|someday|eventually|maybe|sometime|when (?:possible|free))\b[:!]*", re.I)
+_WORD = re.compile(r"[a-z0-9']+")
+# Default time frame when the task names none, so the rewrite stays time-bound
+_DEFAULT_DEADLINE = {"High": "by tomorrow", "Medium": "by the end of this week", "Low": "within the next two weeks"}
+
+
+def _features(text: str) -> List[str]:
+    words = _WORD.findall(text.casefold())
+    if re.search(r"\basap\b", text, re.I):
+        words.append("__deadline_soon__")
+    for pattern, horizon in _DEADLINES:
+        if pattern.search(text):
+            words.append(f"__deadline_{horizon}__")
+            break
+    if _TIME.search(text):
+        words.append("__time_of_day__")
+    if "!" in text:
+        words.append("__exclamation__")
+    return words
+
+
+class PriorityModel:
+    """Multinomial naive Bayes over words and deadline pseudo-words.
+
+    The whole model is two arrays: class log-priors and a (vocabulary x
+    class) matrix of smoothed log-likelihoods, so scoring a task is a
+    handful of row lookups and one sum.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], log_prior: np.ndarray, log_likelihood: np.ndarray):
+        self.vocabulary = vocabulary
+        self.log_prior = log_prior
+        self.log_likelihood = log_likelihood
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], labels: Sequence[str], alpha: float = 0.5) -> "PriorityModel":
+        vocabulary: Dict[str, int] = {}
+        tokenized = [_features(text) for text in texts]
+        for tokens in tokenized:
+            for token in tokens:
+                vocabulary.setdefault(token, len(vocabulary))
+        counts = np.zeros((len(vocabulary), len(PRIORITIES)))
+        class_counts = np.zeros(len(PRIORITIES))
+        for tokens, label in zip(tokenized, labels):
+            column = PRIORITIES.index(label)
+            class_counts[column] += 1
+            for token in tokens:
+                counts[vocabulary[token], column] += 1
+        log_prior = np.log(class_counts / class_counts.sum())
+        smoothed = counts + alpha
+        log_likelihood = np.log(smoothed / smoothed.sum(axis=0))
+        return cls(vocabulary, log_prior, log_likelihood)
+
+    @classmethod
+    def from_seed(cls, path: Path = SEED_PATH) -> "PriorityModel":
+        texts, labels = [], []
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if not line.strip() or line.startswith("#"):
+                continue
+            label, text = line.split("\t", 1)
+            labels.append(label)
+            texts.append(text)
+        return cls.fit(texts, labels)
+
+    def scores(self, text: str) -> np.ndarray:
+        rows = [self.vocabulary[token] for token in _features(text) if token in self.vocabulary]
+        return self.log_prior + self.log_likelihood[rows].sum(axis=0)
+
+    def predict(self, text: str) -> str:
+        return PRIORITIES[int(np.argmax(self.scores(text)))]
+
+
+def extract_deadline(text: str) -> Optional[str]:
+    """The task's own time frame (e.g. "by friday 5pm"), if it states one."""
+    found = next(filter(None, (pattern.search(text) for pattern, _ in _DEADLINES)), None)
+    time_match = _TIME.search(text)
+    if found is None and time_match is None:
+        return None
+    parts = [m.group(0) for m in sorted(filter(None, (found, time_match)), key=lambda m: m.start())]
+    phrase = " ".join(parts).casefold()
+    if not phrase.startswith(("by ", "before ", "on ", "at ")):
+        phrase = f"by {phrase}"
+    return phrase
+
+
+def _strip_spans(text: str, patterns: Sequence[re.Pattern]) -> str:
+    for pattern in patterns:
+        text = pattern.sub(" ", text)
+    return " ".join(text.replace(" ,", ",").split()).strip(" ,;:-!")
+
+
+class HeuristicTransformer:
+    """Offline stand-in for the model: a provisional SMART rewrite and priority.
+
+    Rewrites are the task with urgency words removed, sentence-cased and
+    time-bound (its own deadline, or a default for the predicted priority).
+    Good enough to show immediately; the model's answer replaces it when
+    there is one.
+    """
+
+    def __init__(self, model: PriorityModel):
+        self.model = model
+
+    def transform(self, text: str) -> ProcessedTask:
+        priority = self.model.predict(text)
+        deadline = extract_deadline(text)
+        body = _strip_spans(text, [_URGENCY, _TIME] + [pattern for pattern, _ in _DEADLINES])
+        if not body:
+            body = " ".join(text.split())
+        smart = f"{body[0].upper()}{body[1:]} {deadline or _DEFAULT_DEADLINE[priority]}"
+        return ProcessedTask(original_task=text, smart_task=smart, priority=priority)
+
+    def transform_many(self, texts: Sequence[str]) -> List[ProcessedTask]:
+        return [self.transform(text) for text in texts]
+
+
+heuristic_transformer = HeuristicTransformer(PriorityModel.from_seed())
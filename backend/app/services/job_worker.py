@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..core.config import settings
+from ..core.db import async_session_scope
+from ..models.user import User
+from ..repo.job import (
+    claim_jobs_async,
+    complete_job_async,
+    fail_job_async,
+    get_job_async,
+    renew_lease_async,
+)
+from .ai_transformer import transient
+from .transform_service import run_transform
+
+logger = logging.getLogger(__name__)
+
+# Upstream errors worth another attempt later (unless upstream rejected the
+# request itself, e.g. a bad key); anything else fails the job
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class JobTakenOver(Exception):
+    """The job's lease lapsed and another worker claimed it meanwhile."""
+
+
+def serialize_result(output) -> str:
+    return json.dumps({
+        "processed_tasks": [task.dict() for task in output["processed_tasks"]],
+        "saved_tasks": output["saved_tasks"],
+        "report": output["report"].dict(),
+    })
+
+
+class JobWorkerPool:
+    """Drains the transform_jobs table with bounded concurrency.
+
+    Runs inside the API process by default, or on its own via
+    ``python -m app.worker``; any number of pools can share one database.
+    Claimed jobs hold a lease that is renewed while they run, so a job whose
+    worker dies is picked up again once the lease lapses.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = settings.job_worker_concurrency,
+        poll_interval: float = settings.job_poll_interval,
+        lease_seconds: float = settings.job_lease_seconds,
+        max_attempts: int = settings.job_max_attempts,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+    @property
+    def started(self) -> bool:
+        return self._loop_task is not None
+
+    async def start(self):
+        if self._loop_task is None:
+            self._wakeup = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._run())
+            logger.info("Job worker %s started (concurrency %d)", self.worker_id, self.concurrency)
+
+    async def stop(self, grace: float = settings.job_shutdown_grace):
+        if self._loop_task is None:
+            return
+        self._loop_task.cancel()
+        await asyncio.gather(self._loop_task, return_exceptions=True)
+        self._loop_task = None
+        if self._running:
+            # Let in-flight jobs finish; whatever is cancelled goes back to the queue
+            done, pending = await asyncio.wait(self._running, timeout=grace)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        logger.info("Job worker %s stopped", self.worker_id)
+
+    def notify(self):
+        """Wake the claim loop now instead of at the next poll (same process only)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            free = self.concurrency - len(self._running)
+            if free > 0:
+                try:
+                    async with async_session_scope() as db:
+                        claimed = await claim_jobs_async(db, self.worker_id, free, self.lease_seconds)
+                except SQLAlchemyError as e:
+                    logger.warning("Job claim failed: %s", e)
+                    claimed = []
+                for job_id in claimed:
+                    task = asyncio.create_task(self._execute(job_id))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with async_session_scope() as db:
+                    await renew_lease_async(db, job_id, self.worker_id, self.lease_seconds)
+            except SQLAlchemyError as e:
+                logger.warning("Could not renew lease on job %s: %s", job_id, e)
+
+    async def _finish(self, job_id: int, error: str, retry_in: Optional[float] = None):
+        try:
+            async with async_session_scope() as db:
+                await fail_job_async(db, job_id, self.worker_id, error, retry_in)
+        except SQLAlchemyError as e:
+            # The lease will lapse and another attempt picks the job up
+            logger.error("Could not record outcome of job %s: %s", job_id, e)
+
+    def _retry_delay(self, attempts: int) -> Optional[float]:
+        if attempts >= self.max_attempts:
+            return None
+        return settings.job_retry_backoff * (2 ** (attempts - 1))
+
+    async def _execute(self, job_id: int):
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        attempts = 1
+        try:
+            async with async_session_scope() as db:
+                job = await get_job_async(db, job_id)
+                user = await db.get(User, job.user_id) if job else None
+            if job is None or user is None:
+                return
+            attempts = job.attempts
+            if not user.api_key:
+                await self._finish(job_id, error="API key not found. Please set your API key in your profile first.")
+                return
+
+            logger.info("Running transform job %s (attempt %d)", job_id, attempts, extra={"user_id": user.id})
+
+            async def complete(db, output):
+                # Same transaction as the saved tasks: a job is never done
+                # without them, and a job that is done can't save them again
+                if not await complete_job_async(db, job_id, self.worker_id, serialize_result(output), commit=False):
+                    raise JobTakenOver()
+
+            # Jobs retry upstream failures themselves rather than settle for heuristics
+            await run_transform(user.api_key, user.id, json.loads(job.tasks), fallback=False, on_saved=complete)
+            logger.info("Transform job %s done", job_id)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back rather than waiting for the
+            # lease (a no-op if it finished); this attempt still counts
+            retry_in = 0 if attempts < self.max_attempts else None
+            await asyncio.shield(self._finish(job_id, error="Interrupted by worker shutdown", retry_in=retry_in))
+            raise
+        except JobTakenOver:
+            logger.warning("Transform job %s was claimed by another worker, discarding this attempt", job_id)
+        except HTTPException as e:
+            retry_in = self._retry_delay(attempts) if e.status_code in RETRYABLE_STATUSES and transient(e) else None
+            outcome = f"retrying in {retry_in:.0f}s" if retry_in is not None else "giving up"
+            logger.warning("Transform job %s failed (%s), %s: %s", job_id, e.status_code, outcome, e.detail)
+            await self._finish(job_id, error=str(e.detail), retry_in=retry_in)
+        except Exception as e:
+            logger.exception("Transform job %s crashed", job_id)
+            await self._finish(job_id, error=f"Unexpected error: {e}", retry_in=self._retry_delay(attempts))
+        finally:
+            heartbeat.cancel()
+            self.notify()
+
+
+job_worker = JobWorkerPool()
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+OK, PARSE_ERROR, ERROR = "ok", "parse_error", "error"
+# Cancelled (usually a hedge's loser): elapsed time counts as a lower bound
+# on its latency, so a model that keeps losing stops being picked
+CANCELLED = "cancelled"
+# Failure rates are capped here when scoring so a model never scores infinite
+MAX_FAILURE_RATE = 0.9
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ModelStats:
+    """Recent outcomes of one model: ``(finished at, latency, outcome)``."""
+
+    def __init__(self, max_samples: int):
+        self.samples: Deque[Tuple[float, float, str]] = deque(maxlen=max_samples)
+        self.total = 0
+
+    def trim(self, now: float, max_age: float):
+        while self.samples and now - self.samples[0][0] > max_age:
+            self.samples.popleft()
+
+    def latencies(self) -> List[float]:
+        return [latency for _, latency, outcome in self.samples if outcome in (OK, CANCELLED)]
+
+    def rate(self, *outcomes: str) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(outcome in outcomes for _, _, outcome in self.samples) / len(self.samples)
+
+
+class ModelRouter:
+    """Sends each transform to the candidate model answering fastest lately.
+
+    Models are scored by their p50 latency over successful calls, inflated
+    by their failure rate (upstream errors plus replies that didn't parse).
+    A model with fewer than ``min_samples`` recent calls scores 0, so new and
+    long-unused models get tried again, in the configured order. Samples
+    older than ``max_age`` seconds are dropped.
+
+    With hedging on and at least two candidates, a call still running after
+    the chosen model's p95 (clamped to ``hedge_min_delay``..``hedge_after``)
+    gets a duplicate sent to the runner-up; the first valid answer wins and
+    the other call is cancelled. A call that fails before then goes to the
+    runner-up straight away, if the caller's ``may_fail_over`` allows it.
+    """
+
+    def __init__(
+        self,
+        models: Sequence[str],
+        max_samples: int = settings.ai_model_window,
+        max_age: float = settings.ai_model_stats_ttl,
+        min_samples: int = 5,
+        hedge: bool = settings.ai_hedge_enabled,
+        hedge_after: float = settings.ai_hedge_after,
+        hedge_min_delay: float = settings.ai_hedge_min_delay,
+    ):
+        if not models:
+            raise ValueError("At least one model must be configured")
+        self.models = list(dict.fromkeys(models))
+        self.max_age = max_age
+        self.min_samples = min_samples
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.hedge_min_delay = hedge_min_delay
+        self._stats: Dict[str, ModelStats] = {model: ModelStats(max_samples) for model in self.models}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def record(self, model: str, latency: float, outcome: str):
+        stats = self._stats.get(model)
+        if stats is not None:
+            stats.samples.append((time.monotonic(), latency, outcome))
+            stats.total += 1
+
+    def _score(self, model: str, now: float) -> float:
+        stats = self._stats[model]
+        stats.trim(now, self.max_age)
+        latencies = stats.latencies()
+        if len(stats.samples) < self.min_samples:
+            return 0.0
+        if not latencies:
+            return float("inf")
+        failure_rate = min(stats.rate(ERROR, PARSE_ERROR), MAX_FAILURE_RATE)
+        return _percentile(latencies, 0.5) / (1.0 - failure_rate)
+
+    def ranked(self) -> List[str]:
+        """Candidates best first (ties keep the configured order)."""
+        now = time.monotonic()
+        return sorted(self.models, key=lambda model: self._score(model, now))
+
+    def hedge_delay(self, model: str) -> float:
+        latencies = self._stats[model].latencies()
+        if len(latencies) < self.min_samples:
+            return self.hedge_after
+        return min(self.hedge_after, max(self.hedge_min_delay, _percentile(latencies, 0.95)))
+
+    async def run(
+        self,
+        attempt: Callable[[str], Awaitable[T]],
+        may_fail_over: Optional[Callable[[BaseException], bool]] = None,
+    ) -> T:
+        """``attempt(model)`` against the best model, hedged as configured.
+
+        ``attempt`` records its own outcome, including CANCELLED when it loses
+        the race. An early failure is re-raised unless ``may_fail_over(error)``
+        says the runner-up could do better. Raises the last error when every
+        attempt fails.
+        """
+        ranked = self.ranked()
+        primary = ranked[0]
+        if not self.hedge or self.hedge_after <= 0 or len(ranked) < 2:
+            # A hedge to the same model on the same key only doubles cost and 429s
+            return await attempt(primary)
+
+        backup = ranked[1]
+        first = asyncio.ensure_future(attempt(primary))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay(primary))
+            error: Optional[BaseException] = None
+            if done:
+                if first.exception() is None:
+                    return first.result()
+                # Failed before the hedge was due: go straight to the runner-up
+                error = first.exception()
+                if may_fail_over is not None and not may_fail_over(error):
+                    raise error
+                logger.info("Model %s failed, falling over to %s", primary, backup)
+                self.failovers += 1
+            else:
+                logger.info("Model %s slow, hedging with %s", primary, backup)
+                self.hedges += 1
+            second = asyncio.ensure_future(attempt(backup))
+            pending.add(second)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedge_wins += task is second and first in pending
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        models = {}
+        for model in self.ranked():
+            stats = self._stats[model]
+            latencies = stats.latencies()
+            score = self._score(model, now)
+            models[model] = {
+                "score": round(score, 3) if score != float("inf") else None,
+                "recent_calls": len(stats.samples),
+                "total_calls": stats.total,
+                "p50": round(_percentile(latencies, 0.5), 3) if latencies else None,
+                "p95": round(_percentile(latencies, 0.95), 3) if latencies else None,
+                "error_rate": round(stats.rate(ERROR), 3),
+                "parse_failure_rate": round(stats.rate(PARSE_ERROR), 3),
+                "cancelled": sum(outcome == CANCELLED for _, _, outcome in stats.samples),
+            }
+        return {
+            "hedging": self.hedge,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "models": models,
+        }
+
+
+model_router = ModelRouter(settings.ai_models)
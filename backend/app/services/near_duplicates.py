@@ -0,0 +1,231 @@
+import logging
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..core.config import settings
+from ..core.db import session_scope
+from ..models.task import Task
+from ..schemas.task import ProcessedTask
+from .transform_cache import normalize_task
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+NGRAM = 3
+# Random-hyperplane LSH: LSH_TABLES tables of LSH_BITS-bit signatures. At a
+# cosine of 0.9 a neighbour shares a bucket in at least one table ~93% of the
+# time, while an unrelated task lands in a given bucket 1 time in 4096
+LSH_TABLES = 16
+LSH_BITS = 12
+_DIGITS = re.compile(r"\d+")
+_WORD = re.compile(r"\w+")
+
+
+def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """Hashed character-trigram vectors, L2-normalised (float32, one row per text).
+
+    Each trigram of the lower-cased words (punctuation dropped, padded with
+    spaces so word starts and ends count) lands in one of EMBEDDING_DIM
+    buckets with a +/-1 sign taken from the same crc32, which keeps
+    collisions from piling up.
+    """
+    vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    rows: List[int] = []
+    hashes: List[int] = []
+    for row, text in enumerate(texts):
+        padded = f" {' '.join(_WORD.findall(text.casefold()))} "
+        grams = [padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))]
+        hashes.extend(zlib.crc32(gram.encode("utf-8")) for gram in grams)
+        rows.extend([row] * len(grams))
+    if hashes:
+        hashed = np.asarray(hashes, dtype=np.uint32)
+        signs = np.where(hashed & np.uint32(1 << 31), -1.0, 1.0).astype(np.float32)
+        np.add.at(vectors, (np.asarray(rows), hashed % EMBEDDING_DIM), signs)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+
+_HYPERPLANES = np.random.default_rng(0x5017).standard_normal((EMBEDDING_DIM, LSH_TABLES * LSH_BITS)).astype(np.float32)
+_BIT_WEIGHTS = (1 << np.arange(LSH_BITS)).astype(np.int64)
+
+
+def lsh_codes(vectors: np.ndarray) -> np.ndarray:
+    """Bucket id of each vector in each LSH table, shape (n, LSH_TABLES)."""
+    bits = (vectors @ _HYPERPLANES > 0).reshape(len(vectors), LSH_TABLES, LSH_BITS)
+    return bits.astype(np.int64) @ _BIT_WEIGHTS
+
+
+class _UserIndex:
+    """Embeddings of one user's saved tasks with their stored rewrites."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.entries: List[Tuple[str, str, str]] = []  # (original, smart, priority)
+        self.keys: Dict[str, int] = {}  # normalised original -> row
+        self.buckets: List[Dict[int, List[int]]] = [{} for _ in range(LSH_TABLES)]
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, tasks: Sequence[Tuple[str, str, str]]):
+        fresh = []
+        for original, smart, priority in tasks:
+            key = normalize_task(original)
+            row = self.keys.get(key)
+            if row is not None:
+                # Newer rewrite of the same text wins
+                if row < len(self.entries):
+                    self.entries[row] = (original, smart, priority)
+                else:
+                    fresh[row - len(self.entries)] = (original, smart, priority)
+            elif len(self.entries) + len(fresh) < self.capacity:
+                self.keys[key] = len(self.entries) + len(fresh)
+                fresh.append((original, smart, priority))
+        if not fresh:
+            return
+        vectors = embed_texts([original for original, _, _ in fresh])
+        start = len(self.entries)
+        for offset, codes in enumerate(lsh_codes(vectors).tolist()):
+            for table, code in enumerate(codes):
+                self.buckets[table].setdefault(code, []).append(start + offset)
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.entries.extend(fresh)
+
+    def nearest(self, vectors: np.ndarray, exact_below: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(row, cosine) of the best match per query vector; row -1 when none."""
+        best_rows = np.full(len(vectors), -1, dtype=np.int64)
+        best_scores = np.zeros(len(vectors), dtype=np.float32)
+        if not self.entries:
+            return best_rows, best_scores
+        if len(self.entries) < exact_below:
+            scores = vectors @ self.vectors.T
+            best_rows = scores.argmax(axis=1)
+            return best_rows, scores[np.arange(len(vectors)), best_rows]
+        # Only rows sharing a bucket with the query in some table are scored
+        for query, (vector, codes) in enumerate(zip(vectors, lsh_codes(vectors).tolist())):
+            candidates = set()
+            for table, code in enumerate(codes):
+                candidates.update(self.buckets[table].get(code, ()))
+            if not candidates:
+                continue
+            rows = np.fromiter(candidates, dtype=np.int64)
+            scores = self.vectors[rows] @ vector
+            best = int(scores.argmax())
+            best_rows[query], best_scores[query] = rows[best], scores[best]
+        return best_rows, best_scores
+
+
+class NearDuplicateIndex:
+    """Per-user in-memory index of saved tasks for reusing past rewrites.
+
+    A task whose embedding is close enough to one already in the user's
+    history (cosine >= ``threshold``) gets that task's smart_task and
+    priority instead of a model call. Indexes are built from the most recent
+    ``max_rows`` tasks on first use, kept for ``ttl`` seconds for up to
+    ``max_users`` users, and extended as new tasks are saved. Deleted tasks
+    stay matchable until the index is rebuilt; their rewrites are still
+    valid answers.
+    """
+
+    def __init__(self, threshold: float, max_rows: int, max_users: int, ttl: float, exact_below: int = 2000):
+        self.threshold = threshold
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.exact_below = exact_below
+        self._indexes: LRUCache = LRUCache(maxsize=max_users)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.reused = 0
+        self.loads = 0
+
+    def _load(self, user_id: int) -> _UserIndex:
+        index = _UserIndex(self.max_rows)
+        try:
+            with session_scope() as db:
+                rows = db.execute(
+                    select(Task.original_task, Task.smart_task, Task.priority)
+                    .where(Task.user_id == user_id)
+                    .order_by(Task.created_at.desc(), Task.id.desc())
+                    .limit(self.max_rows)
+                ).all()
+        except SQLAlchemyError as e:
+            logger.warning("Could not load task history for near-duplicate index: %s", e)
+            index.loaded_at = float("-inf")  # try again on the next lookup
+            return index
+        # Oldest first so that add() lets the most recent rewrite win
+        index.add([tuple(row) for row in reversed(rows)])
+        self.loads += 1
+        return index
+
+    def _index(self, user_id: int) -> _UserIndex:
+        with self._lock:
+            index: Optional[_UserIndex] = self._indexes.get(user_id)
+        if index is None or time.monotonic() - index.loaded_at > self.ttl:
+            index = self._load(user_id)
+            with self._lock:
+                self._indexes[user_id] = index
+        return index
+
+    def lookup(self, user_id: int, tasks: Sequence[str]) -> Dict[int, ProcessedTask]:
+        """Reusable results keyed by position in ``tasks``.
+
+        Blocking (may load history from the database); call from a worker
+        thread in async code.
+        """
+        if not tasks:
+            return {}
+        index = self._index(user_id)
+        vectors = embed_texts(tasks)
+        with self._lock:
+            rows, scores = index.nearest(vectors, self.exact_below)
+            entries = [index.entries[row] if row >= 0 else None for row in rows]
+
+        results: Dict[int, ProcessedTask] = {}
+        for position, (task, entry, score) in enumerate(zip(tasks, entries, scores)):
+            if entry is None or score < self.threshold:
+                continue
+            original, smart, priority = entry
+            # "pay rent for May 2024" is not a rewording of "... May 2023"
+            if _DIGITS.findall(task) != _DIGITS.findall(original):
+                continue
+            results[position] = ProcessedTask(original_task=task, smart_task=smart, priority=priority)
+        with self._lock:
+            self.lookups += len(tasks)
+            self.reused += len(results)
+        return results
+
+    def add(self, user_id: int, tasks: Sequence[ProcessedTask]):
+        """Make newly saved tasks matchable, if the user's index is loaded."""
+        with self._lock:
+            index: Optional[_UserIndex] = self._indexes.get(user_id)
+            if index is not None:
+                index.add([(task.original_task, task.smart_task, task.priority) for task in tasks])
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "users": len(self._indexes),
+                "indexed_tasks": sum(len(index) for index in self._indexes.values()),
+                "lookups": self.lookups,
+                "reused": self.reused,
+                "loads": self.loads,
+                "threshold": self.threshold,
+            }
+
+
+near_duplicates = NearDuplicateIndex(
+    threshold=settings.ai_dedup_threshold,
+    max_rows=settings.ai_dedup_history_rows,
+    max_users=settings.ai_dedup_max_users,
+    ttl=settings.ai_dedup_ttl,
+)
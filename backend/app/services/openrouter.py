@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from ..core.config import settings
+from .upstream_health import parse_retry_after, upstream_health
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; mirrors the old urllib3 Retry status_forcelist
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class OpenRouterClient:
+    """App-lifetime async client for the OpenRouter chat completions API.
+
+    A single pooled ``httpx.AsyncClient`` is created at startup and shared by
+    every request, so keep-alive connections (and their TLS sessions) are
+    reused instead of being rebuilt per transform.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is not None:
+            return
+        http2 = settings.ai_http2 and _http2_available()
+        if settings.ai_http2 and not http2:
+            logger.warning("HTTP/2 requested for OpenRouter but 'h2' is not installed; using HTTP/1.1")
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.ai_max_connections,
+                max_keepalive_connections=settings.ai_max_keepalive_connections,
+                keepalive_expiry=settings.ai_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.ai_connect_timeout,
+                read=settings.ai_read_timeout,
+                write=settings.ai_write_timeout,
+                pool=settings.ai_pool_timeout,
+            ),
+            headers={
+                "Content-Type": "application/json",
+                "HTTP-Referer": "https://sortiq.com",
+                "X-Title": "SortIQ Task Transformer",
+            },
+        )
+        logger.info("OpenRouter client started (http2=%s)", http2)
+
+    async def close(self):
+        if self._client is None:
+            return
+        await self._client.aclose()
+        self._client = None
+        logger.info("OpenRouter client closed")
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        # Started from the app lifespan; the lazy start covers scripts and
+        # test clients that never run startup handlers.
+        if self._client is None:
+            await self.start()
+        return self._client
+
+    async def chat_completion(
+        self,
+        api_key: str,
+        body: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """POST a chat completion, retrying transient failures with backoff.
+
+        Every attempt goes through ``upstream_health``: retries need budget and
+        use jittered backoff, and a long Retry-After ends them early. Returns
+        the final response (which may still be an error status); transport
+        errors are re-raised as ``httpx`` exceptions, and UpstreamUnavailable
+        is raised instead of calling while the circuit is open.
+        """
+        client = await self._get_client()
+        headers = {"Authorization": f"Bearer {api_key}"}
+        request_timeout = httpx.Timeout(timeout, connect=settings.ai_connect_timeout) if timeout else httpx.USE_CLIENT_DEFAULT
+        retries = settings.ai_max_retries
+
+        for attempt in range(retries + 1):
+            probe = await upstream_health.admit(api_key)
+            try:
+                response = await client.post(settings.ai_api_url, json=body, headers=headers, timeout=request_timeout)
+            except httpx.TransportError as exc:
+                upstream_health.record(probe, error=True)
+                if attempt >= retries or not upstream_health.allow_retry():
+                    raise
+                delay = upstream_health.backoff(attempt)
+                logger.warning("OpenRouter transport error (%s), retrying in %.1fs", exc.__class__.__name__, delay)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                upstream_health.record(probe)
+                raise
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            upstream_health.record(probe, status=response.status_code, retry_after=retry_after, api_key=api_key)
+            if (
+                response.status_code not in RETRY_STATUSES
+                or attempt >= retries
+                or not upstream_health.allow_retry(retry_after)
+            ):
+                return response
+
+            delay = upstream_health.backoff(attempt, retry_after)
+            logger.warning("OpenRouter returned %s, retrying in %.1fs", response.status_code, delay)
+            await response.aclose()
+            await asyncio.sleep(delay)
+
+        return response
+
+    async def stream_chat_completion(
+        self,
+        api_key: str,
+        body: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion, yielding content deltas as they arrive.
+
+        Not retried: once tokens have been handed to the caller a replay would
+        duplicate them. A non-200 status, or an error event mid-stream, raises
+        ``httpx.HTTPStatusError``; UpstreamUnavailable is raised instead of
+        calling while the circuit is open.
+        """
+        client = await self._get_client()
+        headers = {"Authorization": f"Bearer {api_key}", "Accept": "text/event-stream"}
+        request_timeout = httpx.Timeout(timeout, connect=settings.ai_connect_timeout) if timeout else httpx.USE_CLIENT_DEFAULT
+        probe = await upstream_health.admit(api_key)
+        settled = False
+
+        try:
+            async with client.stream(
+                "POST",
+                settings.ai_api_url,
+                json={**body, "stream": True},
+                headers=headers,
+                timeout=request_timeout,
+            ) as response:
+                if response.status_code != 200:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    upstream_health.record(probe, status=response.status_code, retry_after=retry_after, api_key=api_key)
+                    settled = True
+                    await response.aread()
+                    response.raise_for_status()
+                # Headers are in; the breaker only cares whether upstream answered
+                upstream_health.record(probe, status=response.status_code)
+                settled = True
+
+                async for line in response.aiter_lines():
+                    # SSE: "data: {...}" events, ": keep-alive" comments, "data: [DONE]"
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    try:
+                        event = json.loads(payload)
+                    except json.JSONDecodeError:
+                        logger.warning("Skipping undecodable stream event: %.200s", payload)
+                        continue
+                    if "error" in event:
+                        # The stream itself started with 200; report the
+                        # failure as the upstream error it is (its code, or 502)
+                        error = event["error"] if isinstance(event["error"], dict) else {"message": str(event["error"])}
+                        code = error.get("code")
+                        status = code if isinstance(code, int) and 400 <= code < 600 else 502
+                        raise httpx.HTTPStatusError(
+                            str(error.get("message", "stream error")),
+                            request=response.request,
+                            response=httpx.Response(status, json={"error": error}, request=response.request),
+                        )
+                    choices = event.get("choices") or []
+                    if choices:
+                        delta = (choices[0].get("delta") or {}).get("content")
+                        if delta:
+                            yield delta
+        except httpx.TransportError:
+            if not settled:
+                upstream_health.record(probe, error=True)
+                settled = True
+            raise
+        finally:
+            if not settled:
+                upstream_health.record(probe)
+
+
+ai_client = OpenRouterClient()
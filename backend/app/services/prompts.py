@@ -0,0 +1,166 @@
+import logging
+import math
+from abc import ABC, abstractmethod
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..core.config import settings
+from ..schemas.task import ProcessedTask
+from .reply_parser import to_processed_task
+
+logger = logging.getLogger(__name__)
+
+# BPE-style pieces: ASCII words, digit runs, single other word characters
+# (CJK etc. are close to a token per character), newlines and punctuation
+_PIECE = re.compile(r"[A-Za-z]+|\d+|\n|[^\W\d_A-Za-z]|[^\w\s]")
+PRIORITIES = {"h": "High", "high": "High", "m": "Medium", "medium": "Medium", "l": "Low", "low": "Low"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for ``text`` without loading a tokenizer.
+
+    Common English words are one token and long ones about one per six
+    letters; digits go in threes; punctuation, newlines and non-Latin
+    characters count one each. Spaces fold into the following word.
+    """
+    tokens = 0
+    for piece in _PIECE.findall(text):
+        first = piece[0]
+        if first.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        elif first.isascii() and first.isalpha():
+            tokens += 1 if len(piece) <= 7 else math.ceil(len(piece) / 6)
+        else:
+            tokens += 1
+    return tokens
+
+
+def estimate_message_tokens(messages: Sequence[Dict[str, str]]) -> int:
+    # Chat formats add a handful of tokens per message for role markers
+    return sum(estimate_tokens(message["content"]) + 4 for message in messages) + 2
+
+
+class PromptTemplate(ABC):
+    """How tasks are put to the model and how its reply is read back.
+
+    ``version`` is part of the transformation cache key, so changing what a
+    template asks for means registering it under a new version.
+    """
+
+    version = ""
+
+    @abstractmethod
+    def messages(self, tasks: Sequence[str]) -> List[Dict[str, str]]:
+        """Chat messages asking for SMART rewrites of ``tasks``."""
+
+    @abstractmethod
+    def to_task(self, item: Any, tasks: Sequence[str]) -> Optional[ProcessedTask]:
+        """A ProcessedTask from one decoded reply object, or None if unusable."""
+
+    @abstractmethod
+    def expected_output_tokens(self, tasks: Sequence[str]) -> int:
+        """Estimated completion tokens for a reply covering ``tasks``."""
+
+    def max_tokens(self, tasks: Sequence[str]) -> Optional[int]:
+        """``max_tokens`` for a request carrying ``tasks`` (None: no limit)."""
+        if settings.ai_max_output_tokens <= 0:
+            return None
+        budget = int(self.expected_output_tokens(tasks) * settings.ai_output_token_headroom)
+        return max(settings.ai_min_output_tokens, min(settings.ai_max_output_tokens, budget))
+
+
+def _smart_tokens(task: str) -> int:
+    # A SMART rewrite adds a measure and a deadline to the task: about twice
+    # its length plus a couple of dozen tokens
+    return 2 * estimate_tokens(task) + 24
+
+
+class VerbosePrompt(PromptTemplate):
+    """The original prompt: a system message, a long instruction block, and
+    the task echoed back as ``original_task`` in every reply object."""
+
+    version = "v1"
+
+    def messages(self, tasks: Sequence[str]) -> List[Dict[str, str]]:
+        tasks_text = "\n".join(tasks)
+        prompt = (
+            "You are an AI productivity assistant. "
+            "Take the following messy task list and return each task in SMART format "
+            "(Specific, Measurable, Achievable, Relevant, Time-bound). "
+            "Also assign a priority (High, Medium, Low) to each. "
+            "Respond in JSON array format where each object has these exact fields:\n"
+            "1. original_task: the original task text\n"
+            "2. smart_task: the SMART version of the task\n"
+            "3. priority: either 'High', 'Medium', or 'Low'\n"
+            "Example: [{ \"original_task\": \"write report\", "
+            "\"smart_task\": \"Complete 5-page quarterly report with sales data analysis by next Friday\", "
+            "\"priority\": \"High\" }]"
+            f"\n\nTasks to transform:\n{tasks_text}"
+        )
+        return [
+            {"role": "system", "content": "You are a helpful productivity assistant."},
+            {"role": "user", "content": prompt},
+        ]
+
+    def to_task(self, item: Any, tasks: Sequence[str]) -> Optional[ProcessedTask]:
+        return to_processed_task(item)
+
+    def expected_output_tokens(self, tasks: Sequence[str]) -> int:
+        # {"original_task": "...", "smart_task": "...", "priority": "High"},
+        return 8 + sum(estimate_tokens(task) + _smart_tokens(task) + 20 for task in tasks)
+
+
+class CompactPrompt(PromptTemplate):
+    """One short user message with numbered tasks; the reply carries only
+    the number, the rewrite and the priority, and tasks are matched back to
+    their input by number. Replies in the old shape are still accepted."""
+
+    version = "v2"
+
+    def messages(self, tasks: Sequence[str]) -> List[Dict[str, str]]:
+        numbered = "\n".join(f"{number}. {' '.join(task.split())}" for number, task in enumerate(tasks, 1))
+        prompt = (
+            "Rewrite each task as a SMART goal (specific, measurable, achievable, relevant, time-bound) "
+            "and rate its priority H, M or L.\n"
+            'Reply with only a JSON array, one object per task: {"i": task number, "s": SMART task, "p": "H"|"M"|"L"}\n'
+            'Example: [{"i":1,"s":"Write the 5-page Q3 sales report by Friday 5pm","p":"H"}]\n'
+            f"Tasks:\n{numbered}"
+        )
+        return [{"role": "user", "content": prompt}]
+
+    def to_task(self, item: Any, tasks: Sequence[str]) -> Optional[ProcessedTask]:
+        if not isinstance(item, dict) or "i" not in item:
+            return to_processed_task(item)
+        try:
+            number = int(item["i"])
+        except (TypeError, ValueError):
+            number = 0
+        smart = item.get("s", item.get("smart_task"))
+        priority = PRIORITIES.get(str(item.get("p", item.get("priority", ""))).strip().lower())
+        if not 1 <= number <= len(tasks) or not smart or priority is None:
+            logger.error("Unusable task in compact reply", extra={"item": item})
+            return None
+        return ProcessedTask(original_task=tasks[number - 1], smart_task=str(smart), priority=priority)
+
+    def expected_output_tokens(self, tasks: Sequence[str]) -> int:
+        # {"i":12,"s":"...","p":"H"},
+        return 4 + sum(_smart_tokens(task) + 14 for task in tasks)
+
+
+TEMPLATES: Dict[str, PromptTemplate] = {template.version: template for template in (VerbosePrompt(), CompactPrompt())}
+
+
+def get_template(version: str = settings.ai_prompt_version) -> PromptTemplate:
+    try:
+        return TEMPLATES[version]
+    except KeyError:
+        raise ValueError(f"Unknown prompt version {version!r}; expected one of {sorted(TEMPLATES)}") from None
+
+
+def request_body(template: PromptTemplate, tasks: Sequence[str], model: str) -> Dict[str, Any]:
+    body: Dict[str, Any] = {"model": model, "messages": template.messages(tasks)}
+    max_tokens = template.max_tokens(tasks)
+    if max_tokens is not None:
+        body["max_tokens"] = max_tokens
+    return body
+
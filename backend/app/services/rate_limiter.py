@@ -0,0 +1,377 @@
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import case, delete, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..core.config import settings
+from ..core.db import async_session_scope
+from ..models.rate_limit import RateLimitBucket
+from ..utils.security import get_current_user
+from ..utils.user_cache import UserSnapshot
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # only needed for rate_limit_backend="redis"
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Token bucket: up to ``burst`` requests at once, refilled at ``per_minute``."""
+    burst: int
+    per_minute: float
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60.0
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    remaining: float
+    retry_after: float  # seconds until the request would be allowed; 0 when allowed
+
+
+def _refill(tokens: float, updated_at: float, now: float, limit: RateLimit) -> float:
+    return min(float(limit.burst), tokens + max(0.0, now - updated_at) * limit.rate)
+
+
+def _full_at(tokens: float, now: float, limit: RateLimit) -> Optional[float]:
+    """When a bucket left at ``tokens`` is full again and carries no state."""
+    return now + (limit.burst - tokens) / limit.rate if limit.rate else None
+
+
+class MemoryBucketStore:
+    """Per-process buckets; fine for tests and single-worker deployments.
+
+    A bucket expires once it has been idle long enough to be full again
+    (it carries no state then). Expired buckets are swept every
+    ``prune_interval`` seconds, and past ``max_keys`` the least recently
+    used are dropped.
+    """
+
+    def __init__(self, max_keys: int = 100000, prune_interval: float = 60.0):
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}  # key -> (tokens, updated_at, expires_at), LRU order
+        self._lock = asyncio.Lock()
+        self.max_keys = max_keys
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+
+    async def take(self, key: str, limit: RateLimit, cost: float, now: float) -> Tuple[bool, float]:
+        allowed, (tokens,) = await self.take_all([(key, limit)], cost, now)
+        return allowed, tokens
+
+    async def take_all(self, buckets: Sequence[Tuple[str, RateLimit]], cost: float, now: float) -> Tuple[bool, List[float]]:
+        async with self._lock:
+            levels = []
+            for key, limit in buckets:
+                state = self._buckets.pop(key, None)
+                levels.append(_refill(state[0], state[1], now, limit) if state else float(limit.burst))
+            allowed = all(tokens >= cost for tokens in levels)
+            if allowed:
+                levels = [tokens - cost for tokens in levels]
+            for (key, limit), tokens in zip(buckets, levels):
+                full_at = _full_at(tokens, now, limit)
+                self._buckets[key] = (tokens, now, math.inf if full_at is None else full_at)
+            if now >= self._next_prune or len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return allowed, levels
+
+    def _prune(self, now: float):
+        for key, (_, _, expires_at) in list(self._buckets.items()):
+            if expires_at <= now:
+                del self._buckets[key]
+        while len(self._buckets) > self.max_keys:
+            del self._buckets[next(iter(self._buckets))]
+        self._next_prune = now + self.prune_interval
+
+
+class DatabaseBucketStore:
+    """Buckets in the rate_limit_buckets table, shared by every worker.
+
+    Each take is a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING, so
+    the refill-and-spend happens atomically inside the database without a
+    read/modify/write round trip. A take from several buckets runs one such
+    statement per bucket (in key order) in one transaction and rolls it
+    back if any bucket is short.
+
+    Rows record when their bucket is full again (``expires_at``); past that
+    they carry no state, and each process deletes them every
+    ``prune_interval`` seconds so per-IP keys don't pile up.
+    """
+
+    def __init__(self, prune_interval: float = 300.0):
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+
+    async def take(self, key: str, limit: RateLimit, cost: float, now: float) -> Tuple[bool, float]:
+        async with async_session_scope() as db:
+            allowed, tokens = (await db.execute(self._take(db, key, limit, cost, now))).one()
+            await self._prune(db, now)
+            await db.commit()
+            return bool(allowed), float(tokens)
+
+    async def take_all(self, buckets: Sequence[Tuple[str, RateLimit]], cost: float, now: float) -> Tuple[bool, List[float]]:
+        async with async_session_scope() as db:
+            taken: Dict[str, Tuple[bool, float]] = {}
+            for key, limit in sorted(buckets, key=lambda bucket: bucket[0]):
+                allowed, tokens = (await db.execute(self._take(db, key, limit, cost, now))).one()
+                taken[key] = (bool(allowed), float(tokens))
+            if all(allowed for allowed, _ in taken.values()):
+                await self._prune(db, now)
+                await db.commit()
+                return True, [taken[key][1] for key, _ in buckets]
+            await db.rollback()
+            # Levels as they stay after the rollback
+            levels = [tokens + cost if allowed else tokens for allowed, tokens in (taken[key] for key, _ in buckets)]
+            return False, levels
+
+    @staticmethod
+    def _take(db, key: str, limit: RateLimit, cost: float, now: float):
+        insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        table = RateLimitBucket.__table__
+        first_allowed = limit.burst >= cost
+        first_tokens = limit.burst - cost if first_allowed else float(limit.burst)
+        stmt = insert(table).values(
+            key=key,
+            tokens=first_tokens,
+            updated_at=now,
+            allowed=first_allowed,
+            expires_at=_full_at(first_tokens, now, limit),
+        )
+        refilled = table.c.tokens + (now - table.c.updated_at) * limit.rate
+        available = case((refilled > limit.burst, float(limit.burst)), else_=refilled)
+        tokens = case((available >= cost, available - cost), else_=available)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                "tokens": tokens,
+                "updated_at": now,
+                "allowed": available >= cost,
+                "expires_at": now + (limit.burst - tokens) / limit.rate if limit.rate else None,
+            },
+        ).returning(table.c.allowed, table.c.tokens)
+
+    async def _prune(self, db, now: float):
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.prune_interval
+        table = RateLimitBucket.__table__
+        # Rows written before expires_at existed go once untouched for a day
+        await db.execute(delete(table).where(or_(
+            table.c.expires_at <= now,
+            table.c.expires_at.is_(None) & (table.c.updated_at < now - 86400),
+        )))
+
+
+_REDIS_TAKE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+if rate > 0 then
+  redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+end
+return {allowed, tostring(tokens)}
+"""
+
+# Same refill as _REDIS_TAKE over several buckets, spending from all or none.
+# ARGV: cost, now, then capacity and rate for each key.
+_REDIS_TAKE_ALL = """
+local cost = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local levels = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[1 + 2 * i])
+  local rate = tonumber(ARGV[2 + 2 * i])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now
+  levels[i] = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+  if levels[i] < cost then
+    allowed = 0
+  end
+end
+local result = {allowed}
+for i, key in ipairs(KEYS) do
+  if allowed == 1 then
+    local capacity = tonumber(ARGV[1 + 2 * i])
+    local rate = tonumber(ARGV[2 + 2 * i])
+    levels[i] = levels[i] - cost
+    redis.call('HSET', key, 'tokens', tostring(levels[i]), 'ts', tostring(now))
+    if rate > 0 then
+      redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+    end
+  end
+  result[i + 1] = tostring(levels[i])
+end
+return result
+"""
+
+
+class RedisBucketStore:
+    """Buckets in Redis (or anything speaking its protocol), via one Lua script."""
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("rate_limit_backend='redis' requires the redis package")
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TAKE)
+        self._script_all = self._client.register_script(_REDIS_TAKE_ALL)
+
+    async def take(self, key: str, limit: RateLimit, cost: float, now: float) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(
+            keys=[f"ratelimit:{key}"],
+            args=[limit.burst, limit.rate, cost, now],
+        )
+        return bool(int(allowed)), float(tokens)
+
+    async def take_all(self, buckets: Sequence[Tuple[str, RateLimit]], cost: float, now: float) -> Tuple[bool, List[float]]:
+        args = [cost, now]
+        for _, limit in buckets:
+            args += [limit.burst, limit.rate]
+        allowed, *levels = await self._script_all(keys=[f"ratelimit:{key}" for key, _ in buckets], args=args)
+        return bool(int(allowed)), [float(tokens) for tokens in levels]
+
+
+class RateLimiter:
+    """Applies RateLimits against a bucket store.
+
+    Fails open: if the store is unreachable the request is let through and a
+    warning logged, so a database hiccup doesn't lock everyone out.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    async def hit(self, key: str, limit: RateLimit, cost: float = 1.0) -> RateLimitResult:
+        now = time.time()
+        try:
+            allowed, tokens = await self.store.take(key, limit, cost, now)
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Rate limit store unavailable, allowing %s: %s", key, e)
+            return RateLimitResult(allowed=True, remaining=float(limit.burst), retry_after=0.0)
+        retry_after = 0.0
+        if not allowed:
+            retry_after = (cost - tokens) / limit.rate if limit.rate else float("inf")
+        return RateLimitResult(allowed=allowed, remaining=tokens, retry_after=retry_after)
+
+    async def enforce(self, key: str, limit: RateLimit, cost: float = 1.0):
+        """Raise 429 with Retry-After when ``key`` is out of tokens."""
+        result = await self.hit(key, limit, cost)
+        if not result.allowed:
+            raise _too_many(result.retry_after)
+
+    async def enforce_all(self, buckets: Sequence[Tuple[str, RateLimit]], cost: float = 1.0):
+        """Like enforce, but spends from every bucket or none, atomically
+        (one store call), so a request refused by one bucket doesn't use up
+        tokens in the others."""
+        if len(buckets) == 1:
+            return await self.enforce(*buckets[0], cost)
+        try:
+            allowed, levels = await self.store.take_all(buckets, cost, time.time())
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Rate limit store unavailable, allowing %s: %s", ", ".join(key for key, _ in buckets), e)
+            return
+        if not allowed:
+            raise _too_many(max(
+                (cost - tokens) / limit.rate if limit.rate else math.inf
+                for (_, limit), tokens in zip(buckets, levels)
+                if tokens < cost
+            ))
+
+
+def _too_many(retry_after: float) -> HTTPException:
+    wait = max(1, math.ceil(retry_after)) if math.isfinite(retry_after) else 60
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Too many requests. Please wait {wait} seconds.",
+        headers={"Retry-After": str(wait)},
+    )
+
+
+def _build_store():
+    backend = settings.rate_limit_backend
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "database":
+        return DatabaseBucketStore()
+    if backend == "redis":
+        return RedisBucketStore(settings.rate_limit_redis_url)
+    raise ValueError(f"Unknown rate_limit_backend: {backend!r}")
+
+
+rate_limiter = RateLimiter(_build_store())
+
+
+def client_ip(request: Request) -> str:
+    """Client address as seen by the outermost trusted proxy.
+
+    Each proxy appends the address it received the request from, so only
+    the last ``rate_limit_trusted_proxies`` X-Forwarded-For entries can be
+    believed; anything to their left is whatever the client sent.
+    """
+    trusted = settings.rate_limit_trusted_proxies
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and trusted > 0:
+        entries = [entry.strip() for entry in forwarded.split(",") if entry.strip()]
+        if len(entries) >= trusted:
+            return entries[-trusted]
+    return request.client.host if request.client else "unknown"
+
+
+def user_rate_limit(scope: str, limit: RateLimit, global_limit: Optional[RateLimit] = None):
+    """Dependency limiting each authenticated user, plus an optional shared budget."""
+    async def dependency(current_user: UserSnapshot = Depends(get_current_user)):
+        if not settings.rate_limit_enabled:
+            return
+        buckets = [(f"{scope}:user:{current_user.id}", limit)]
+        if global_limit is not None:
+            buckets.append((f"{scope}:global", global_limit))
+        await rate_limiter.enforce_all(buckets)
+    return dependency
+
+
+def ip_rate_limit(scope: str, limit: RateLimit):
+    """Dependency limiting unauthenticated endpoints by client address."""
+    async def dependency(request: Request):
+        if not settings.rate_limit_enabled:
+            return
+        await rate_limiter.enforce(f"{scope}:ip:{client_ip(request)}", limit)
+    return dependency
+
+
+ai_rate_limit = user_rate_limit(
+    "ai",
+    RateLimit(settings.rate_limit_ai_burst, settings.rate_limit_ai_per_minute),
+    RateLimit(settings.rate_limit_ai_global_burst, settings.rate_limit_ai_global_per_minute),
+)
+signup_rate_limit = ip_rate_limit(
+    "signup",
+    RateLimit(settings.rate_limit_signup_burst, settings.rate_limit_signup_per_minute),
+)
+email_rate_limit = user_rate_limit(
+    "email",
+    RateLimit(settings.rate_limit_email_burst, settings.rate_limit_email_per_minute),
+)
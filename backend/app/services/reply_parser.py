@@ -0,0 +1,243 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional
+
+from ..schemas.task import ProcessedTask
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Some models answer with "task" instead of "original_task"
+ORIGINAL_ALIASES = ("original_task", "task")
+
+# strict=False tolerates raw newlines/tabs inside strings, which models emit a lot
+_decoder = json.JSONDecoder(strict=False)
+_WHITESPACE = " \t\n\r"
+
+
+def to_processed_task(item: Any) -> Optional[ProcessedTask]:
+    """Build a ProcessedTask from one decoded reply object, or None if unusable."""
+    if not isinstance(item, dict):
+        return None
+    smart = item.get("smart_task")
+    priority = item.get("priority")
+    original = None
+    for alias in ORIGINAL_ALIASES:
+        if alias in item:
+            original = item[alias]
+            break
+    if original is None or smart is None or priority is None:
+        logger.error("Missing required fields in task: %s", item)
+        return None
+    return ProcessedTask(original_task=str(original), smart_task=str(smart), priority=str(priority))
+
+
+class ArrayStreamDecoder:
+    """Incrementally pulls the objects out of a JSON array as text arrives.
+
+    Feed it model output chunk by chunk; every time an element of the
+    outermost array closes it is decoded and returned. Anything before the
+    array (prose, a ```json fence) is skipped; as in find_array_start, a
+    ``[`` only opens it when followed by ``{`` or ``]``, so "[SMART]" in a
+    preamble doesn't count. An element that fails to decode is dropped
+    without affecting the ones after it.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._opening = False  # saw "[", waiting for the next non-space char
+        self._finished = False
+        self.errors = 0
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        items = []
+        for char in chunk:
+            if self._finished:
+                break
+            item = self._step(char)
+            if item is not None:
+                items.append(item)
+        return items
+
+    def _step(self, char: str):
+        if not self._started:
+            if self._opening and char in _WHITESPACE:
+                return None
+            if not (self._opening and char in "{]"):
+                self._opening = char == "["
+                return None
+            self._started = True
+            self._depth = 1
+
+        if self._depth >= 2:
+            self._buffer.append(char)
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+            return None
+
+        if char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+            if self._depth == 2:
+                self._buffer = [char]
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 1:
+                return self._decode()
+            if self._depth == 0:
+                self._finished = True
+        return None
+
+    def _decode(self):
+        raw = "".join(self._buffer)
+        self._buffer = []
+        try:
+            return _decoder.decode(raw)
+        except json.JSONDecodeError:
+            self.errors += 1
+            logger.warning("Skipping malformed task object in model reply: %.200s", raw)
+            return None
+
+
+@dataclass
+class ParsedReply:
+    tasks: List[ProcessedTask] = field(default_factory=list)
+    found_array: bool = False
+    skipped: int = 0  # objects that were malformed or missing fields
+
+
+def find_array_start(text: str, start: int = 0) -> int:
+    """Index of the first ``[`` that opens an array of objects, or -1.
+
+    Skips prose brackets such as "[SMART]" and works the same with or
+    without a surrounding ```json fence.
+    """
+    find = text.find
+    length = len(text)
+    pos = find("[", start)
+    while pos != -1:
+        nxt = pos + 1
+        while nxt < length and text[nxt] in _WHITESPACE:
+            nxt += 1
+        if nxt < length and text[nxt] in "{]":
+            return pos
+        pos = find("[", pos + 1)
+    return -1
+
+
+def _skip_value(text: str, pos: int) -> int:
+    """Position just past the object starting at ``pos`` (string-aware)."""
+    depth = 0
+    in_string = False
+    escape = False
+    for index in range(pos, len(text)):
+        char = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return len(text)
+
+
+def _iter_array_items(text: str, start: int, reply: ParsedReply) -> Iterator[Any]:
+    """Decode array elements one at a time starting after ``text[start] == '['``."""
+    length = len(text)
+    pos = start + 1
+    raw_decode = _decoder.raw_decode
+    while pos < length:
+        char = text[pos]
+        if char in _WHITESPACE or char == ",":
+            pos += 1
+            continue
+        if char == "]":
+            return
+        try:
+            item, pos = raw_decode(text, pos)
+        except json.JSONDecodeError:
+            end = _skip_value(text, pos) if char in "{[" else text.find(",", pos + 1)
+            reply.skipped += 1
+            logger.warning("Skipping malformed task object in model reply: %s", text[pos:pos + 200])
+            if end == -1:
+                return
+            pos = max(end, pos + 1)
+            continue
+        yield item
+
+
+def parse_reply(text: str, convert: Callable[[Any], Optional[ProcessedTask]] = to_processed_task) -> ParsedReply:
+    """Extract tasks from a complete model reply in a single pass.
+
+    Locates the outermost array (inside a code fence or after prose),
+    decodes it with orjson when available and, if the array as a whole is not
+    valid JSON, falls back to decoding its objects one by one so a single bad
+    object only costs that task. ``convert`` turns each decoded object into a
+    task (None when unusable).
+    """
+    reply = ParsedReply()
+    start = find_array_start(text)
+    if start == -1:
+        return reply
+    reply.found_array = True
+
+    items = None
+    if orjson is not None:
+        end = text.rfind("]")
+        if end > start:
+            try:
+                items = orjson.loads(text[start:end + 1])
+            except orjson.JSONDecodeError:
+                items = None
+        if not isinstance(items, list):
+            items = None
+    if items is None:
+        items = _iter_array_items(text, start, reply)
+
+    for item in items:
+        task = convert(item)
+        if task is None:
+            reply.skipped += 1
+        else:
+            reply.tasks.append(task)
+    return reply
+
+
+def iter_stream_tasks(
+    decoder: ArrayStreamDecoder,
+    chunk: str,
+    convert: Callable[[Any], Optional[ProcessedTask]] = to_processed_task,
+) -> Iterator[ProcessedTask]:
+    for item in decoder.feed(chunk):
+        task = convert(item)
+        if task is not None:
+            yield task
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+from ..core.config import settings
+from ..schemas.task import ProcessedTask
+from .ai_transformer import UpstreamError
+from .prompts import estimate_tokens
+from .transform_cache import match_results
+from .upstream_health import upstream_health
+
+logger = logging.getLogger(__name__)
+
+Generator = Callable[[str, List[str]], Awaitable[List[ProcessedTask]]]
+
+
+def chunk_tasks(tasks: Sequence[str], max_tasks: int, max_tokens: int) -> List[List[int]]:
+    """Split task indexes into chunks bounded by count and estimated tokens.
+
+    A single task larger than ``max_tokens`` still gets a chunk of its own.
+    """
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, task in enumerate(tasks):
+        tokens = estimate_tokens(task) + 2  # numbering and newline
+        if current and (len(current) >= max_tasks or current_tokens + tokens > max_tokens):
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@dataclass
+class BatchResult:
+    results: List[Optional[ProcessedTask]]
+    failed: List[int] = field(default_factory=list)
+    errors: List[HTTPException] = field(default_factory=list)
+
+
+class TransformBatcher:
+    """Fans a transform request out to the model in concurrent chunks.
+
+    Results are reassembled in input order. A chunk whose reply was unusable
+    is retried as a whole; tasks the model silently dropped are retried as a smaller chunk.
+    Failed upstream calls are not: the HTTP client has already retried them.
+    Every retry spends from upstream_health's retry budget. Whatever still
+    fails after the retries is reported instead of sinking the rest of the
+    batch.
+    """
+
+    def __init__(
+        self,
+        generate: Generator,
+        max_tasks: int = settings.ai_batch_max_tasks,
+        max_tokens: int = settings.ai_batch_max_tokens,
+        concurrency: int = settings.ai_batch_concurrency,
+        retries: int = settings.ai_batch_retries,
+    ):
+        self.generate = generate
+        self.max_tasks = max(1, max_tasks)
+        self.max_tokens = max_tokens
+        self.concurrency = max(1, concurrency)
+        self.retries = max(0, retries)
+
+    async def run(self, api_key: str, tasks: Sequence[str]) -> BatchResult:
+        batch = BatchResult(results=[None] * len(tasks))
+        if not tasks:
+            return batch
+
+        chunks = chunk_tasks(tasks, self.max_tasks, self.max_tokens)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        logger.info("Dispatching %d tasks in %d chunks (concurrency %d)", len(tasks), len(chunks), self.concurrency)
+
+        async def run_chunk(indexes: List[int]):
+            async with semaphore:
+                await self._run_chunk(api_key, tasks, indexes, batch)
+
+        await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+
+        batch.failed = [index for index, task in enumerate(batch.results) if task is None]
+        if batch.failed and len(batch.failed) == len(tasks) and batch.errors:
+            # Nothing succeeded: surface the upstream error as before
+            raise batch.errors[-1]
+        return batch
+
+    async def _run_chunk(self, api_key: str, tasks: Sequence[str], indexes: List[int], batch: BatchResult):
+        pending = indexes
+        for attempt in range(self.retries + 1):
+            if attempt and not upstream_health.allow_retry():
+                logger.warning("Retry budget exhausted, giving up on %d tasks", len(pending))
+                return
+            texts = [tasks[index] for index in pending]
+            try:
+                generated = await self.generate(api_key, texts)
+            except HTTPException as e:
+                logger.warning("Chunk of %d tasks failed (attempt %d): %s", len(pending), attempt + 1, e.detail)
+                batch.errors.append(e)
+                if isinstance(e, UpstreamError) or e.status_code in (429, 503):
+                    # The call itself failed and was already retried (or the
+                    # circuit is open): another round would only multiply calls
+                    return
+                continue
+
+            matched, surplus = match_results(texts, generated)
+            if surplus:
+                logger.warning("Ignoring %d unexpected tasks in model reply", len(surplus))
+            missing = []
+            for index, task in zip(pending, matched):
+                if task is None:
+                    missing.append(index)
+                else:
+                    batch.results[index] = task
+            if not missing:
+                return
+            logger.warning("Model dropped %d of %d tasks (attempt %d)", len(missing), len(pending), attempt + 1)
+            pending = missing
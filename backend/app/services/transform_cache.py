@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cachetools import LRUCache, TTLCache
+from sqlalchemy import func, insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..core.config import settings
+from ..core.db import session_scope
+from ..models.transform_cache import TransformCacheEntry
+from ..schemas.task import ProcessedTask
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_task(text: str) -> str:
+    """Case- and whitespace-insensitive form of a task used for cache keys."""
+    return " ".join(text.split()).casefold()
+
+
+def cache_key(model: str, prompt_version: str, text: str) -> str:
+    raw = "\x1f".join((model, prompt_version, normalize_task(text)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TransformCache:
+    """Content-addressed cache of parsed SMART transformations.
+
+    Two tiers: a per-process LRU and the shared ``transform_cache`` table, so
+    every uvicorn worker benefits from completions paid for by the others.
+    Values are ``(smart_task, priority)`` pairs; the original text always
+    comes from the caller. Both tiers expire entries after ``ttl_days``.
+    """
+
+    # Seconds between sweeps of expired rows from the table
+    PRUNE_INTERVAL = 3600.0
+
+    def __init__(self, maxsize: int, use_db: bool = True, ttl_days: float = settings.ai_cache_ttl_days):
+        self.ttl = ttl_days * 86400.0
+        self._memory: LRUCache = TTLCache(maxsize=maxsize, ttl=self.ttl) if self.ttl > 0 else LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.use_db = use_db
+        self._next_prune = 0.0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def lookup(self, model: str, prompt_version: str, tasks: Sequence[str]) -> Dict[int, ProcessedTask]:
+        """Return cached results keyed by position in ``tasks``.
+
+        Blocking (may query the database); call from a worker thread in async code.
+        """
+        keys = [cache_key(model, prompt_version, task) for task in tasks]
+        found: Dict[str, Tuple[str, str]] = {}
+
+        with self._lock:
+            for key in keys:
+                value = self._memory.get(key)
+                if value is not None:
+                    found[key] = value
+        from_memory = set(found)
+
+        pending = [key for key in set(keys) if key not in found]
+        if pending and self.use_db:
+            for key, value in self._load(pending).items():
+                found[key] = value
+            with self._lock:
+                for key in pending:
+                    if key in found:
+                        self._memory[key] = found[key]
+
+        results: Dict[int, ProcessedTask] = {}
+        memory_hits = 0
+        for index, (task, key) in enumerate(zip(tasks, keys)):
+            value = found.get(key)
+            if value is not None:
+                results[index] = ProcessedTask(original_task=task, smart_task=value[0], priority=value[1])
+                memory_hits += key in from_memory
+
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.db_hits += len(results) - memory_hits
+            self.misses += len(tasks) - len(results)
+        return results
+
+    def store(self, model: str, prompt_version: str, items: Sequence[Tuple[str, ProcessedTask]]):
+        """Cache ``(input text, result)`` pairs in both tiers.
+
+        Only results that echo their input text are kept: pairs that
+        match_results made up by position may be misaligned, and a wrong
+        entry would be served to everyone asking the same task.
+        """
+        rows = {}
+        for text, task in items:
+            if normalize_task(task.original_task) != normalize_task(text):
+                continue
+            key = cache_key(model, prompt_version, text)
+            rows[key] = (text, task.smart_task, task.priority)
+        if not rows:
+            return
+
+        with self._lock:
+            for key, (_, smart, priority) in rows.items():
+                self._memory[key] = (smart, priority)
+            self.stores += len(rows)
+
+        if self.use_db:
+            self._save(model, prompt_version, rows)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_capacity": self._memory.maxsize,
+            }
+
+    def _cutoff(self, db):
+        """created_at bound below which rows have expired, or None."""
+        if self.ttl <= 0:
+            return None
+        bound = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        # Compare SQLite's text timestamps in their own format (see repo.task)
+        return func.datetime(bound) if db.get_bind().dialect.name == "sqlite" else bound
+
+    def _load(self, keys: List[str]) -> Dict[str, Tuple[str, str]]:
+        try:
+            with session_scope() as db:
+                query = (
+                    db.query(TransformCacheEntry.key, TransformCacheEntry.smart_task, TransformCacheEntry.priority)
+                    .filter(TransformCacheEntry.key.in_(keys))
+                )
+                cutoff = self._cutoff(db)
+                if cutoff is not None:
+                    query = query.filter(TransformCacheEntry.created_at >= cutoff)
+                rows = query.all()
+            return {key: (smart, priority) for key, smart, priority in rows}
+        except SQLAlchemyError as e:
+            logger.warning("Transform cache lookup failed, treating as miss: %s", e)
+            return {}
+
+    def _save(self, model: str, prompt_version: str, rows: Dict[str, Tuple[str, str, str]]):
+        with session_scope() as db:
+            self._save_rows(db, model, prompt_version, rows)
+
+    def _save_rows(self, db, model: str, prompt_version: str, rows: Dict[str, Tuple[str, str, str]]):
+        try:
+            cutoff = self._cutoff(db)
+            if cutoff is not None:
+                expired = db.query(TransformCacheEntry).filter(TransformCacheEntry.created_at < cutoff)
+                now = time.monotonic()
+                if now >= self._next_prune:
+                    self._next_prune = now + self.PRUNE_INTERVAL
+                    pruned = expired.delete(synchronize_session=False)
+                    if pruned:
+                        logger.info("Pruned %d expired transform cache rows", pruned)
+                else:
+                    # Expired copies of these keys are replaced below
+                    expired.filter(TransformCacheEntry.key.in_(list(rows))).delete(synchronize_session=False)
+            existing = {
+                key for (key,) in db.query(TransformCacheEntry.key)
+                .filter(TransformCacheEntry.key.in_(list(rows)))
+                .all()
+            }
+            new_rows = [
+                {
+                    "key": key,
+                    "model": model,
+                    "prompt_version": prompt_version,
+                    "original_task": text,
+                    "smart_task": smart,
+                    "priority": priority,
+                }
+                for key, (text, smart, priority) in rows.items()
+                if key not in existing
+            ]
+            if new_rows:
+                db.execute(insert(TransformCacheEntry), new_rows)
+            db.commit()
+        except SQLAlchemyError as e:
+            # Another worker may have stored the same key concurrently; the
+            # cache is best-effort so losing this write is fine.
+            db.rollback()
+            logger.warning("Transform cache store failed: %s", e)
+
+
+def match_results(inputs: Sequence[str], results: Sequence[ProcessedTask]) -> Tuple[List[Optional[ProcessedTask]], List[ProcessedTask]]:
+    """Pair model results with the input tasks they answer.
+
+    Matches on the echoed ``original_task`` first and falls back to position
+    for anything the model reworded (such pairs are shown to the user but
+    not cached; see TransformCache.store). Returns the per-input results
+    (None where nothing matched) and any surplus results.
+    """
+    matched: List[Optional[ProcessedTask]] = [None] * len(inputs)
+    by_text: Dict[str, List[int]] = {}
+    for index, text in enumerate(inputs):
+        by_text.setdefault(normalize_task(text), []).append(index)
+
+    leftovers = []
+    for result in results:
+        slots = by_text.get(normalize_task(result.original_task))
+        if slots:
+            matched[slots.pop(0)] = result
+        else:
+            leftovers.append(result)
+
+    free = [index for index, value in enumerate(matched) if value is None]
+    for index, result in zip(free, leftovers):
+        matched[index] = result
+    return matched, leftovers[len(free):]
+
+
+transform_cache = TransformCache(maxsize=settings.ai_cache_size, use_db=settings.ai_cache_db_enabled)
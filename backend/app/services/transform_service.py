@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Collection, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import settings
+from ..core.db import async_session_scope
+from ..repo.task import create_tasks_bulk_async, update_task_rewrites_async
+from ..schemas.task import ProcessedTask, TransformReport
+from .ai_transformer import MODEL, PROMPT_VERSION, generate_smart_tasks, transient
+from .heuristic_transformer import heuristic_transformer
+from .near_duplicates import near_duplicates
+from .transform_batcher import BatchResult, TransformBatcher
+from .transform_cache import transform_cache
+
+logger = logging.getLogger(__name__)
+
+# Background model calls that will replace provisional rewrites
+_refinements: Set[asyncio.Task] = set()
+
+
+OnSaved = Callable[[AsyncSession, List[Dict[str, Any]]], Awaitable[None]]
+
+
+def _task_details(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": row["id"],
+            "original_task": row["original_task"],
+            "smart_task": row["smart_task"],
+            "priority": row["priority"],
+            "created_at": row["created_at"].isoformat()
+        }
+        for row in rows
+    ]
+
+
+async def save_processed_tasks(
+    tasks: List[ProcessedTask],
+    user_id: int,
+    provisional: Collection[int] = (),
+    on_saved: Optional[OnSaved] = None,
+) -> List[Dict[str, Any]]:
+    """Save ``tasks`` to the user's history; returns TaskDetail-shaped dicts.
+
+    Positions in ``provisional`` hold heuristic rewrites and are kept out of
+    the near-duplicate index. ``on_saved(db, saved_tasks)`` runs inside the
+    transaction that inserts them.
+    """
+    async with async_session_scope() as db:
+        before_commit = None
+        if on_saved is not None:
+            async def before_commit(rows):
+                await on_saved(db, _task_details(rows))
+        saved_tasks = _task_details(await create_tasks_bulk_async(db, tasks, user_id, before_commit))
+    near_duplicates.add(user_id, [task for position, task in enumerate(tasks) if position not in provisional])
+    return saved_tasks
+
+
+async def reuse_near_duplicates(user_id: int, tasks: List[str], misses: List[int]) -> Dict[int, ProcessedTask]:
+    """Results for ``tasks[index]`` (index in ``misses``) copied from near-identical saved tasks."""
+    if not settings.ai_dedup_enabled or not misses:
+        return {}
+    found = await run_in_threadpool(near_duplicates.lookup, user_id, [tasks[index] for index in misses])
+    return {misses[position]: task for position, task in found.items()}
+
+
+async def _refine(user_id: int, batch: Awaitable[BatchResult], items: List[Tuple[int, str, ProcessedTask]]):
+    """Swap provisional rewrites for the model's once ``batch`` finishes.
+
+    ``items`` are ``(task_id, text, provisional task)`` in the batch's order.
+    Runs unawaited, so every failure ends here: the provisional rows stay.
+    """
+    try:
+        result = await batch
+        rewrites, to_store = [], []
+        for (task_id, text, provisional), task in zip(items, result.results):
+            if task is not None:
+                rewrites.append((task_id, provisional.smart_task, task))
+                to_store.append((text, task))
+        if settings.ai_cache_enabled and to_store:
+            await run_in_threadpool(transform_cache.store, MODEL, PROMPT_VERSION, to_store)
+        near_duplicates.add(user_id, [task for _, task in to_store])
+        async with async_session_scope() as db:
+            await update_task_rewrites_async(db, user_id, rewrites)
+    except HTTPException as e:
+        logger.warning("Model refinement of %d provisional tasks failed: %s", len(items), e.detail, extra={"user_id": user_id})
+        return
+    except Exception:
+        logger.exception("Model refinement of %d provisional tasks crashed", len(items), extra={"user_id": user_id})
+        return
+    logger.info("Refined %d of %d provisional tasks", len(rewrites), len(items), extra={"user_id": user_id})
+
+
+async def wait_for_refinements(timeout: float):
+    """Give in-flight refinements up to ``timeout`` seconds (shutdown)."""
+    if _refinements:
+        await asyncio.wait(set(_refinements), timeout=timeout)
+
+
+async def run_transform(
+    api_key: str,
+    user_id: int,
+    tasks: List[str],
+    fast: bool = False,
+    fallback: bool = settings.ai_fast_path_fallback,
+    on_saved: Optional[Callable[[AsyncSession, Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """Transform ``tasks`` and save them to the user's history.
+
+    Shared by POST /api/ai/transform and the background job workers. Repeats
+    are served from the transformation cache, rewordings of tasks already in
+    the user's history reuse the saved rewrite; only the rest go to the model.
+
+    With ``fallback``, tasks the model fails on transiently (circuit open,
+    rate limited, 5xx, unusable reply) get the offline heuristic rewrite
+    instead, and so do all of them when it takes longer than
+    ``ai_fast_path_budget`` (the model call carries on and its answer
+    replaces the saved rewrites). ``fast`` answers from the heuristics
+    straight away and refines in the same way. Otherwise, and always for
+    auth and other client errors, upstream failures surface as
+    HTTPException, as from generate_smart_tasks.
+    Returns the TaskOutput payload (processed_tasks, saved_tasks, report);
+    ``on_saved(db, payload)`` gets it inside the transaction saving the tasks.
+    """
+    results: List[Optional[ProcessedTask]] = [None] * len(tasks)
+    report = TransformReport()
+    if settings.ai_cache_enabled:
+        cached = await run_in_threadpool(transform_cache.lookup, MODEL, PROMPT_VERSION, tasks)
+        for index, task in cached.items():
+            results[index] = task
+        report.cached = sorted(cached)
+    misses = [index for index, task in enumerate(results) if task is None]
+    reused = await reuse_near_duplicates(user_id, tasks, misses)
+    for index, task in reused.items():
+        results[index] = task
+    report.reused = sorted(reused)
+    misses = [index for index in misses if index not in reused]
+    logger.info("Transform: %d cached, %d reused, %d to generate", len(report.cached), len(reused), len(misses))
+
+    refine: Optional[asyncio.Future] = None
+    if misses:
+        # Use the user's stored API key; large lists fan out in concurrent chunks
+        miss_texts = [tasks[index] for index in misses]
+        batch_run = asyncio.ensure_future(TransformBatcher(generate_smart_tasks).run(api_key, miss_texts))
+        batch: Optional[BatchResult] = None
+        if fast:
+            refine = batch_run
+        elif not fallback:
+            batch = await batch_run
+        else:
+            try:
+                batch = await asyncio.wait_for(asyncio.shield(batch_run), timeout=settings.ai_fast_path_budget)
+            except asyncio.TimeoutError:
+                logger.warning("Model slower than %ss, answering %d tasks provisionally", settings.ai_fast_path_budget, len(misses))
+                refine = batch_run
+            except HTTPException as e:
+                if not transient(e):
+                    # A bad key or rejected request won't be fixed by waiting;
+                    # say so instead of saving made-up rewrites
+                    raise
+                logger.warning("Model unavailable (%s), answering %d tasks provisionally", e.status_code, len(misses))
+                report.upstream_error = str(e.detail)
+
+        if batch is not None:
+            to_store = []
+            for index, text, task in zip(misses, miss_texts, batch.results):
+                if task is None:
+                    report.failed.append(index)
+                    continue
+                results[index] = task
+                report.generated.append(index)
+                to_store.append((text, task))
+            if settings.ai_cache_enabled and to_store:
+                await run_in_threadpool(transform_cache.store, MODEL, PROMPT_VERSION, to_store)
+            if fallback and all(transient(e) for e in batch.errors):
+                report.provisional, report.failed = report.failed, []
+        else:
+            report.provisional = list(misses)
+            if refine is not None:
+                report.refining = list(misses)
+
+        for index in report.provisional:
+            results[index] = heuristic_transformer.transform(tasks[index])
+
+    output_indexes = [index for index, task in enumerate(results) if task is not None]
+    processed_tasks = [results[index] for index in output_indexes]
+    provisional = set(report.provisional)
+    record_output = None
+    if on_saved is not None:
+        async def record_output(db: AsyncSession, saved: List[Dict[str, Any]]):
+            await on_saved(db, {"processed_tasks": processed_tasks, "saved_tasks": saved, "report": report})
+    saved_tasks = await save_processed_tasks(
+        processed_tasks,
+        user_id,
+        provisional=[position for position, index in enumerate(output_indexes) if index in provisional],
+        on_saved=record_output,
+    )
+
+    if refine is not None:
+        saved_ids = {index: saved["id"] for index, saved in zip(output_indexes, saved_tasks)}
+        items = [(saved_ids[index], tasks[index], results[index]) for index in misses]
+        refinement = asyncio.create_task(_refine(user_id, refine, items))
+        _refinements.add(refinement)
+        refinement.add_done_callback(_refinements.discard)
+
+    logger.info("Successfully processed and saved %d tasks (%d provisional)", len(output_indexes), len(provisional))
+    return {"processed_tasks": processed_tasks, "saved_tasks": saved_tasks, "report": report}
@@ -0,0 +1,308 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+MAX_RETRY_AFTER = 300.0
+
+
+class UpstreamUnavailable(Exception):
+    """The model API is not being called: the circuit is open or upstream
+    asked this key (or everyone) to back off. ``retry_after`` is in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a rolling window of call outcomes.
+
+    Opens once at least ``min_calls`` calls finished in the last ``window``
+    seconds and ``failure_ratio`` of them failed. After ``open_seconds`` up
+    to ``half_open_probes`` calls go through at once; one success closes it,
+    a failure opens it again.
+    """
+
+    def __init__(self, window: float, min_calls: int, failure_ratio: float, open_seconds: float, half_open_probes: int):
+        self.window = window
+        self.min_calls = max(1, min_calls)
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes = 0
+        self.times_opened = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()  # (finished at, failed)
+        self._failures = 0
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        self.probes = 0
+        self.times_opened += 1
+        logger.warning(
+            "Upstream circuit opened for %.0fs (%d/%d recent calls failed)",
+            self.open_seconds,
+            self._failures,
+            len(self._outcomes),
+        )
+
+    def admit(self, now: float) -> bool:
+        """Take a slot for a call; returns whether it is a half-open probe.
+
+        Raises UpstreamUnavailable while open or while the probes are out.
+        """
+        if self.state == OPEN:
+            remaining = self.opened_at + self.open_seconds - now
+            if remaining > 0:
+                raise UpstreamUnavailable("circuit open", remaining)
+            self.state = HALF_OPEN
+            logger.info("Upstream circuit half-open, probing")
+        if self.state == HALF_OPEN:
+            if self.probes >= self.half_open_probes:
+                raise UpstreamUnavailable("circuit half-open, probe in flight", 1.0)
+            self.probes += 1
+            return True
+        return False
+
+    def record(self, probe: bool, failed: Optional[bool], now: float):
+        """Settle a slot from admit(); ``failed=None`` when the call never finished."""
+        if probe:
+            self.probes = max(0, self.probes - 1)
+            if failed is None or self.state != HALF_OPEN:
+                return
+            if failed:
+                self._open(now)
+            else:
+                self.state = CLOSED
+                self._outcomes.clear()
+                self._failures = 0
+                logger.info("Upstream circuit closed")
+            return
+        if failed is None:
+            return
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        self._trim(now)
+        if (
+            self.state == CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and self._failures >= self.failure_ratio * len(self._outcomes)
+        ):
+            self._open(now)
+
+
+class RetryBudget:
+    """Retries earned as a fraction of successful calls.
+
+    Every success deposits ``ratio`` of a retry, a slow trickle of
+    ``min_per_second`` keeps some available when traffic is low, and at most
+    ``max_balance`` can be banked, so however many requests fail at once the
+    retries they add stay a fraction of the traffic that works.
+    """
+
+    def __init__(self, ratio: float, max_balance: float, min_per_second: float, now: float):
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self.min_per_second = min_per_second
+        self.balance = max_balance
+        self.updated_at = now
+        self.spent = 0
+        self.denied = 0
+
+    def _refill(self, now: float):
+        self.balance = min(self.max_balance, self.balance + max(0.0, now - self.updated_at) * self.min_per_second)
+        self.updated_at = now
+
+    def deposit(self, now: float):
+        self._refill(now)
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self, now: float) -> bool:
+        self._refill(now)
+        if self.balance < 1.0:
+            self.denied += 1
+            return False
+        self.balance -= 1.0
+        self.spent += 1
+        return True
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class UpstreamHealth:
+    """Shared view of the model API's health for every caller in the process.
+
+    Wraps each upstream call: ``admit()`` before it (waits out a short
+    Retry-After, raises UpstreamUnavailable when the call should not be
+    made), ``record()`` after it. Also decides whether a failed call may be
+    retried and how long to back off. Single event loop, so no locking; each
+    worker process keeps its own state.
+
+    Rate limits belong to the user's API key, so a 429's Retry-After only
+    holds back calls with that key (tracked by a hash of it); a 503's
+    applies to everyone.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.ai_breaker_enabled,
+        window: float = settings.ai_breaker_window,
+        min_calls: int = settings.ai_breaker_min_calls,
+        failure_ratio: float = settings.ai_breaker_failure_ratio,
+        open_seconds: float = settings.ai_breaker_open_seconds,
+        half_open_probes: int = settings.ai_breaker_half_open_probes,
+        retry_ratio: float = settings.ai_retry_budget_ratio,
+        retry_max: float = settings.ai_retry_budget_max,
+        retry_min_per_second: float = settings.ai_retry_budget_min_per_second,
+        retry_after_max_wait: float = settings.ai_retry_after_max_wait,
+        backoff: float = settings.ai_retry_backoff,
+        backoff_max: float = settings.ai_retry_backoff_max,
+    ):
+        self.enabled = enabled
+        self.breaker = CircuitBreaker(window, min_calls, failure_ratio, open_seconds, half_open_probes)
+        self.retries = RetryBudget(retry_ratio, retry_max, retry_min_per_second, time.monotonic())
+        self.retry_after_max_wait = retry_after_max_wait
+        self.backoff_base = backoff
+        self.backoff_max = backoff_max
+        self.blocked_until = 0.0
+        self._key_blocks: Dict[str, float] = {}  # key hash -> blocked until
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.statuses: Dict[int, int] = {}
+
+    async def admit(self, api_key: Optional[str] = None) -> bool:
+        """Wait for (or refuse) permission to call upstream with ``api_key``;
+        returns the probe flag for record()."""
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        key_wait = self._key_blocks.get(_key_id(api_key), 0.0) - now if api_key else 0.0
+        wait = max(self.blocked_until - now, key_wait)
+        if wait > self.retry_after_max_wait:
+            self.rejected += 1
+            reason = "rate limited by upstream" if key_wait >= wait else "upstream overloaded"
+            raise UpstreamUnavailable(reason, wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            probe = self.breaker.admit(time.monotonic())
+        except UpstreamUnavailable:
+            self.rejected += 1
+            raise
+        self.calls += 1
+        return probe
+
+    def record(
+        self,
+        probe: bool,
+        status: Optional[int] = None,
+        error: bool = False,
+        retry_after: Optional[float] = None,
+        api_key: Optional[str] = None,
+    ):
+        """Settle a call: its HTTP ``status``, ``error`` for a transport failure,
+        or neither when it was cancelled before finishing."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if retry_after and status == 503:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+        elif retry_after and status == 429 and api_key:
+            self._block_key(_key_id(api_key), now + retry_after, now)
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        if error or (status is not None and status >= 500):
+            self.failures += 1
+            self.breaker.record(probe, True, now)
+        elif status is not None:
+            # 4xx are the caller's problem (bad key, rate limit), not upstream's health
+            if status < 400:
+                self.successes += 1
+                self.retries.deposit(now)
+            self.breaker.record(probe, False, now)
+        else:
+            self.breaker.record(probe, None, now)
+
+    def _block_key(self, key_id: str, until: float, now: float):
+        if len(self._key_blocks) >= 1000:
+            self._key_blocks = {key: blocked for key, blocked in self._key_blocks.items() if blocked > now}
+        self._key_blocks[key_id] = max(self._key_blocks.get(key_id, 0.0), until)
+
+    def allow_retry(self, retry_after: Optional[float] = None) -> bool:
+        """Whether a failed call may be retried: not past a long Retry-After
+        (callers fail fast instead) and within the retry budget."""
+        if not self.enabled:
+            return True
+        if retry_after is not None and retry_after > self.retry_after_max_wait:
+            return False
+        return self.retries.withdraw(time.monotonic())
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than ``retry_after``."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return max(random.uniform(0, ceiling), retry_after or 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        breaker = self.breaker
+        breaker._trim(now)
+        open_for = breaker.opened_at + breaker.open_seconds - now if breaker.state == OPEN else 0.0
+        return {
+            "enabled": self.enabled,
+            "state": breaker.state,
+            "open_for": round(max(0.0, open_for), 3),
+            "times_opened": breaker.times_opened,
+            "window_calls": len(breaker._outcomes),
+            "window_failures": breaker._failures,
+            "blocked_for": round(max(0.0, self.blocked_until - now), 3),
+            "blocked_keys": sum(blocked > now for blocked in self._key_blocks.values()),
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "statuses": dict(self.statuses),
+            "retry_budget": {
+                "balance": round(self.retries.balance, 3),
+                "spent": self.retries.spent,
+                "denied": self.retries.denied,
+            },
+        }
+
+
+upstream_health = UpstreamHealth()
@@ -0,0 +1,26 @@
+from typing import List
+from .templates import templates
+
+PRIORITY_COLORS = {
+    "High": "#ff6b6b",
+    "Medium": "#feca57",
+    "Low": "#48dbfb"
+}
+DEFAULT_PRIORITY_COLOR = "#ced6e0"
+
+def render_task_results(name: str, tasks: List[str], processed_tasks: List[dict]) -> str:
+    rows = (
+        {
+            # The web client sends original_task; older clients sent task
+            "original_task": task.get("original_task") or task.get("task") or "",
+            "smart_task": task.get("smart_task") or "",
+            "priority": task.get("priority") or "",
+            "priority_color": PRIORITY_COLORS.get(task.get("priority"), DEFAULT_PRIORITY_COLOR),
+        }
+        for task in processed_tasks
+    )
+    return templates["task_results.html"].render(
+        name=name,
+        original_tasks=templates["task_results_item.html"].render_many({"task": task} for task in tasks),
+        task_rows=templates["task_results_row.html"].render_many(rows),
+    )
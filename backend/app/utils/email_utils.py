@@ -1,26 +1,14 @@
-from fastapi_mail import FastMail,MessageSchema,ConnectionConfig
-from ..core.config import settings
-from typing import List
-
-conf= ConnectionConfig(
-    MAIL_USERNAME = settings.mail_username,
-    MAIL_PASSWORD = settings.mail_password,
-    MAIL_FROM = settings.mail_from,
-    MAIL_PORT = settings.mail_port,
-    MAIL_SERVER = settings.mail_server,
-    MAIL_FROM_NAME = "Sortify Team",  # You can customize
-    MAIL_STARTTLS = True,
-    MAIL_SSL_TLS = False,
-    USE_CREDENTIALS = True,
-    VALIDATE_CERTS = True
-)
-async def send_verification_link(to: str, subject: str, body: str, subtype: str = "html"):
-    message = MessageSchema(
-        subject=subject,
-        recipients=[to],
-        body=body,
-        subtype=subtype
-    )
-
-    fm = FastMail(conf)
-    await fm.send_message(message)
+from ..core.db import async_session_scope
+from ..repo.email_outbox import enqueue_email_async
+from ..services.email_sender import email_sender
+
+async def queue_email(to: str, subject: str, body: str, subtype: str = "html") -> int:
+    """Store a message in the outbox and return its id.
+
+    Delivery happens in the background (services/email_sender.py), so callers
+    don't wait on the SMTP conversation.
+    """
+    async with async_session_scope() as db:
+        email = await enqueue_email_async(db, to, subject, body, subtype)
+    email_sender.notify()
+    return email.id
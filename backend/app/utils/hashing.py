@@ -1,13 +1,100 @@
-from passlib.context import CryptContext
-
-pwd_cxt=CryptContext(schemes=["bcrypt"],deprecated="auto")
-
-class Hash:
-    @staticmethod
-    def bcrypt(password: str) -> str:
-        return pwd_cxt.hash(password)
-    
-    @staticmethod
-    def verify(plain_password: str, hashed_password: str) -> bool:
-        return pwd_cxt.verify(plain_password,hashed_password)
-    
\ No newline at end of file
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from ..core.config import settings
+
+# min_rounds makes hashes created with a lower cost factor "deprecated", so
+# they get upgraded transparently on the next successful login
+pwd_cxt=CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+)
+
+class Hash:
+    @staticmethod
+    def bcrypt(password: str) -> str:
+        return pwd_cxt.hash(password)
+
+    @staticmethod
+    def verify(plain_password: str, hashed_password: str) -> bool:
+        return pwd_cxt.verify(plain_password,hashed_password)
+
+    @staticmethod
+    def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return pwd_cxt.verify_and_update(plain_password,hashed_password)
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool already has as much work as it accepts."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool with async wrappers.
+
+    bcrypt releases the GIL while it works, so threads give real parallelism
+    without blocking the event loop. At most ``max_pending`` calls may be
+    running or queued; beyond that callers get HasherBusy immediately rather
+    than piling up behind a login burst.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HasherBusy()
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(Hash.bcrypt, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(Hash.verify, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify, returning a replacement hash when the stored one is outdated."""
+        return await self._run(Hash.verify_and_update, plain_password, hashed_password)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "rejected": self.rejected,
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
@@ -1,50 +1,71 @@
-from datetime import datetime,timezone,timedelta
-from jose import jwt,JWTError
-from ..core.config import settings
-from typing import Optional 
-from fastapi import HTTPException,Depends,status
-from fastapi.security import OAuth2PasswordBearer
-from ..core.db import get_db
-from ..models.user import User
-from sqlalchemy.orm import Session
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-def create_access_token(data: dict, expires_delta:timedelta=None):
-    to_encode = data.copy()
-    expire=datetime.now(timezone.utc)+(expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
-    to_encode.update(
-        {"exp":expire}
-    )
-    encoded_jwt = jwt.encode(to_encode,settings.secret_key,algorithm=settings.algorithm)
-    return encoded_jwt
-
-def refresh_access_token(data: dict):
-    to_encode = data.copy()
-    expire=datetime.now(timezone.utc)+timedelta(days=7)
-    to_encode.update(
-        {"exp":expire}
-    )
-    encoded_jwt = jwt.encode(to_encode,settings.secret_key,algorithm=settings.algorithm)
-    return encoded_jwt
-
-def verify_token(token:str,cred_exp):
-    try:
-        payload = jwt.decode(token,settings.secret_key,algorithms=[settings.algorithm])
-        username:str=payload.get("sub")
-        if username is None:
-            raise cred_exp
-        return username
-    except JWTError:
-        raise cred_exp
-    
-def get_current_user(token:str=Depends(oauth2_scheme),db:Session=Depends(get_db)):
-    cred_exp = HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate":"Bearer"}
-            )
-    username=verify_token(token,cred_exp)
-    user=db.query(User).filter(User.email==username).first()
-    if user is None:
-        raise cred_exp
-    return user
\ No newline at end of file
+import secrets
+from datetime import datetime,timezone,timedelta
+from jose import jwt,JWTError
+from ..core.config import settings
+from typing import Optional 
+from fastapi import HTTPException,Depends,Request,status
+from fastapi.security import OAuth2PasswordBearer
+from ..core.db import async_session_scope
+from ..repo.user import asyncUserRepo
+from .user_cache import UserSnapshot, user_cache
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+def create_access_token(data: dict, expires_delta:timedelta=None):
+    to_encode = data.copy()
+    expire=datetime.now(timezone.utc)+(expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
+    to_encode.update(
+        {"exp":expire}
+    )
+    encoded_jwt = jwt.encode(to_encode,settings.secret_key,algorithm=settings.algorithm)
+    return encoded_jwt
+
+def refresh_access_token(data: dict):
+    to_encode = data.copy()
+    expire=datetime.now(timezone.utc)+timedelta(days=7)
+    to_encode.update(
+        {"exp":expire}
+    )
+    encoded_jwt = jwt.encode(to_encode,settings.secret_key,algorithm=settings.algorithm)
+    return encoded_jwt
+
+def verify_token(token:str,cred_exp):
+    try:
+        payload = jwt.decode(token,settings.secret_key,algorithms=[settings.algorithm])
+        username:str=payload.get("sub")
+        if username is None:
+            raise cred_exp
+        return username
+    except JWTError:
+        raise cred_exp
+    
+async def get_current_user(token:str=Depends(oauth2_scheme)) -> UserSnapshot:
+    cred_exp = HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials",
+                headers={"WWW-Authenticate":"Bearer"}
+            )
+    username=verify_token(token,cred_exp)
+    cached=user_cache.get(username)
+    if cached is not None:
+        return cached
+
+    # Only open a session on a cache miss
+    async with async_session_scope() as db:
+        user=await asyncUserRepo.get_by_email(db,username)
+        if user is None:
+            raise cred_exp
+        snapshot=UserSnapshot.from_user(user)
+    user_cache.put(username,snapshot)
+    return snapshot
+
+
+def require_metrics_token(request:Request):
+    """Operational endpoints: callers must send "Authorization: Bearer <metrics_token>".
+    Without a metrics_token configured they are only served with metrics_public."""
+    if not settings.metrics_token:
+        if settings.metrics_public:
+            return
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    supplied=request.headers.get("authorization","").removeprefix("Bearer ").strip()
+    if not secrets.compare_digest(supplied,settings.metrics_token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
@@ -0,0 +1,75 @@
+import hashlib
+import re
+from html import escape
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping
+
+TEMPLATE_DIR = Path(__file__).parent.parent / "templates"
+
+# {{ name }} slots; single braces (CSS) are left alone
+_SLOT = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class Safe(str):
+    """Already-rendered HTML that must not be escaped again (e.g. table rows)."""
+
+
+def _text(value) -> str:
+    if isinstance(value, Safe):
+        return value
+    return escape("" if value is None else str(value), quote=True)
+
+
+class Template:
+    """A template parsed once into static chunks and named slots.
+
+    Static chunks are kept both as str and as pre-encoded UTF-8 bytes;
+    rendering escapes each value (unless it is ``Safe``) and joins the
+    pieces in a single pass, with no per-call parsing or concatenation.
+    """
+
+    def __init__(self, source: str, name: str = "<string>"):
+        parts = _SLOT.split(source)
+        self.name = name
+        self.static: List[str] = parts[0::2]
+        self.static_bytes: List[bytes] = [part.encode("utf-8") for part in self.static]
+        self.slots: List[str] = parts[1::2]
+
+    def _values(self, values: Mapping) -> List[str]:
+        try:
+            return [_text(values[slot]) for slot in self.slots]
+        except KeyError as e:
+            raise KeyError(f"Template {self.name} needs a value for {e.args[0]!r}") from None
+
+    def render(self, **values) -> str:
+        pieces = [self.static[0]]
+        for value, static in zip(self._values(values), self.static[1:]):
+            pieces.append(value)
+            pieces.append(static)
+        return "".join(pieces)
+
+    def render_bytes(self, **values) -> bytes:
+        pieces = [self.static_bytes[0]]
+        for value, static in zip(self._values(values), self.static_bytes[1:]):
+            pieces.append(value.encode("utf-8"))
+            pieces.append(static)
+        return b"".join(pieces)
+
+    def render_many(self, rows: Iterable[Mapping]) -> Safe:
+        """Render the template once per row and join the results."""
+        return Safe("".join(self.render(**row) for row in rows))
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _load_all(directory: Path) -> Dict[str, Template]:
+    return {
+        path.name: Template(path.read_text(encoding="utf-8"), path.name)
+        for path in sorted(directory.glob("*.html"))
+    }
+
+
+# Compiled once, at import (i.e. app startup)
+templates: Dict[str, Template] = _load_all(TEMPLATE_DIR)
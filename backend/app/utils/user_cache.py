@@ -0,0 +1,85 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from cachetools import TTLCache
+
+from ..core.config import settings
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Read-only copy of the fields request handlers need from a User row.
+
+    Handed out by get_current_user instead of a live ORM object so it can be
+    cached across requests; to change a user, load the row in your own
+    session and call ``user_cache.invalidate`` afterwards.
+    """
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    is_active: bool
+    api_key: Optional[str]
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=bool(user.is_active),
+            api_key=user.api_key,
+        )
+
+
+class UserCache:
+    """TTL + LRU cache of UserSnapshots keyed by token subject (email).
+
+    Per process: an invalidation only reaches the worker that made the change,
+    so the TTL bounds how long other workers can serve a stale snapshot.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, subject: str) -> Optional[UserSnapshot]:
+        with self._lock:
+            snapshot = self._cache.get(subject)
+            if snapshot is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return snapshot
+
+    def put(self, subject: str, snapshot: UserSnapshot):
+        with self._lock:
+            self._cache[subject] = snapshot
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            if self._cache.pop(subject, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._cache),
+            }
+
+
+user_cache = UserCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
@@ -0,0 +1,55 @@
+"""Standalone background worker: transform jobs and the email outbox.
+
+    cd backend && python -m app.worker
+
+Drains the same transform_jobs and email_outbox tables as the in-process
+workers; run it next to the API (with JOB_WORKER_IN_API=false and
+MAIL_SENDER_IN_API=false there) to keep model calls and SMTP out of the web
+process entirely.
+"""
+import asyncio
+import logging
+import signal
+
+from .core.log import setup_logging
+from .core.db import Base, engine, async_engine, ensure_columns, ensure_indexes
+from .models.user import User
+from .models.task import Task, TaskCount
+from .models.transform_cache import TransformCacheEntry
+from .models.job import TransformJob
+from .models.email_outbox import OutboxEmail
+from .repo.task_search import ensure_task_search
+from .services.openrouter import ai_client
+from .services.job_worker import job_worker
+from .services.email_sender import email_sender
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()
+    ensure_task_search()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await ai_client.start()
+    await job_worker.start()
+    await email_sender.start()
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Shutting down background workers")
+        await email_sender.stop()
+        await job_worker.stop()
+        await ai_client.close()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
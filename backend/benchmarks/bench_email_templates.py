@@ -0,0 +1,186 @@
+"""Render-time benchmark for the task results email.
+
+Compares the template layer (``app/utils/email_templates.py``) with the f-string
+and ``+=`` build ``send_task_result`` used to do, on a synthetic list of
+tasks (500 by default). The old build did not escape anything, so it is also
+timed with escaping added, which is what the templates actually replace.
+
+    cd backend && python -m benchmarks.bench_email_templates [--tasks N] [--number N]
+"""
+import argparse
+import random
+import time
+from html import escape
+
+from app.utils.email_templates import render_task_results
+
+PRIORITIES = ("High", "Medium", "Low")
+
+
+def legacy_render(name, tasks, processed_tasks):
+    """The pre-template send_task_result body, kept here as the baseline."""
+    original_tasks_html = "".join([f"<li>{task}</li>" for task in tasks])
+    
+    processed_tasks_html = ""
+    for task in processed_tasks:
+        priority_color = {
+            "High": "#ff6b6b",
+            "Medium": "#feca57",
+            "Low": "#48dbfb"
+        }.get(task['priority'], "#ced6e0")
+
+        processed_tasks_html += f"""
+        <tr>
+            <td>{task['original_task']}</td>
+            <td>{task['smart_task']}</td>
+            <td style="color: {priority_color}; font-weight: bold;">{task['priority']}</td>
+        </tr>
+        """
+    
+    email_body = f"""
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Your Organized Tasks from SortIQ</title>
+    <style>
+    body {{
+        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
+        line-height: 1.6;
+        color: #333;
+        background-color: #f4f4f4;
+        margin: 0;
+        padding: 20px;
+    }}
+    .container {{
+        max-width: 600px;
+        margin: 0 auto;
+        background-color: #ffffff;
+        border-radius: 10px;
+        padding: 30px;
+        box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+    }}
+    h1, h2 {{
+        color: #2c3e50;
+        border-bottom: 2px solid #ecf0f1;
+        padding-bottom: 10px;
+    }}
+    h1 {{ font-size: 24px; }}
+    h2 {{ font-size: 20px; margin-top: 30px; }}
+    table {{
+        width: 100%;
+        border-collapse: collapse;
+        margin-top: 20px;
+    }}
+    th, td {{
+        padding: 12px 15px;
+        text-align: left;
+        border-bottom: 1px solid #ddd;
+    }}
+    th {{
+        background-color: #f8f9fa;
+        font-weight: bold;
+    }}
+    ul {{
+        padding-left: 20px;
+    }}
+    .footer {{
+        margin-top: 30px;
+        text-align: center;
+        font-size: 12px;
+        color: #888;
+    }}
+    </style>
+</head>
+<body>
+    <div class="container">
+    <h1>Hello {name}!</h1>
+    <p>Here are your organized tasks from SortIQ:</p>
+
+    <h2>📋 Original Tasks</h2>
+    <ul>{original_tasks_html}</ul>
+
+    <h2>✨ Transformed Tasks</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Original Task</th>
+                <th>SMART Task</th>
+                <th>Priority</th>
+            </tr>
+        </thead>
+        <tbody>
+            {processed_tasks_html}
+        </tbody>
+    </table>
+
+    <p class="footer">
+        Best regards,<br>
+        The SortIQ Team
+    </p>
+    </div>
+</body>
+</html>
+    """
+    return email_body
+
+
+def legacy_escaped_render(name, tasks, processed_tasks):
+    """The baseline with html.escape added per value: the cost of making the
+    old f-string build safe, which is the fair comparison for templates."""
+    return legacy_render(
+        escape(name),
+        [escape(task) for task in tasks],
+        [{key: escape(str(value)) for key, value in task.items()} for task in processed_tasks],
+    )
+
+
+def make_tasks(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    verbs = ["Write", "Review", "Email", "Plan", "Fix", "Call", "Prepare", "Update"]
+    objects = ["quarterly report", "onboarding doc", "Q&A <draft>", "client invoice", "sprint board", "budget sheet"]
+    tasks, processed = [], []
+    for index in range(count):
+        task = f"{rng.choice(verbs)} {rng.choice(objects)} #{index}"
+        tasks.append(task)
+        processed.append({
+            "original_task": task,
+            "smart_task": f"{task} with measurable outcome by Friday 5pm, reviewed by the team lead",
+            "priority": rng.choice(PRIORITIES),
+        })
+    return tasks, processed
+
+
+def bench(fn, args, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=500, help="tasks in the email")
+    parser.add_argument("--number", type=int, default=200, help="renders per variant")
+    args = parser.parse_args()
+
+    tasks, processed = make_tasks(args.tasks)
+    call = ("Ada Lovelace", tasks, processed)
+    variants = (
+        ("legacy f-string", legacy_render),
+        ("legacy + escape", legacy_escaped_render),
+        ("templates", render_task_results),
+    )
+
+    print(f"{args.tasks} tasks, {args.number} renders each")
+    for name, fn in variants:
+        size = len(fn(*call).encode("utf-8"))
+        bench(fn, call, max(1, args.number // 10))  # warm-up
+        elapsed = bench(fn, call, args.number)
+        per_render_ms = elapsed / args.number * 1000
+        print(f"{name:<16} {per_render_ms:>8.3f} ms/render {args.number / elapsed:>9.0f} renders/s {size / 1024:>8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Prompt-size benchmark for the transform request templates.
+
+Compares the original prompt (``v1``) with the compact one (``v2``) from
+``app/services/prompts.py``: estimated prompt and completion tokens, the
+``max_tokens`` each request asks for, and end-to-end latency. Requests go
+through ``OpenRouterClient`` to a mock upstream that replays the rewrites
+recorded in ``data/llm_replies.jsonl`` in the shape each template asks for,
+taking ``first-token + prompt tokens x prefill + completion tokens x decode``
+to answer (sped up by ``--speedup``, with reported latencies scaled back);
+replies are parsed the way ``generate_smart_tasks`` does.
+
+    cd backend && python -m benchmarks.bench_prompts [--sizes 5,15,50] [--rounds N] [--decode-ms 15]
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+import httpx
+
+from app.services.openrouter import ai_client
+from app.services.prompts import TEMPLATES, estimate_message_tokens, estimate_tokens, request_body
+from app.services.reply_parser import parse_reply
+
+CORPUS = Path(__file__).parent / "data" / "llm_replies.jsonl"
+MODEL = "mock/model"
+
+
+def load_recorded():
+    """original_task -> recorded ProcessedTask, from every reply in the corpus."""
+    recorded = {}
+    for line in CORPUS.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            for task in parse_reply(json.loads(line)["reply"]).tasks:
+                recorded[task.original_task] = task
+    return recorded
+
+
+def recorded_reply(version, tasks, recorded):
+    """What the model answered for ``tasks``, in the shape ``version`` asks for."""
+    if version == "v1":
+        items = [
+            {"original_task": task, "smart_task": recorded[task].smart_task, "priority": recorded[task].priority}
+            for task in tasks
+        ]
+        return "```json\n" + json.dumps(items, indent=2, ensure_ascii=False) + "\n```"
+    items = [
+        {"i": number, "s": recorded[task].smart_task, "p": recorded[task].priority[0]}
+        for number, task in enumerate(tasks, 1)
+    ]
+    return json.dumps(items, ensure_ascii=False)
+
+
+def mock_upstream(recorded, args, requests):
+    async def handler(request):
+        body = json.loads(request.content)
+        version, tasks = requests[body["messages"][-1]["content"]]
+        reply = recorded_reply(version, tasks, recorded)
+        prompt_tokens = estimate_message_tokens(body["messages"])
+        completion_tokens = estimate_tokens(reply)
+        modelled_ms = args.first_token_ms + prompt_tokens * args.prefill_ms + completion_tokens * args.decode_ms
+        await asyncio.sleep(modelled_ms / 1000 / args.speedup)
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+        })
+    return handler
+
+
+async def run(args):
+    recorded = load_recorded()
+    originals = sorted(recorded)
+    requests = {}  # prompt text -> (version, tasks), so the mock knows what was asked
+    ai_client._client = httpx.AsyncClient(transport=httpx.MockTransport(mock_upstream(recorded, args, requests)))
+
+    print(f"recorded rewrites: {len(recorded)}; mock upstream: {args.first_token_ms:.0f} ms first token, "
+          f"{args.prefill_ms} ms/prompt token, {args.decode_ms} ms/completion token")
+    print(f"{'tasks':>5} {'prompt':>7} {'prompt tok':>11} {'completion tok':>15} {'max_tokens':>11} {'bytes':>7} {'e2e ms':>8} {'tasks back':>11}")
+    for size in args.sizes:
+        rows = {}
+        for version, template in sorted(TEMPLATES.items()):
+            latencies, prompt_tokens, completion_tokens, recovered = [], [], [], 0
+            for round_ in range(args.rounds):
+                tasks = random.Random(args.seed + round_).sample(originals, min(size, len(originals)))
+                body = request_body(template, tasks, MODEL)
+                requests[body["messages"][-1]["content"]] = (version, tasks)
+                started = time.perf_counter()
+                response = await ai_client.chat_completion("sk-bench", body)
+                data = response.json()
+                parsed = parse_reply(data["choices"][0]["message"]["content"], lambda item: template.to_task(item, tasks))
+                latencies.append((time.perf_counter() - started) * 1000 * args.speedup)
+                prompt_tokens.append(data["usage"]["prompt_tokens"])
+                completion_tokens.append(data["usage"]["completion_tokens"])
+                recovered += sum(task.original_task == expected for task, expected in zip(parsed.tasks, tasks))
+            rows[version] = (statistics.median(prompt_tokens), statistics.median(completion_tokens), statistics.median(latencies))
+            print(
+                f"{size:>5} {version:>7} {rows[version][0]:>11.0f} {rows[version][1]:>15.0f} "
+                f"{body.get('max_tokens', '-'):>11} {len(json.dumps(body)):>7} {rows[version][2]:>8.0f} "
+                f"{recovered:>5}/{size * args.rounds:<5}"
+            )
+        if "v1" in rows and "v2" in rows:
+            old, new = rows["v1"], rows["v2"]
+            print(
+                f"{'':>5} {'saving':>7} {1 - new[0] / old[0]:>11.0%} {1 - new[1] / old[1]:>15.0%} "
+                f"{'':>11} {'':>7} {1 - new[2] / old[2]:>8.0%}"
+            )
+    await ai_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[5, 15, 50])
+    parser.add_argument("--rounds", type=int, default=5, help="task lists per size and template")
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--prefill-ms", type=float, default=0.2)
+    parser.add_argument("--decode-ms", type=float, default=15.0, help="free-tier models decode at roughly 50-80 tokens/s")
+    parser.add_argument("--speedup", type=float, default=10.0, help="run the mock this many times faster; latencies are scaled back")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)  # request/response logging would dominate the output
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Parse-throughput benchmark for LLM transform replies.
+
+Compares ``app.services.reply_parser.parse_reply`` against the cleanup/parse
+steps ``process_tasks`` used to run inline. Replies live in
+``data/llm_replies.jsonl`` (one ``{"kind", "reply"}`` object per line); append
+new shapes there as they show up in the logs.
+
+    cd backend && python -m benchmarks.bench_reply_parser [--number N]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from app.schemas.task import ProcessedTask
+from app.services import reply_parser
+from app.services.reply_parser import parse_reply
+
+CORPUS = Path(__file__).parent / "data" / "llm_replies.jsonl"
+
+
+def legacy_parse(ai_reply: str):
+    """The pre-reply_parser algorithm, kept here as the baseline."""
+    ai_reply = ai_reply.strip()
+    if ai_reply.startswith('```'):
+        content_start = ai_reply.find('\n')
+        if content_start != -1:
+            ai_reply = ai_reply[content_start:].strip()
+        if '```' in ai_reply:
+            closing_fence = ai_reply.rfind('```')
+            ai_reply = ai_reply[:closing_fence].strip()
+    if not ai_reply.startswith('['):
+        start_idx = ai_reply.find('[')
+        if start_idx != -1:
+            ai_reply = ai_reply[start_idx:]
+    ai_reply = ai_reply.replace('\n', ' ').replace('\r', '')
+    ai_reply = ai_reply.strip()
+    try:
+        try:
+            processed_tasks = json.loads(ai_reply)
+        except json.JSONDecodeError:
+            start_idx = ai_reply.find('[')
+            end_idx = ai_reply.rfind(']') + 1
+            if start_idx != -1 and end_idx > start_idx:
+                processed_tasks = json.loads(ai_reply[start_idx:end_idx])
+            else:
+                return []
+    except json.JSONDecodeError:
+        return []
+    output = []
+    for task in processed_tasks:
+        if 'original_task' in task and 'smart_task' in task and 'priority' in task:
+            output.append(ProcessedTask(original_task=task['original_task'], smart_task=task['smart_task'], priority=task['priority']))
+        elif 'task' in task and 'smart_task' in task and 'priority' in task:
+            output.append(ProcessedTask(original_task=task['task'], smart_task=task['smart_task'], priority=task['priority']))
+    return output
+
+
+def new_parse(ai_reply: str):
+    return parse_reply(ai_reply).tasks
+
+
+def bench(fn, replies, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        for reply in replies:
+            fn(reply)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="passes over the corpus")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)  # parse warnings would dominate the timings
+
+    corpus = [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    replies = [item["reply"] for item in corpus]
+    total_bytes = sum(len(reply.encode("utf-8")) for reply in replies)
+
+    print(f"corpus: {len(replies)} replies, {total_bytes / 1024:.1f} KiB, orjson={'yes' if reply_parser.orjson else 'no'}")
+    print(f"{'kind':<18}{'legacy tasks':>13}{'new tasks':>11}{'legacy us':>11}{'new us':>9}")
+    for item in corpus:
+        reply = [item["reply"]]
+        legacy_us = bench(legacy_parse, reply, args.number) / args.number * 1e6
+        new_us = bench(new_parse, reply, args.number) / args.number * 1e6
+        print(
+            f"{item['kind']:<18}{len(legacy_parse(item['reply'])):>13}{len(new_parse(item['reply'])):>11}"
+            f"{legacy_us:>11.1f}{new_us:>9.1f}"
+        )
+
+    print()
+    for name, fn in (("legacy", legacy_parse), ("reply_parser", new_parse)):
+        recovered = sum(len(fn(reply)) for reply in replies)
+        elapsed = bench(fn, replies, args.number)
+        replies_per_s = len(replies) * args.number / elapsed
+        mib_per_s = total_bytes * args.number / elapsed / (1024 * 1024)
+        print(f"{name:<14} {replies_per_s:>10.0f} replies/s {mib_per_s:>8.1f} MiB/s {recovered:>6} tasks recovered")
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,7 @@ import {
   Trash2,
   UserCircle,
 } from 'lucide-react';
-import api, { deleteTask, getTasks, saveTask, updateTaskStatus, updateApiKey } from '../services/api';
+import api, { deleteTask, getTasks, getTaskStats, saveTask, updateTaskStatus, updateApiKey } from '../services/api';
 import appIcon from '../components/icon.png';
 
 const priorityStyles = {
@@ -27,6 +27,9 @@ const priorityStyles = {
   Low: 'bg-emerald-100 text-emerald-700 dark:bg-emerald-900/30 dark:text-emerald-300',
 };
 
+// The dashboard shows the most recent tasks; full history lives on /history
+const RECENT_TASKS = 100;
+
 const statusStyles = {
   done: 'text-emerald-600 dark:text-emerald-400',
   active: 'text-amber-600 dark:text-amber-400',
@@ -118,11 +121,11 @@ const Topbar = ({ onOpenModal, onLogout, user, onOpenApiKey }) => {
   );
 };
 
-const OverviewCards = ({ tasks }) => {
-  const total = tasks.length;
-  const completed = tasks.filter((t) => t.status === 'done').length;
+const OverviewCards = ({ stats }) => {
+  const total = stats?.total ?? 0;
+  const completed = stats?.by_status?.done ?? 0;
   const pending = total - completed;
-  const high = tasks.filter((t) => t.priority === 'High').length;
+  const high = stats?.by_priority?.High ?? 0;
   const cards = [
     { title: 'Total Tasks', value: total, icon: LayoutDashboard, color: 'from-blue-500 to-indigo-500' },
     { title: 'Completed', value: completed, icon: CheckCircle2, color: 'from-emerald-500 to-teal-500' },
@@ -306,15 +309,25 @@ const AddTaskModal = ({ open, onClose, onCreate }) => {
 const Dashboard = () => {
   const { user, logout } = useAuth();
   const [tasks, setTasks] = useState([]);
+  const [stats, setStats] = useState(null);
   const [openModal, setOpenModal] = useState(false);
   const [loading, setLoading] = useState(true);
   const [apiKeyOpen, setApiKeyOpen] = useState(false);
   const [apiKey, setApiKey] = useState('');
   const [apiKeySaving, setApiKeySaving] = useState(false);
 
+  const refreshStats = async () => {
+    try {
+      const res = await getTaskStats();
+      setStats(res.data);
+    } catch (e) {
+      console.error('Failed to load task stats', e);
+    }
+  };
+
   const fetchTasks = async () => {
     try {
-      const res = await getTasks();
+      const [res] = await Promise.all([getTasks({ limit: RECENT_TASKS }), refreshStats()]);
       setTasks(res.data || []);
     } catch (e) {
       console.error('Failed to load tasks', e);
@@ -342,6 +355,7 @@ const Dashboard = () => {
       const { original_task, smart_task, priority } = task;
       const res = await saveTask({ original_task, smart_task, priority });
       setTasks((prev) => [{ ...res.data, deadline: task.deadline || null }, ...prev]);
+      refreshStats();
     } catch (e) {
       console.error('Failed to create task', e);
     }
@@ -351,6 +365,7 @@ const Dashboard = () => {
     try {
       await updateTaskStatus(task.id, 'done');
       setTasks((prev) => prev.map((t) => (t.id === task.id ? { ...t, status: 'done' } : t)));
+      refreshStats();
     } catch (e) {
       console.error('Failed to update status', e);
     }
@@ -360,6 +375,7 @@ const Dashboard = () => {
     try {
       await deleteTask(task.id);
       setTasks((prev) => prev.filter((t) => t.id !== task.id));
+      refreshStats();
     } catch (e) {
       console.error('Failed to delete task', e);
     }
@@ -378,7 +394,7 @@ const Dashboard = () => {
           <main className="flex-1 min-h-screen">
             <Topbar user={user} onOpenModal={() => setOpenModal(true)} onLogout={logout} onOpenApiKey={openApiKeyModal} />
             <div className="p-4 md:p-6 space-y-6">
-              <OverviewCards tasks={tasks} />
+              <OverviewCards stats={stats} />
               <div className="grid grid-cols-1 lg:grid-cols-3 gap-6">
                 <div className="lg:col-span-2">
                   <TaskTable tasks={grouped.active} onComplete={handleComplete} onDelete={handleDelete} />
@@ -12,7 +12,7 @@ import {
   ChevronUp
 } from 'lucide-react';
 import { useAuth } from '../contexts/AuthContext';
-import { getTasks, deleteTask, updateTaskStatus } from '../services/api';
+import { getTasks, deleteTask, deleteTasks, searchTasks, updateTaskStatus, updateTasksStatus } from '../services/api';
 import toast from 'react-hot-toast';
 
 const History = () => {
@@ -20,6 +20,7 @@ const History = () => {
   const [tasks, setTasks] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
+  const [searchResults, setSearchResults] = useState(null); // server matches for searchTerm
   const [expandedItems, setExpandedItems] = useState(new Set());
   const [sortBy, setSortBy] = useState('date'); // 'date', 'priority'
   const [filterPriority, setFilterPriority] = useState('all'); // 'all', 'High', 'Medium', 'Low'
@@ -33,6 +34,28 @@ const History = () => {
     return () => clearInterval(intervalId); // Cleanup on unmount
   }, [user?.id]); // Only re-run if user ID changes
 
+  // Search runs on the server (full-text index) once typing pauses
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (!term) {
+      setSearchResults(null);
+      return undefined;
+    }
+    let cancelled = false;
+    const timeoutId = setTimeout(async () => {
+      try {
+        const response = await searchTasks(term, { limit: 50 });
+        if (!cancelled) setSearchResults(response.data.items || []);
+      } catch (error) {
+        console.error('Search failed:', error);
+      }
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timeoutId);
+    };
+  }, [searchTerm, tasks]);
+
   const fetchTasks = async () => {
     try {
       setIsLoading(true);
@@ -69,9 +92,34 @@ const History = () => {
     }
   };
 
+  // Acts on the tasks currently listed (search and priority filter applied)
+  const handleMarkAllDone = async (taskList) => {
+    try {
+      const response = await updateTasksStatus({ ids: taskList.map((task) => task.id) }, 'done');
+      toast.success(`${response.data.ids.length} tasks marked as done`);
+      fetchTasks();
+    } catch (error) {
+      console.error('Failed to update tasks:', error);
+      toast.error('Failed to update tasks');
+    }
+  };
+
+  const handleClearCompleted = async (taskList) => {
+    try {
+      const response = await deleteTasks({ ids: taskList.map((task) => task.id) });
+      toast.success(`${response.data.ids.length} tasks deleted`);
+      fetchTasks();
+    } catch (error) {
+      console.error('Failed to delete tasks:', error);
+      toast.error('Failed to delete tasks');
+    }
+  };
+
   const filterAndSortTasks = () => {
-    let filtered = tasks.filter(task => {
-      const matchesSearch = 
+    // Until the server answers, narrow the loaded tasks locally
+    const source = searchResults ?? tasks;
+    let filtered = source.filter(task => {
+      const matchesSearch = searchResults !== null ||
         task.original_task.toLowerCase().includes(searchTerm.toLowerCase()) ||
         task.smart_task.toLowerCase().includes(searchTerm.toLowerCase());
       
@@ -287,9 +335,17 @@ const History = () => {
                 {/* Active Tasks Section */}
                 {filteredTasks.activeTasks.length > 0 && (
                   <div className="mb-8">
-                    <h2 className="text-xl font-semibold text-gray-900 dark:text-white mb-4">
-                      Active Tasks
-                    </h2>
+                    <div className="flex items-center justify-between mb-4">
+                      <h2 className="text-xl font-semibold text-gray-900 dark:text-white">
+                        Active Tasks
+                      </h2>
+                      <button
+                        onClick={() => handleMarkAllDone(filteredTasks.activeTasks)}
+                        className="inline-flex items-center gap-1 text-sm text-green-600 hover:text-green-700 dark:text-green-400"
+                      >
+                        <CheckCircle className="w-4 h-4" /> Mark all done
+                      </button>
+                    </div>
                     <div className="space-y-4">
                       {filteredTasks.activeTasks.map((task) => (
                         <motion.div
@@ -388,9 +444,17 @@ const History = () => {
         {/* Completed Tasks Section */}
         {filteredTasks.completedTasks.length > 0 && (
           <div className="mt-12">
-            <h2 className="text-xl font-semibold text-gray-900 dark:text-white mb-4">
-              Completed Tasks
-            </h2>
+            <div className="flex items-center justify-between mb-4">
+              <h2 className="text-xl font-semibold text-gray-900 dark:text-white">
+                Completed Tasks
+              </h2>
+              <button
+                onClick={() => handleClearCompleted(filteredTasks.completedTasks)}
+                className="inline-flex items-center gap-1 text-sm text-red-600 hover:text-red-700 dark:text-red-400"
+              >
+                <Trash2 className="w-4 h-4" /> Clear completed
+              </button>
+            </div>
             <div className="space-y-4">
               {filteredTasks.completedTasks.map((task) => (
                 <motion.div
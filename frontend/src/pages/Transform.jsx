@@ -16,7 +16,7 @@ import {
   Zap
 } from 'lucide-react';
 import { useAuth } from '../contexts/AuthContext';
-import api, { updateApiKey, sendTaskResultEmail } from '../services/api';  // Use our custom API service
+import api, { updateApiKey, sendTaskResultEmail, streamTransformTasks } from '../services/api';  // Use our custom API service
 import toast from 'react-hot-toast';
 
 const Transform = () => {
@@ -109,24 +109,25 @@ const Transform = () => {
       
       console.log("Request data:", requestData);
       
-      // Using our API service with explicit auth header
-      const response = await api.post('/api/ai/transform', requestData, {
-        headers: {
-          'Authorization': `Bearer ${token}`
+      // Stream tasks in as the model produces them, keeping input order
+      const received = [];
+      const { error: streamError } = await streamTransformTasks(requestData.tasks, {
+        onTask: (event) => {
+          received[event.index] = event.task;
+          const ordered = received.filter(Boolean);
+          setOutput(formatOutput(ordered));
+          setProcessedTasks(ordered);
         }
       });
 
-      // Format and display the output
-      if (response.data && response.data.processed_tasks) {
-        const formattedOutput = formatOutput(response.data.processed_tasks);
-        setOutput(formattedOutput);
-        
-        // Store processed tasks for email
-        setProcessedTasks(response.data.processed_tasks);
-        
-        toast.success('Tasks transformed successfully!');
+      const processed = received.filter(Boolean);
+      if (processed.length === 0) {
+        throw new Error(streamError?.detail || 'Invalid response format from server');
+      }
+      if (streamError || processed.length < tasks.length) {
+        toast.error(`Transformed ${processed.length} of ${tasks.length} tasks`);
       } else {
-        toast.error('Invalid response format from server');
+        toast.success('Tasks transformed successfully!');
       }
     } catch (error) {
       console.error('Transform error:', error);
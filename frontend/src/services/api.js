@@ -143,9 +143,77 @@ export const sendTaskResultEmail = (tasks, processedTasks) => {
     processed_tasks: processedTasks
   });
 };
+// Streaming transform: the backend emits one NDJSON event per task as soon as
+// it is ready, so results can be rendered before the whole completion is back.
+export const streamTransformTasks = async (tasks, { onTask, signal } = {}) => {
+  const token = localStorage.getItem('access_token');
+  const response = await fetch(`${API_BASE}/api/ai/transform/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'application/x-ndjson',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify({ tasks }),
+    signal,
+  });
+
+  if (!response.ok) {
+    let detail = `Request failed with status ${response.status}`;
+    try {
+      detail = (await response.json()).detail || detail;
+    } catch {}
+    const error = new Error(detail);
+    error.status = response.status;
+    throw error;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let report = null;
+  let streamError = null;
+
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const event = JSON.parse(line);
+    if (event.type === 'task') onTask?.(event);
+    else if (event.type === 'done') report = event.report;
+    else if (event.type === 'error') streamError = event;
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline;
+    while ((newline = buffer.indexOf('\n')) !== -1) {
+      handleLine(buffer.slice(0, newline));
+      buffer = buffer.slice(newline + 1);
+    }
+  }
+  handleLine(buffer);
+
+  return { report, error: streamError };
+};
+
 // Task management
-export const getTasks = () => {
-  return api.get('/api/tasks/');
+// Optional params: { limit, cursor, status, priority, include_total }. With a
+// limit, the next page's cursor is returned in the X-Next-Cursor header.
+export const getTasks = (params) => {
+  return api.get('/api/tasks/', { params });
+};
+
+// Full-text search, best matches first: { items, next_offset }. Each item is
+// a task plus rank and HTML-escaped original_highlight/smart_highlight.
+export const searchTasks = (q, params) => {
+  return api.get('/api/tasks/search', { params: { q, ...params } });
+};
+
+// Dashboard numbers computed server-side: { total, by_status, by_priority,
+// completion_rate, daily: [{ date, created, completed }] } for the last `days` days
+export const getTaskStats = (days = 30) => {
+  return api.get('/api/tasks/stats', { params: { days } });
 };
 
 export const deleteTask = (taskId) => {
@@ -156,6 +224,17 @@ export const updateTaskStatus = (taskId, status) => {
   return api.patch(`/api/tasks/${taskId}/status`, { status });
 };
 
+// Bulk changes in one request. selection: { ids: [...] } and/or
+// { filter: { status, priority } }; { filter: {} } selects every task.
+// Responds with { message, ids, not_found }.
+export const updateTasksStatus = (selection, status) => {
+  return api.patch('/api/tasks/status', { ...selection, status });
+};
+
+export const deleteTasks = (selection) => {
+  return api.delete('/api/tasks/', { data: selection });
+};
+
 // Create/save a task (manual entry uses same schema as processed task)
 export const saveTask = (task) => {
   // expects: { original_task, smart_task, priority }